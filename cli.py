@@ -3,8 +3,10 @@
 # Copyright (c) 2020 LG Electronics Inc.
 # SPDX-License-Identifier: Apache-2.0
 import os
+from multiprocessing import freeze_support
 from fosslight_dependency.cli import main
 
 
 if __name__ == '__main__':
+    freeze_support()
     main()
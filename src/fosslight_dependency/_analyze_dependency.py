@@ -6,7 +6,8 @@
 import os
 import logging
 import fosslight_dependency.constant as const
-from fosslight_dependency._package_manager import deduplicate_dep_items
+from fosslight_dependency._package_manager import deduplicate_dep_items, set_http_max_per_host, get_http_throttle_stats
+from fosslight_dependency._json_stream import get_peak_memory_mb
 from fosslight_dependency.package_manager.Pypi import Pypi
 from fosslight_dependency.package_manager.Npm import Npm
 from fosslight_dependency.package_manager.Yarn import Yarn
@@ -30,7 +31,7 @@ logger = logging.getLogger(constant.LOGGER_NAME)
 
 def analyze_dependency(package_manager_name, input_dir, output_dir, pip_activate_cmd='', pip_deactivate_cmd='',
                        output_custom_dir='', app_name=const.default_app_name, github_token='', manifest_file_name=[],
-                       direct=True):
+                       direct=True, registry_jobs=const.default_registry_jobs, engine=const.default_engine):
     ret = True
     package_dep_item_list = []
     cover_comment = ''
@@ -79,6 +80,9 @@ def analyze_dependency(package_manager_name, input_dir, output_dir, pip_activate
 
     if direct:
         package_manager.set_direct_dependencies(direct)
+    package_manager.set_registry_jobs(registry_jobs)
+    package_manager.set_engine(engine)
+    set_http_max_per_host(registry_jobs)
     ret = package_manager.run_plugin()
 
     if not ret and npm_fallback_to_yarn:
@@ -91,6 +95,8 @@ def analyze_dependency(package_manager_name, input_dir, output_dir, pip_activate
             package_manager.set_manifest_file(manifest_file_name)
         if direct:
             package_manager.set_direct_dependencies(direct)
+        package_manager.set_registry_jobs(registry_jobs)
+        package_manager.set_engine(engine)
 
         ret = package_manager.run_plugin()
         if ret:
@@ -118,6 +124,12 @@ def analyze_dependency(package_manager_name, input_dir, output_dir, pip_activate
             package_dep_item_list.extend(package_manager.dep_items)
         if package_dep_item_list:
             package_dep_item_list = deduplicate_dep_items(package_dep_item_list)
+        peak_memory = get_peak_memory_mb()
+        if peak_memory is not None:
+            logger.info(f"Peak memory usage after parsing {package_manager_name}: {peak_memory}MB")
+        for host, (throttled_responses, throttled_seconds) in get_http_throttle_stats(reset=True).items():
+            logger.info(f"Rate limited by {host}: {throttled_responses} throttled responses, "
+                        f"{throttled_seconds:.1f}s of requests spent waiting")
     if ret:
         logger.warning(f"### Complete to analyze: {package_manager_name}({input_dir}: {','.join(manifest_file_name)})")
     else:
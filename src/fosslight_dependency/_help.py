@@ -43,6 +43,20 @@ _HELP_MESSAGE_DEPENDENCY = f"""
                            cocoapods, android, swift, carthage, go, nuget, helm,
                            unity, cargo, pnpm, yarn)
     -r                     Recursive mode: scan all subdirectories for manifest files
+    --jobs <n>             Analyze up to n manifest directories in parallel (default: 1)
+    --registry-jobs <n>    Send up to n concurrent requests to a package registry (default: 8)
+    --cache-dir <path>     Directory of the registry metadata cache
+                           (default: ~/.cache/fosslight_dependency)
+    --no-cache             Do not read or write the metadata cache
+    --refresh-cache        Ignore cached metadata and store fresh results
+    --cache-ttl <days>     Days a cached entry stays valid (default: 30)
+    --cache-size <n>       Maximum number of cached entries, least recently used first out
+                           (default: 200000)
+    --engine <engine>      How npm, yarn, pnpm and cargo dependencies are collected (default: auto)
+                           tool: run the package manager (and license-checker)
+                           lockfile: read package-lock.json, yarn.lock, pnpm-lock.yaml or Cargo.lock only,
+                           without installing anything
+                           auto: tool, or lockfile if the package manager is not installed
     --graph-path <path>    Save dependency graph image (pdf, jpg, png) (recommend pdf extension)
                            Example: fosslight_dependency --graph-path /your/path/filename.[pdf, jpg, png]
     --graph-format <format> Set graph image format (default: pdf)
@@ -86,6 +100,9 @@ _HELP_MESSAGE_DEPENDENCY = f"""
     # Recursive scan with all subdirectories
     fosslight_dependency -r
 
+    # Recursive scan of a monorepo with 4 parallel jobs
+    fosslight_dependency -r --jobs 4
+
     # Generate dependency graph
     fosslight_dependency --graph-path dependency_tree.pdf
 """
@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026 LG Electronics Inc.
+# SPDX-License-Identifier: Apache-2.0
+
+import sys
+import json
+import subprocess
+import tempfile
+import ijson
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+ANY = '*'
+JSON_READ_SIZE = 64 * 1024
+_START_EVENTS = ('start_map', 'start_array')
+_END_EVENTS = ('end_map', 'end_array')
+
+
+def _match_path(path, pattern):
+    return len(path) == len(pattern) and all(p == ANY or p == k for k, p in zip(path, pattern))
+
+
+def iter_json_items(fp, patterns):
+    """Yield (path, value) for every value of a JSON document whose path matches one of the patterns.
+
+    A path is the tuple of map keys and array indexes leading to a value, and ANY in a pattern matches
+    any key or index. The document is read in a single pass: only the matched values are built into
+    Python objects, one at a time, and everything else is skipped as it is read.
+    """
+    patterns = [tuple(pattern) for pattern in patterns]
+    path = []
+    in_array = []
+    builder = None
+    depth = 0
+
+    for event, value in ijson.basic_parse(fp, use_float=True):
+        if builder is not None:
+            builder.event(event, value)
+            if event in _START_EVENTS:
+                depth += 1
+            elif event in _END_EVENTS:
+                depth -= 1
+            if depth > 0:
+                continue
+            yield tuple(path), builder.value
+            builder = None
+        elif event == 'map_key':
+            path[-1] = value
+            continue
+        elif event in _END_EVENTS:
+            path.pop()
+            in_array.pop()
+        elif any(_match_path(path, pattern) for pattern in patterns):
+            builder = ijson.ObjectBuilder()
+            builder.event(event, value)
+            if event in _START_EVENTS:
+                depth = 1
+                continue
+            yield tuple(path), builder.value
+            builder = None
+        elif event in _START_EVENTS:
+            in_array.append(event == 'start_array')
+            path.append(0 if event == 'start_array' else None)
+            continue
+        # A value is complete, move on to the next item of the enclosing array.
+        if in_array and in_array[-1]:
+            path[-1] += 1
+
+
+def iter_json_values(fp, read_size=JSON_READ_SIZE):
+    """Yield the values of a text stream holding concatenated JSON documents, as 'go list -json' prints.
+
+    The stream is read in chunks and each document is decoded as soon as it is complete, so framing
+    does not depend on how the documents are indented or split into lines.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+    while True:
+        while pos < len(buffer) and buffer[pos].isspace():
+            pos += 1
+        if pos == len(buffer) and eof:
+            return
+        value = end = None
+        if pos < len(buffer):
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+        # A document that is cut off, or a number at the end of the buffer, may go on in the next chunk.
+        if end is None or (end == len(buffer) and not eof):
+            buffer = buffer[pos:]
+            # Reads grow with the buffer, so a large document is decoded a logarithmic number of times.
+            chunk = fp.read(max(read_size, len(buffer)))
+            buffer += chunk
+            pos = 0
+            eof = not chunk
+            continue
+        yield value
+        pos = end
+
+
+def iter_dependency_tree(fp, visited=None, per_parent=False):
+    """Yield (index, depth, name, node) for the packages of an 'npm ls --json' style dependency tree.
+
+    The input can hold one root object, an array of them or several concatenated documents, as
+    'pnpm ls -r' prints. node holds the scalar fields of a package and, under 'dependencies',
+    the {name: version} of its installed children; missing packages and packages without a version
+    are left out. index is the pre-order position of the package; roots have depth 0 and are named
+    by their 'name' field.
+
+    A (name, version) found in visited, or already seen in the stream, is yielded only the first time
+    and its dependencies are skipped while they are read, so a tree which repeats the same subtrees
+    under many parents is never held in memory. With per_parent, it is yielded again for each distinct
+    parent instead, since npm can resolve different children for the same package in different places.
+    """
+    if visited is None:
+        visited = set()
+    stack = []
+    count = 0
+
+    for event, value in ijson.basic_parse(fp, use_float=True, multiple_values=True):
+        frame = stack[-1] if stack else None
+        if frame is not None and frame['skip']:
+            if event in _START_EVENTS:
+                frame['skip'] += 1
+            elif event in _END_EVENTS:
+                frame['skip'] -= 1
+                if not frame['skip']:
+                    stack.pop()
+            continue
+
+        if frame is None or frame['kind'] == 'roots':
+            if event == 'start_map':
+                stack.append(_new_tree_node(count, 0, None))
+                count += 1
+            elif event == 'start_array' and frame is None:
+                stack.append({'kind': 'roots', 'skip': 0})
+            elif event == 'end_array':
+                stack.pop()
+        elif frame['kind'] == 'dependencies':
+            if event == 'map_key':
+                frame['key'] = value
+            elif event == 'start_map':
+                stack.append(_new_tree_node(count, frame['depth'] + 1, frame['key']))
+                count += 1
+            elif event == 'start_array':
+                stack.append({'kind': 'other', 'skip': 1})
+            elif event == 'end_map':
+                stack.pop()
+        elif event == 'map_key':
+            frame['key'] = value
+        elif event == 'start_map' and frame['key'] == 'dependencies':
+            # Once the version is known, the dependencies of a package seen before are skipped unread.
+            stack.append({'kind': 'dependencies', 'skip': 1 if frame['seen'] else 0,
+                          'depth': frame['depth'], 'key': None})
+        elif event in _START_EVENTS:
+            stack.append({'kind': 'other', 'skip': 1})
+        elif event == 'end_map':
+            stack.pop()
+            node = frame['node']
+            if frame['depth'] == 0:
+                yield frame['index'], 0, node.get('name'), node
+                continue
+            name = frame['name']
+            version = node.get('version')
+            if version is None:
+                continue
+            if node.get('peerMissing') or node.get('missing'):
+                if not frame['seen']:
+                    visited.discard(frame['visit_key'])
+                continue
+            # stack[-1] is the 'dependencies' map this package is listed in and stack[-2] its owner.
+            stack[-2]['node']['dependencies'].setdefault(name, version)
+            if not frame['seen']:
+                yield frame['index'], frame['depth'], name, node
+        else:
+            frame['node'][frame['key']] = value
+            if frame['key'] == 'version' and frame['depth'] > 0:
+                visit_key = (frame['name'], value)
+                if per_parent:
+                    # stack[-2] is the 'dependencies' map the package is listed in and stack[-3] its owner.
+                    owner = stack[-3]
+                    visit_key = (owner['name'] or owner['node'].get('name'), owner['node'].get('version')) + visit_key
+                frame['visit_key'] = visit_key
+                frame['seen'] = visit_key in visited
+                visited.add(visit_key)
+
+
+def _new_tree_node(index, depth, name):
+    return {'kind': 'node', 'skip': 0, 'index': index, 'depth': depth, 'name': name, 'key': None, 'seen': False,
+            'visit_key': None, 'node': {'dependencies': {}}}
+
+
+def stream_command_output(cmd, consume, cwd=None, env=None):
+    """Run cmd and hand its stdout to consume(fp) as a binary stream while the command is running.
+
+    Returns (returncode, stderr, the value returned by consume). stderr goes to a temporary file,
+    so a command that writes a lot of it cannot block on a full pipe.
+    """
+    with tempfile.TemporaryFile() as err_fp:
+        proc = subprocess.Popen(cmd, shell=True, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=err_fp)
+        try:
+            consumed = consume(proc.stdout)
+        finally:
+            proc.stdout.close()
+            proc.wait()
+        err_fp.seek(0)
+        stderr = err_fp.read().decode('utf-8', errors='replace')
+    return proc.returncode, stderr, consumed
+
+
+def get_peak_memory_mb():
+    """Peak resident memory of this process in MB, or None where it is not available."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    if sys.platform == 'darwin':
+        return peak // (1024 * 1024)
+    return peak // 1024
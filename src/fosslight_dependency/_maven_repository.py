@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026 LG Electronics Inc.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import re
+import logging
+import threading
+from defusedxml.ElementTree import parse, ParseError
+import fosslight_util.constant as constant
+
+logger = logging.getLogger(constant.LOGGER_NAME)
+
+REMOTE_REPOSITORIES_FILE = '_remote.repositories'
+_pom_property_re = re.compile(r'\$\{([^}]+)\}')
+
+_local_repositories = {}
+_local_repositories_lock = threading.Lock()
+
+
+class LocalMavenRepository:
+    # A Maven local repository (~/.m2/repository). Parsed POMs are kept for the whole scan, so the
+    # parent POMs that most dependencies share are read once. Misses are not kept: a later mvn run
+    # of the same scan may download what was missing.
+    def __init__(self, root):
+        self.root = root
+        self._poms = {}
+        self._remote_repositories = {}
+        self._versions = {}
+
+    def get_version_dir(self, group_id, artifact_id, version):
+        return os.path.join(self.root, *group_id.split('.'), artifact_id, version)
+
+    def read_pom(self, group_id, artifact_id, version):
+        key = (group_id, artifact_id, version)
+        pom = self._poms.get(key)
+        if pom is None:
+            pom_file = os.path.join(self.get_version_dir(*key), f'{artifact_id}-{version}.pom')
+            if os.path.isfile(pom_file):
+                try:
+                    pom = self._poms[key] = parse_pom(parse(pom_file).getroot(), key)
+                except (OSError, ParseError) as e:
+                    logger.debug(f"Fail to parse {pom_file}: {e}")
+        return pom
+
+    def get_pom_metadata(self, group_id, artifact_id, version):
+        # {'license', 'scm_url', 'complete'} of the POM, or None if the POM is not here. The license is inherited
+        # from the parents; 'complete' tells that the whole parent chain was read, so a license missing locally
+        # is missing upstream too. The SCM URL is the artifact's own only: an inherited one points at the parent
+        # project, and its properties would be interpolated with the parent's coordinates.
+        coordinates = (group_id, artifact_id, version)
+        pom = self.read_pom(*coordinates)
+        if pom is None:
+            return None
+        metadata = {'license': '', 'scm_url': pom['scm_url'], 'complete': False}
+        visited = set()
+        while coordinates not in visited:
+            visited.add(coordinates)
+            if pom['licenses']:
+                metadata['license'] = ', '.join(pom['licenses'])
+                break
+            coordinates = pom['parent']
+            if coordinates is None:
+                metadata['complete'] = True
+                break
+            pom = self.read_pom(*coordinates)
+            if pom is None:
+                break
+        return metadata
+
+    def has_version(self, group_id, artifact_id, version):
+        # The version directories of an artifact are listed with os.scandir, again only when a version is not found.
+        key = (group_id, artifact_id)
+        if version not in self._versions.get(key, ()):
+            try:
+                with os.scandir(os.path.join(self.root, *group_id.split('.'), artifact_id)) as entries:
+                    self._versions[key] = {entry.name for entry in entries if entry.is_dir()}
+            except OSError:
+                return False
+        return version in self._versions[key]
+
+    def index_remote_repositories(self, artifacts):
+        # {(group, artifact, version): {file name: repository id}} of exactly the given artifacts that are here.
+        index = {}
+        for group_id, artifact_id, version in artifacts:
+            if self.has_version(group_id, artifact_id, version):
+                remote_repositories = self.get_remote_repositories(group_id, artifact_id, version)
+                if remote_repositories:
+                    index[(group_id, artifact_id, version)] = remote_repositories
+        return index
+
+    def get_remote_repositories(self, group_id, artifact_id, version):
+        # {file name: id of the repository it was downloaded from}, as recorded by Maven next to the files.
+        key = (group_id, artifact_id, version)
+        remote_repositories = self._remote_repositories.get(key)
+        if not remote_repositories:
+            remote_repositories = read_remote_repositories(os.path.join(self.get_version_dir(*key), REMOTE_REPOSITORIES_FILE))
+            if remote_repositories:
+                self._remote_repositories[key] = remote_repositories
+        return remote_repositories
+
+
+def read_remote_repositories(remote_repositories_file):
+    remote_repositories = {}
+    try:
+        with open(remote_repositories_file, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if line.startswith('#') or '>' not in line:
+                    continue
+                parts = line.strip().split('>')
+                if len(parts) != 2:
+                    continue
+                remote_repositories[parts[0]] = parts[1].rstrip('=')
+    except OSError:
+        pass
+    return remote_repositories
+
+
+def parse_pom(root, coordinates):
+    group_id, artifact_id, version = coordinates
+    parent = None
+    parent_element = root.find('{*}parent')
+    if parent_element is not None:
+        parent = tuple((parent_element.findtext(f'{{*}}{field}') or '').strip()
+                       for field in ('groupId', 'artifactId', 'version'))
+        if not all(parent):
+            parent = None
+
+    properties = {'project.groupId': group_id, 'project.artifactId': artifact_id, 'project.version': version,
+                  'groupId': group_id, 'artifactId': artifact_id, 'version': version}
+    properties_element = root.find('{*}properties')
+    if properties_element is not None:
+        for prop in properties_element:
+            if isinstance(prop.tag, str) and prop.text:
+                properties.setdefault(prop.tag.split('}')[-1], prop.text.strip())
+
+    licenses = []
+    for license_element in root.findall('{*}licenses/{*}license'):
+        name = license_element.findtext('{*}name')
+        if name and name.strip():
+            licenses.append(name.strip().replace(',', ''))
+
+    scm_url = ''
+    for url in (root.findtext('{*}scm/{*}url'), root.findtext('{*}url')):
+        url = _pom_property_re.sub(lambda m: properties.get(m.group(1), m.group(0)), (url or '').strip())
+        if url and '${' not in url:
+            scm_url = url[:-4] if url.endswith('.git') else url
+            break
+    return {'licenses': licenses, 'scm_url': scm_url, 'parent': parent}
+
+
+def get_local_repository_path():
+    # The localRepository of ~/.m2/settings.xml, else ~/.m2/repository.
+    m2_dir = os.path.join(os.path.expanduser('~'), '.m2')
+    settings_file = os.path.join(m2_dir, 'settings.xml')
+    if os.path.isfile(settings_file):
+        try:
+            local_repository = (parse(settings_file).getroot().findtext('{*}localRepository') or '').strip()
+            if local_repository and '${' not in local_repository:
+                return os.path.expanduser(local_repository)
+        except (OSError, ParseError) as e:
+            logger.debug(f"Fail to read {settings_file}: {e}")
+    return os.path.join(m2_dir, 'repository')
+
+
+def reset_local_maven_repositories():
+    # Called at the start of a scan, so that nothing read by an earlier scan of the same process is kept.
+    with _local_repositories_lock:
+        _local_repositories.clear()
+
+
+def get_local_maven_repository():
+    # One instance per local repository, shared by every Maven module of the scan; None if there is none.
+    root = get_local_repository_path()
+    if not os.path.isdir(root):
+        return None
+    with _local_repositories_lock:
+        local_repository = _local_repositories.get(root)
+        if local_repository is None:
+            local_repository = _local_repositories[root] = LocalMavenRepository(root)
+        return local_repository
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026 LG Electronics Inc.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import json
+import time
+import logging
+import sqlite3
+import threading
+import fosslight_util.constant as constant
+import fosslight_dependency.constant as const
+
+logger = logging.getLogger(constant.LOGGER_NAME)
+
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+                                 'fosslight_dependency')
+CACHE_DB_NAME = 'metadata.sqlite3'
+_PRUNE_INTERVAL = 1000
+
+# Kinds of cached lookups. One purl can have an entry of each kind.
+NPM_REGISTRY = 'npm-registry'
+NPM_MANIFEST = 'npm-manifest'
+GO_PKGSITE = 'go-pkgsite'
+GO_PROXY_INFO = 'go-proxy'
+NUGET_NUSPEC = 'nuget-nuspec'
+MAVEN_POM_LICENSE = 'maven-pom-license'
+GITHUB_LICENSE = 'github-license'
+# Keyed by 'sha256:<digest of the normalized text>' instead of a purl.
+LICENSE_TEXT = 'license-text'
+
+_metadata_cache = None
+
+
+class MetadataCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, ttl_days=const.default_cache_ttl_days,
+                 max_entries=const.default_cache_max_entries, refresh=False):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.db_path = os.path.join(cache_dir, CACHE_DB_NAME)
+        self.ttl = ttl_days * 24 * 60 * 60
+        self.max_entries = max_entries
+        self.refresh = refresh
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._write_count = 0
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS metadata ('
+                         'purl TEXT NOT NULL, kind TEXT NOT NULL, value TEXT NOT NULL, '
+                         'created REAL NOT NULL, accessed REAL NOT NULL, PRIMARY KEY (purl, kind))')
+            conn.execute('CREATE INDEX IF NOT EXISTS metadata_accessed ON metadata (accessed)')
+
+    def _connect(self):
+        # sqlite3 connections cannot be shared between threads or across a fork.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, purl, kind):
+        if self.refresh or not purl:
+            return None
+        try:
+            conn = self._connect()
+            row = conn.execute('SELECT value, created FROM metadata WHERE purl = ? AND kind = ?',
+                               (purl, kind)).fetchone()
+            now = time.time()
+            if row is None or now - row[1] > self.ttl:
+                return None
+            with conn:
+                conn.execute('UPDATE metadata SET accessed = ? WHERE purl = ? AND kind = ?', (now, purl, kind))
+            return json.loads(row[0])
+        except (sqlite3.Error, ValueError) as e:
+            logger.debug(f"Fail to read metadata cache({purl}, {kind}): {e}")
+            return None
+
+    def set(self, purl, kind, value):
+        if not purl:
+            return
+        try:
+            now = time.time()
+            conn = self._connect()
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO metadata (purl, kind, value, created, accessed) '
+                             'VALUES (?, ?, ?, ?, ?)', (purl, kind, json.dumps(value), now, now))
+            with self._lock:
+                self._write_count += 1
+                prune = self._write_count % _PRUNE_INTERVAL == 0
+            if prune:
+                self.prune()
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.debug(f"Fail to write metadata cache({purl}, {kind}): {e}")
+
+    def prune(self):
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute('DELETE FROM metadata WHERE created < ?', (time.time() - self.ttl,))
+                count = conn.execute('SELECT COUNT(*) FROM metadata').fetchone()[0]
+                if count > self.max_entries:
+                    # Least recently used entries are evicted first.
+                    conn.execute('DELETE FROM metadata WHERE rowid IN '
+                                 '(SELECT rowid FROM metadata ORDER BY accessed LIMIT ?)', (count - self.max_entries,))
+        except sqlite3.Error as e:
+            logger.debug(f"Fail to prune metadata cache: {e}")
+
+
+def configure_metadata_cache(cache_dir='', enabled=True, refresh=False, ttl_days=const.default_cache_ttl_days,
+                             max_entries=const.default_cache_max_entries):
+    global _metadata_cache
+    _metadata_cache = None
+    if enabled:
+        try:
+            _metadata_cache = MetadataCache(cache_dir or DEFAULT_CACHE_DIR, ttl_days, max_entries, refresh)
+            _metadata_cache.prune()
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"Cannot use the metadata cache({cache_dir or DEFAULT_CACHE_DIR}): {e}")
+    return _metadata_cache
+
+
+def get_cached_metadata(purl, kind):
+    if _metadata_cache is None:
+        return None
+    return _metadata_cache.get(purl, kind)
+
+
+def set_cached_metadata(purl, kind, value):
+    if _metadata_cache is not None:
+        _metadata_cache.set(purl, kind, value)
@@ -11,12 +11,23 @@ import base64
 import subprocess
 import shutil
 import stat
+import hashlib
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from packageurl import PackageURL
 from packageurl.contrib import url2purl
 from askalono import identify
 import fosslight_util.constant as constant
 import fosslight_dependency.constant as const
+from fosslight_dependency._metadata_cache import get_cached_metadata, set_cached_metadata, GITHUB_LICENSE, LICENSE_TEXT
 
 try:
     from github import Github
@@ -28,8 +39,44 @@ logger = logging.getLogger(constant.LOGGER_NAME)
 gradle_config = ['runtimeClasspath', 'runtime']
 android_config = ['releaseRuntimeClasspath']
 ASKALONO_THRESHOLD = 0.7
+LICENSE_NAME_CACHE_SIZE = 4096
+# Below this many distinct texts, starting worker processes costs more than it saves.
+LICENSE_POOL_MIN_TEXTS = 8
 FOSSLIGHT_ALL_DEPS_TASK = 'fosslightAllDeps'
 
+HTTP_TIMEOUT = 10
+HTTP_RETRIES = 3
+HTTP_BACKOFF_FACTOR = 0.5
+HTTP_RETRY_STATUS = (500, 502, 504)
+# Throttling responses are retried by http_request, which slows the host down instead of only the request.
+HTTP_THROTTLE_STATUS = (429, 503)
+HTTP_THROTTLE_RETRIES = 5
+HTTP_MAX_RETRY_AFTER = 60
+HTTP_DEFAULT_RATE = 50
+HTTP_MIN_RATE = 0.2
+HTTP_POOL_SIZE = 32
+HTTP_MAX_PER_HOST = const.default_registry_jobs
+GOOGLE_MAVEN = 'google_maven'
+GO_PROXY = 'go_proxy'
+# Registry base URLs; each can be pointed at a mirror or a local stand-in with the environment variable.
+REGISTRY_URL = {
+    const.NPM: ('FOSSLIGHT_NPM_REGISTRY_URL', 'https://registry.npmjs.org/'),
+    const.NUGET: ('FOSSLIGHT_NUGET_API_URL', 'https://api.nuget.org/v3-flatcontainer/'),
+    const.GO: ('FOSSLIGHT_GO_PKG_URL', 'https://pkg.go.dev/'),
+    GOOGLE_MAVEN: ('FOSSLIGHT_GOOGLE_MAVEN_URL', 'https://dl.google.com/dl/android/maven2/'),
+    GO_PROXY: ('FOSSLIGHT_GO_PROXY_URL', 'https://proxy.golang.org/'),
+}
+
+_http_lock = threading.Lock()
+_http_sessions = {}
+_http_host_slots = {}
+_http_max_per_host = HTTP_MAX_PER_HOST
+_http_rate_limits = {}
+
+_license_name_lock = threading.Lock()
+_license_name_cache = OrderedDict()
+_license_jobs = os.cpu_count() or 1
+
 _GROOVY_LICENSE_REPORT_IMPORTS = (
     'import com.github.jk1.license.ModuleData\n'
     'import com.github.jk1.license.ProjectData\n'
@@ -60,8 +107,12 @@ class PackageManager:
         self.total_dep_list = []
         self.direct_dep_list = []
         self.package_manager_name = package_manager_name
-        self.input_dir = input_dir
+        # Every relative path and subprocess is resolved against input_dir instead of
+        # the process working directory, so several analyses can share one process.
+        self.input_dir = os.path.abspath(input_dir)
         self.output_dir = output_dir
+        self.registry_jobs = const.default_registry_jobs
+        self.engine = const.default_engine
         self.dn_url = dn_url
         self.manifest_file_name = []
         self.relation_tree = {}
@@ -135,17 +186,18 @@ class PackageManager:
         # name, so returning 'gradlew.bat' fails with [WinError 2] on every Windows
         # machine. An absolute path keeps shell=False (no quoting/injection concerns)
         # and is equally valid on POSIX.
-        if self.platform == const.WINDOWS:
-            return os.path.abspath('gradlew.bat') if os.path.isfile('gradlew.bat') else ''
-        if os.path.isfile('gradlew'):
-            return os.path.abspath('gradlew')
-        return ''
+        wrapper = 'gradlew.bat' if self.platform == const.WINDOWS else 'gradlew'
+        wrapper_path = os.path.join(self.input_dir, wrapper)
+        return wrapper_path if os.path.isfile(wrapper_path) else ''
+
+    def get_input_path(self, *paths):
+        return os.path.join(self.input_dir, *paths)
 
     def _run_command_output(self, cmd):
-        return subprocess.check_output(cmd, encoding='utf-8')
+        return subprocess.check_output(cmd, encoding='utf-8', cwd=self.input_dir)
 
     def _run_command(self, cmd):
-        return subprocess.run(cmd, capture_output=True, encoding='utf-8')
+        return subprocess.run(cmd, capture_output=True, encoding='utf-8', cwd=self.input_dir)
 
     def run_plugin(self):
         ret = True
@@ -233,6 +285,12 @@ class PackageManager:
     def set_direct_dependencies(self, direct):
         self.direct_dep = direct
 
+    def set_registry_jobs(self, registry_jobs):
+        self.registry_jobs = max(1, registry_jobs)
+
+    def set_engine(self, engine):
+        self.engine = engine
+
     def parse_direct_dependencies(self):
         pass
 
@@ -252,7 +310,7 @@ class PackageManager:
             if result.returncode != 0:
                 logger.error(f'Cannot run Gradle task {" ".join(cmd)}: {result.stderr.strip()}')
                 return False
-            if os.path.isfile(self.input_file_name):
+            if os.path.isfile(self.get_input_path(self.input_file_name)):
                 logger.info(f'Generate output with {plugin_label} plugin.')
                 self.plugin_auto_run = True
                 return True
@@ -283,18 +341,16 @@ class PackageManager:
 
     def run_gradle_task(self):
         ret_task = True
-        prev_dir = os.getcwd()
         gradle_file = ''
         gradle_backup = ''
         module_build_gradle = ''
         module_gradle_backup = ''
-        os.chdir(self.input_dir)
+        input_file_path = self.get_input_path(self.input_file_name)
         try:
             candidates = const.SUPPORT_PACKAGE.get(self.package_manager_name, '')
-            if isinstance(candidates, list):
-                gradle_file = next((f for f in candidates if os.path.isfile(f)), '')
-            else:
-                gradle_file = candidates
+            if not isinstance(candidates, list):
+                candidates = [candidates]
+            gradle_file = next((self.get_input_path(f) for f in candidates if os.path.isfile(self.get_input_path(f))), '')
             if os.path.isfile(gradle_file):
                 gradle_backup = f'{gradle_file}_bk'
                 shutil.copy(gradle_file, gradle_backup)
@@ -302,13 +358,13 @@ class PackageManager:
                 # Inject plugin first (overwrites file with write mode)
                 ret_plugin = False
                 if self.package_manager_name == const.ANDROID:
-                    module_build_gradle = os.path.join(self.app_name, gradle_file)
+                    module_build_gradle = self.get_input_path(self.app_name, os.path.basename(gradle_file))
                     module_gradle_backup = f'{module_build_gradle}_bk'
-                    if os.path.isfile(module_build_gradle) and (not os.path.isfile(self.input_file_name)):
+                    if os.path.isfile(module_build_gradle) and (not os.path.isfile(input_file_path)):
                         shutil.copy(module_build_gradle, module_gradle_backup)
                         ret_plugin = self.add_android_plugin_in_gradle(module_build_gradle, gradle_file)
                 elif self.package_manager_name == const.GRADLE:
-                    if not os.path.isfile(self.input_file_name):
+                    if not os.path.isfile(input_file_path):
                         ret_plugin = self.add_gradle_plugin_in_gradle(gradle_file)
 
                 cmd_gradle = self._resolve_wrapper_command()
@@ -336,7 +392,7 @@ class PackageManager:
                     if changed_mode:
                         change_file_mode(cmd_gradle, current_mode)
 
-            if os.path.isfile(self.input_file_name):
+            if os.path.isfile(input_file_path):
                 logger.info(f'Found {self.input_file_name}.')
                 self.set_direct_dependencies(bool(self.direct_dep_list))
                 ret_task = True
@@ -356,12 +412,10 @@ class PackageManager:
                     os.remove(module_build_gradle)
                 shutil.move(module_gradle_backup, module_build_gradle)
 
-            os.chdir(prev_dir)
-
         return ret_task
 
     def add_android_plugin_in_gradle(self, module_build_gradle, gradle_file):
-        is_kts = gradle_file == 'build.gradle.kts'
+        is_kts = os.path.basename(gradle_file) == 'build.gradle.kts'
         if is_kts:
             apply = 'apply(plugin = "org.fosslight")\n'
             plugin_classpath = '        classpath("org.fosslight:android-dependency-scanning:+")'
@@ -411,7 +465,7 @@ class PackageManager:
             return False
 
     def add_gradle_plugin_in_gradle(self, gradle_file):
-        is_kts = gradle_file == 'build.gradle.kts'
+        is_kts = os.path.basename(gradle_file) == 'build.gradle.kts'
 
         try:
             with open(gradle_file, 'r', encoding='utf-8') as f:
@@ -483,7 +537,7 @@ class PackageManager:
 
     def add_allDeps_in_gradle(self, gradle_file):
         config = android_config if self.package_manager_name == const.ANDROID else gradle_config
-        is_kts = gradle_file == 'build.gradle.kts'
+        is_kts = os.path.basename(gradle_file) == 'build.gradle.kts'
 
         try:
             with open(gradle_file, 'r', encoding='utf-8') as f:
@@ -911,6 +965,10 @@ def connect_github(github_token):
 
 def get_github_license(g, github_repo):
     license_name = ''
+    purl = f'pkg:github/{github_repo}'
+    cached = get_cached_metadata(purl, GITHUB_LICENSE)
+    if cached is not None:
+        return cached['license']
 
     try:
         repository = g.get_repo(github_repo)
@@ -932,21 +990,108 @@ def get_github_license(g, github_repo):
         except Exception:
             logger.info("Cannot find the license name with github api.")
 
+    if license_name:
+        set_cached_metadata(purl, GITHUB_LICENSE, {'license': license_name})
     return license_name
 
 
-def check_license_name(license_txt, is_filepath=False):
+def get_license_text_key(license_content):
+    # askalono ignores whitespace layout, so texts that differ only in wrapping share one identification.
+    normalized = ' '.join(license_content.split())
+    return hashlib.sha256(normalized.encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+def _get_memoized_license_name(text_key):
+    with _license_name_lock:
+        license_name = _license_name_cache.get(text_key)
+        if license_name is not None:
+            _license_name_cache.move_to_end(text_key)
+            return license_name
+    cached = get_cached_metadata(f'sha256:{text_key}', LICENSE_TEXT)
+    if cached is not None:
+        _memoize_license_name(text_key, cached['license'], False)
+        return cached['license']
+    return None
+
+
+def _memoize_license_name(text_key, license_name, persist=True):
+    with _license_name_lock:
+        _license_name_cache[text_key] = license_name
+        _license_name_cache.move_to_end(text_key)
+        while len(_license_name_cache) > LICENSE_NAME_CACHE_SIZE:
+            _license_name_cache.popitem(last=False)
+    if persist:
+        set_cached_metadata(f'sha256:{text_key}', LICENSE_TEXT, {'license': license_name})
+
+
+def _identify_license_content(license_content):
     license_name = ''
+    detect_askalono = identify(license_content)
+    if detect_askalono.score > ASKALONO_THRESHOLD:
+        license_name = detect_askalono.name
+    return license_name
+
+
+def set_license_jobs(jobs):
+    global _license_jobs
+    _license_jobs = max(1, jobs)
+
+
+def identify_license_texts(license_contents):
+    # Identify a batch of license texts, running askalono once per distinct text.
+    license_names = {}
+    pending = {}
+    for license_content in license_contents:
+        text_key = get_license_text_key(license_content)
+        if text_key in license_names or text_key in pending:
+            continue
+        license_name = _get_memoized_license_name(text_key)
+        if license_name is None:
+            pending[text_key] = license_content
+        else:
+            license_names[text_key] = license_name
+
+    pending_contents = list(pending.values())
+    identified = None
+    workers = min(_license_jobs, len(pending_contents))
+    if workers > 1 and len(pending_contents) >= LICENSE_POOL_MIN_TEXTS:
+        try:
+            # askalono's native state does not survive a fork, so the workers are spawned.
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+                identified = list(executor.map(_identify_license_content, pending_contents,
+                                               chunksize=max(1, len(pending_contents) // (workers * 4))))
+        except Exception as e:
+            logger.debug(f"Fail to identify license texts in worker processes: {e}")
+    if identified is None:
+        identified = [_identify_license_content(license_content) for license_content in pending_contents]
+
+    for text_key, license_name in zip(pending, identified):
+        _memoize_license_name(text_key, license_name)
+        license_names[text_key] = license_name
+    return license_names
+
+
+def prefetch_license_names(license_files=(), license_txts=()):
+    # Identify every candidate of a scan up front so that check_license_name in the per-package loop is a lookup.
+    license_contents = list(license_txts)
+    for license_file in license_files:
+        try:
+            with open(license_file, 'r', encoding='utf-8') as f:
+                license_contents.append(f.read())
+        except Exception as e:
+            logger.debug(f"Fail to read license file({license_file}): {e}")
+    if license_contents:
+        identify_license_texts(license_contents)
+
+
+def check_license_name(license_txt, is_filepath=False):
     if is_filepath:
         with open(license_txt, 'r', encoding='utf-8') as f:
             license_content = f.read()
     else:
         license_content = license_txt
 
-    detect_askalono = identify(license_content)
-    if detect_askalono.score > ASKALONO_THRESHOLD:
-        license_name = detect_askalono.name
-    return license_name
+    return identify_license_texts([license_content])[get_license_text_key(license_content)]
 
 
 def ensure_executable(filepath):
@@ -1003,25 +1148,25 @@ def deduplicate_dep_items(dep_items):
     return unique_items
 
 
-def get_gradle_cmd():
+def get_gradle_cmd(input_dir):
     cmd_gradle = ''
     current_mode = ''
     changed_mode = False
     # Absolute path: the command is run through subprocess with shell=False, and
     # on Windows CreateProcess cannot resolve a bare '.bat' name ([WinError 2]).
     if platform.system() == const.WINDOWS:
-        if os.path.isfile("gradlew.bat"):
-            cmd_gradle = os.path.abspath("gradlew.bat")
+        if os.path.isfile(os.path.join(input_dir, "gradlew.bat")):
+            cmd_gradle = os.path.abspath(os.path.join(input_dir, "gradlew.bat"))
     else:
-        if os.path.isfile("gradlew"):
-            cmd_gradle = os.path.abspath("gradlew")
+        if os.path.isfile(os.path.join(input_dir, "gradlew")):
+            cmd_gradle = os.path.abspath(os.path.join(input_dir, "gradlew"))
             current_mode, changed_mode = ensure_executable(cmd_gradle)
     return cmd_gradle, current_mode, changed_mode
 
 
 def collect_gradle_download_urls(input_dir, package_manager_name, app_name=None):
     download_url_map = {}
-    cmd_gradle, current_mode, changed_mode = get_gradle_cmd()
+    cmd_gradle, current_mode, changed_mode = get_gradle_cmd(input_dir)
     if not cmd_gradle:
         return download_url_map
     try:
@@ -1129,12 +1274,199 @@ def get_download_location(download_url_map, group_id, artifact_id, version, mvnr
 
 def get_google_maven_url(mvnrepo_url, group_id, artifact_id, version):
     group_path = group_id.replace('.', '/')
-    pom_url = (f"https://dl.google.com/dl/android/maven2"
-               f"/{group_path}/{artifact_id}/{version}/{artifact_id}-{version}.pom")
+    pom_url = (f"{get_registry_url(GOOGLE_MAVEN)}"
+               f"{group_path}/{artifact_id}/{version}/{artifact_id}-{version}.pom")
     try:
-        resp = requests.head(pom_url, timeout=5, allow_redirects=True)
+        resp = http_head(pom_url)
         if resp.status_code == 200:
             return f"https://maven.google.com/web/index.html#{group_id}:{artifact_id}:{version}"
     except Exception:
         logger.debug(f"Failed to check Google Maven URL: {pom_url}")
     return f"{mvnrepo_url}{group_id}/{artifact_id}/{version}"
+
+
+def get_registry_url(registry):
+    env_name, default_url = REGISTRY_URL[registry]
+    url = os.environ.get(env_name, '') or default_url
+    return url if url.endswith('/') else f'{url}/'
+
+
+def set_http_max_per_host(max_per_host):
+    global _http_max_per_host
+    max_per_host = max(1, max_per_host)
+    with _http_lock:
+        if max_per_host != _http_max_per_host:
+            _http_max_per_host = max_per_host
+            _http_host_slots.clear()
+
+
+def get_http_session():
+    # Sessions hold open sockets, so a forked worker (--jobs) must not reuse its parent's session.
+    pid = os.getpid()
+    with _http_lock:
+        session = _http_sessions.get(pid)
+        if session is None:
+            retry = Retry(total=HTTP_RETRIES, backoff_factor=HTTP_BACKOFF_FACTOR,
+                          status_forcelist=HTTP_RETRY_STATUS, allowed_methods=frozenset(['HEAD', 'GET']),
+                          respect_retry_after_header=False, raise_on_status=False)
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _http_sessions.clear()
+            _http_host_slots.clear()
+            _http_sessions[pid] = session
+        return session
+
+
+def _get_host_slot(url):
+    host = urlsplit(url).netloc
+    with _http_lock:
+        slot = _http_host_slots.get(host)
+        if slot is None:
+            slot = threading.BoundedSemaphore(_http_max_per_host)
+            _http_host_slots[host] = slot
+        return slot
+
+
+class TokenBucket:
+    # Allows 'rate' requests per second on average and bursts of up to 'burst' requests.
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _wait_time(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                wait = self._wait_time(time.monotonic())
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+class AdaptiveRateLimiter(TokenBucket):
+    # A token bucket that halves its rate when the host throttles (429/503), pauses for the Retry-After
+    # of the response, and climbs back to max_rate one step per successful response.
+    def __init__(self, max_rate=HTTP_DEFAULT_RATE, burst=1):
+        super().__init__(max_rate, burst)
+        self.max_rate = max_rate
+        self.blocked_until = 0
+        self.failures = 0
+        self.throttled_responses = 0
+        self.throttled_seconds = 0.0
+
+    def set_max_rate(self, max_rate, burst=1):
+        with self._lock:
+            self.max_rate = max_rate
+            self.rate = min(self.rate, max_rate)
+            self.burst = max(1, burst)
+            self.tokens = min(self.tokens, self.burst)
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = self.blocked_until - now if now < self.blocked_until else self._wait_time(now)
+                if wait:
+                    self.throttled_seconds += wait
+            if not wait:
+                return
+            time.sleep(wait)
+
+    def update(self, response):
+        with self._lock:
+            if response.status_code not in HTTP_THROTTLE_STATUS:
+                self.failures = 0
+                if self.rate < self.max_rate:
+                    self.rate = min(self.max_rate, self.rate + max(HTTP_MIN_RATE, self.max_rate / 20))
+                return
+            now = time.monotonic()
+            self.throttled_responses += 1
+            retry_after = get_retry_after(response)
+            if retry_after is None:
+                retry_after = HTTP_BACKOFF_FACTOR * (2 ** self.failures)
+            # Requests that were already in flight get throttled together; only the first one slows the host down.
+            if now >= self.blocked_until:
+                self.failures += 1
+                self.rate = max(HTTP_MIN_RATE, self.rate / 2)
+                self.tokens = 0
+            self.blocked_until = max(self.blocked_until, now + min(retry_after, HTTP_MAX_RETRY_AFTER))
+
+
+def get_retry_after(response):
+    # Retry-After is either a number of seconds or an HTTP date.
+    retry_after = response.headers.get('Retry-After', '').strip()
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _get_rate_limiter(url):
+    host = urlsplit(url).netloc
+    with _http_lock:
+        rate_limiter = _http_rate_limits.get(host)
+        if rate_limiter is None:
+            rate_limiter = AdaptiveRateLimiter(burst=_http_max_per_host)
+            _http_rate_limits[host] = rate_limiter
+        return rate_limiter
+
+
+def set_http_rate_limit(url, rate, burst=1):
+    # Requests to the host of url are spread out to at most 'rate' per second, on top of the per-host concurrency limit.
+    _get_rate_limiter(url).set_max_rate(rate, burst)
+
+
+def get_http_throttle_stats(reset=False):
+    # {host: (throttled responses, seconds requests spent waiting for the rate limiter, summed over threads)}.
+    with _http_lock:
+        rate_limits = list(_http_rate_limits.items())
+    stats = {}
+    for host, rate_limiter in rate_limits:
+        with rate_limiter._lock:
+            if rate_limiter.throttled_responses or rate_limiter.throttled_seconds >= 0.1:
+                stats[host] = (rate_limiter.throttled_responses, rate_limiter.throttled_seconds)
+            if reset:
+                rate_limiter.throttled_responses = 0
+                rate_limiter.throttled_seconds = 0.0
+    return stats
+
+
+def http_request(method, url, timeout=HTTP_TIMEOUT, **kwargs):
+    kwargs.setdefault('allow_redirects', True)
+    session = get_http_session()
+    rate_limiter = _get_rate_limiter(url)
+    with _get_host_slot(url):
+        for attempt in range(HTTP_THROTTLE_RETRIES + 1):
+            rate_limiter.acquire()
+            response = session.request(method, url, timeout=timeout, **kwargs)
+            rate_limiter.update(response)
+            if response.status_code not in HTTP_THROTTLE_STATUS or attempt == HTTP_THROTTLE_RETRIES:
+                return response
+            logger.debug(f"HTTP Error {response.status_code} ({url}), retrying after the host slows down")
+            response.close()
+
+
+def http_get(url, timeout=HTTP_TIMEOUT, **kwargs):
+    return http_request('GET', url, timeout, **kwargs)
+
+
+def http_head(url, timeout=HTTP_TIMEOUT, **kwargs):
+    return http_request('HEAD', url, timeout, **kwargs)
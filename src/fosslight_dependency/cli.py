@@ -44,6 +44,14 @@ def main():
     graph_size = (600, 600)
     direct = True
     recursive = False
+    jobs = 1
+    registry_jobs = const.default_registry_jobs
+    cache_dir = ''
+    no_cache = False
+    refresh_cache = False
+    cache_ttl = const.default_cache_ttl_days
+    cache_max_entries = const.default_cache_max_entries
+    engine = const.default_engine
 
     parser = argparse.ArgumentParser(add_help=False)
     parser.add_argument('-h', '--help', action='store_true', required=False)
@@ -63,6 +71,14 @@ def main():
     parser.add_argument('--direct', choices=('true', 'false'), default='True', required=False)
     parser.add_argument('--notice', action='store_true', required=False)
     parser.add_argument('-r', '--recursive', action='store_true', required=False)
+    parser.add_argument('--jobs', nargs=1, type=int, required=False)
+    parser.add_argument('--registry-jobs', nargs=1, type=int, required=False)
+    parser.add_argument('--cache-dir', nargs=1, type=str, required=False)
+    parser.add_argument('--no-cache', action='store_true', required=False)
+    parser.add_argument('--refresh-cache', action='store_true', required=False)
+    parser.add_argument('--cache-ttl', nargs=1, type=int, required=False)
+    parser.add_argument('--cache-size', nargs=1, type=int, required=False)
+    parser.add_argument('--engine', nargs=1, type=str, required=False, choices=const.SUPPORT_ENGINES)
 
     args = parser.parse_args()
 
@@ -117,10 +133,29 @@ def main():
         sys.exit(0)
     if args.recursive:  # -r option
         recursive = True
+    if args.jobs:  # --jobs option
+        jobs = max(1, args.jobs[0])
+    if args.registry_jobs:  # --registry-jobs option
+        registry_jobs = max(1, args.registry_jobs[0])
+    if args.cache_dir:  # --cache-dir option
+        cache_dir = args.cache_dir[0]
+    if args.no_cache:  # --no-cache option
+        no_cache = True
+    if args.refresh_cache:  # --refresh-cache option
+        refresh_cache = True
+    if args.cache_ttl:  # --cache-ttl option
+        cache_ttl = max(0, args.cache_ttl[0])
+    if args.cache_size:  # --cache-size option
+        cache_max_entries = max(1, args.cache_size[0])
+    if args.engine:  # --engine option
+        engine = args.engine[0]
 
     run_dependency_scanner(package_manager, input_dir, output_dir, pip_activate_cmd, pip_deactivate_cmd,
                            output_custom_dir, app_name, github_token, format, direct, path_to_exclude,
-                           graph_path, graph_size, recursive)
+                           graph_path, graph_size, recursive, jobs=jobs,
+                           registry_jobs=registry_jobs, cache_dir=cache_dir, no_cache=no_cache,
+                           refresh_cache=refresh_cache, cache_ttl=cache_ttl, cache_max_entries=cache_max_entries,
+                           engine=engine)
 
 
 if __name__ == '__main__':
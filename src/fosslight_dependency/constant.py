@@ -53,5 +53,20 @@ SUGGESTED_PACKAGE = {
     'Cartfile': CARTHAGE
 }
 
+# Analysis engine: 'tool' runs the package manager, 'lockfile' reads the lockfile only,
+# 'auto' runs the package manager and falls back to the lockfile when the tool is not installed.
+ENGINE_AUTO = 'auto'
+ENGINE_TOOL = 'tool'
+ENGINE_LOCKFILE = 'lockfile'
+SUPPORT_ENGINES = [ENGINE_AUTO, ENGINE_TOOL, ENGINE_LOCKFILE]
+default_engine = ENGINE_AUTO
+
 # default android app name
 default_app_name = 'app'
+
+# default number of concurrent registry requests
+default_registry_jobs = 8
+
+# default metadata cache settings
+default_cache_ttl_days = 30
+default_cache_max_entries = 200000
@@ -33,15 +33,15 @@ class Android(PackageManager):
         if app_name:
             self.app_name = app_name
         self.input_file_name = self.check_input_path()
-        self.input_file_preexisted = os.path.isfile(self.input_file_name)
-        self.gradle_cache_dir = os.path.join(os.path.abspath(input_dir), '.gradle')
+        self.input_file_preexisted = os.path.isfile(self.get_input_path(self.input_file_name))
+        self.gradle_cache_dir = self.get_input_path('.gradle')
         self.gradle_cache_preexisted = os.path.isdir(self.gradle_cache_dir)
         self.append_input_package_list_file(self.input_file_name)
 
     def __del__(self):
         if self.plugin_auto_run and not self.input_file_preexisted:
-            if os.path.isfile(self.input_file_name):
-                os.remove(self.input_file_name)
+            if os.path.isfile(self.get_input_path(self.input_file_name)):
+                os.remove(self.get_input_path(self.input_file_name))
         if not self.gradle_cache_preexisted and os.path.isdir(self.gradle_cache_dir):
             try:
                 shutil.rmtree(self.gradle_cache_dir)
@@ -50,7 +50,7 @@ class Android(PackageManager):
                 logger.warning(f'Failed to remove gradle cache directory: {e}')
 
     def check_input_path(self):
-        if os.path.isfile(self.plugin_output_file):
+        if os.path.isfile(self.get_input_path(self.plugin_output_file)):
             return self.plugin_output_file
         else:
             return os.path.join(self.app_name, self.plugin_output_file)
@@ -61,7 +61,7 @@ class Android(PackageManager):
                 self.input_dir, self.package_manager_name, self.app_name
             )
 
-        with open(f_name, 'r', encoding='utf8') as input_fp:
+        with open(self.get_input_path(f_name), 'r', encoding='utf8') as input_fp:
             purl_dict = {}
             for i, line in enumerate(input_fp.readlines()):
                 dep_item = DependencyItem()
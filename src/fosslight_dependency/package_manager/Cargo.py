@@ -4,17 +4,30 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import os
+import glob
 import logging
-import json
 import re
+import shutil
 import subprocess
+import tarfile
 import fosslight_util.constant as constant
 import fosslight_dependency.constant as const
 from fosslight_dependency._package_manager import PackageManager
 from fosslight_dependency._package_manager import get_url_to_purl
+from fosslight_dependency._json_stream import iter_json_items, ANY
 from fosslight_dependency.dependency_item import DependencyItem, change_dependson_to_purl
 from fosslight_util.oss_item import OssItem
+
+try:
+    import tomllib
+except ImportError:
+    import tomli as tomllib
 logger = logging.getLogger(constant.LOGGER_NAME)
+cargo_package_fields = ('id', 'name', 'version', 'repository', 'license')
+# 'source#name@version', 'source/name#version' (the name is left out when it is the last path segment)
+# and 'name version (source)' before cargo 1.77.
+_package_id_patterns = (re.compile(r'^.*#(\S*)@(\S*)'), re.compile(r'^[^#\s]*/([^/#\s]+)#([^@\s]+)$'),
+                        re.compile(r'^(\S*)\s(\S*)\s'))
 
 
 class Cargo(PackageManager):
@@ -23,43 +36,77 @@ class Cargo(PackageManager):
     dn_url = 'https://crates.io/crates/'
     input_file_name = 'tmp_cargo_fosslight_output.json'
     tmp_input_file_flag = False
-    cur_path = ''
     cargo_lock_f = 'Cargo.lock'
 
     def __init__(self, input_dir, output_dir):
         super().__init__(self.package_manager_name, self.dn_url, input_dir, output_dir)
         self.append_input_package_list_file(self.input_file_name)
+        # Set by the lockfile engine: the same fields 'cargo metadata' gives, built from Cargo.lock.
+        self.lock_metadata = None
 
     def __del__(self):
         if self.tmp_input_file_flag:
-            os.remove(self.input_file_name)
+            os.remove(self.get_input_path(self.input_file_name))
 
     def run_plugin(self):
-        if os.path.exists(self.input_file_name):
+        if os.path.exists(self.get_input_path(self.input_file_name)):
             logger.info(f"Found {self.input_file_name}, skip the flutter cmd to analyze dependency.")
             return True
 
-        if not os.path.exists(const.SUPPORT_PACKAGE.get(self.package_manager_name)):
+        if not os.path.exists(self.get_input_path(const.SUPPORT_PACKAGE.get(self.package_manager_name))):
             logger.error(f"Cannot find the file({const.SUPPORT_PACKAGE.get(self.package_manager_name)})")
             return False
 
-        if os.path.exists(self.cargo_lock_f):
+        if self.engine == const.ENGINE_LOCKFILE:
+            return self.read_lockfile()
+        if not shutil.which('cargo'):
+            logger.warning("cargo is not available on this system")
+            if self.engine == const.ENGINE_AUTO and os.path.exists(self.get_input_path(self.cargo_lock_f)):
+                logger.info("It reads the lockfile instead.")
+                return self.read_lockfile()
+            return False
+
+        if os.path.exists(self.get_input_path(self.cargo_lock_f)):
             cmd = f'cargo metadata --locked --format-version 1 > {self.input_file_name}'
         else:
             cmd = f'cargo metadata --format-version 1 > {self.input_file_name}'
-        ret = subprocess.call(cmd, shell=True)
+        ret = subprocess.call(cmd, shell=True, cwd=self.input_dir)
         if ret != 0:
             logger.error(f"Failed to run: {cmd}")
-            os.chdir(self.cur_path)
+            if os.path.exists(self.get_input_path(self.input_file_name)):
+                os.remove(self.get_input_path(self.input_file_name))
+            # e.g. an older cargo that cannot read a newer Cargo.lock version
+            if self.engine == const.ENGINE_AUTO and os.path.exists(self.get_input_path(self.cargo_lock_f)):
+                logger.info("It reads the lockfile instead.")
+                return self.read_lockfile()
             return False
         self.tmp_input_file_flag = True
         return True
 
+    def read_lockfile(self):
+        lock_path = self.get_input_path(self.cargo_lock_f)
+        if not os.path.isfile(lock_path):
+            logger.error(f"{self.cargo_lock_f} is not found, so it cannot analyze without running cargo.")
+            return False
+        try:
+            with open(lock_path, 'rb') as f:
+                lock_toml = tomllib.load(f)
+            self.lock_metadata = get_lock_metadata(self.input_dir, lock_toml)
+        except Exception as e:
+            logger.error(f"Failed to read {self.cargo_lock_f}: {e}")
+            return False
+        logger.info(f"Analyze {self.cargo_lock_f} (version {lock_toml.get('version', 1)}) without running cargo.")
+        self.input_package_list_file = [self.cargo_lock_f]
+        return True
+
     def parse_oss_information(self, f_name):
         json_data = ''
 
-        with open(f_name, 'r', encoding='utf8') as cargo_file:
-            json_f = json.load(cargo_file)
+        if self.lock_metadata is not None:
+            json_f = self.lock_metadata
+        else:
+            with open(self.get_input_path(f_name), 'rb') as cargo_file:
+                json_f = load_cargo_metadata(cargo_file)
         try:
             purl_dict = {}
             workspace_members_key = 'workspace_members'
@@ -68,7 +115,7 @@ class Cargo(PackageManager):
             nodes_key = 'nodes'
             workspace_members = []
             root = ''
-            resolve_node = []
+            resolve_index = {}
 
             if workspace_members_key in json_f:
                 workspace_members = json_f[workspace_members_key]
@@ -77,9 +124,9 @@ class Cargo(PackageManager):
                 if root_key in json_f[resolve_key]:
                     root = json_f[resolve_key][root_key]
                 if nodes_key in json_f[resolve_key]:
-                    resolve_node = json_f[resolve_key][nodes_key]
-                if root and resolve_node:
-                    self.direct_dep_list.extend(get_matched_dependencies(root, resolve_node))
+                    resolve_index = get_resolve_index(json_f[resolve_key][nodes_key])
+                if root and resolve_index:
+                    self.direct_dep_list.extend(get_matched_dependencies(root, resolve_index))
             else:
                 self.direct_dep = False
                 logger.info('Cannot find dependencies relationship (no resolve nodes.)')
@@ -113,7 +160,7 @@ class Cargo(PackageManager):
                                 oss_item.comment = 'direct'
                             else:
                                 oss_item.comment = 'transitive'
-                    dep_item.depends_on_raw.extend(get_matched_dependencies(pkg_id, resolve_node))
+                    dep_item.depends_on_raw.extend(get_matched_dependencies(pkg_id, resolve_index))
 
                 dep_item.oss_items.append(oss_item)
                 self.dep_items.append(dep_item)
@@ -125,20 +172,173 @@ class Cargo(PackageManager):
         return
 
 
-def get_matched_dependencies(match_id, resolve_node):
-    dependencies_list = []
+def load_cargo_metadata(fp):
+    # Only the fields read above are kept. Most of 'cargo metadata' is the targets, features and
+    # dependency requirements of every package, which are skipped while the file is read.
+    json_f = {'packages': []}
+    patterns = [('packages', ANY), ('workspace_members',), ('resolve', 'root'), ('resolve', 'nodes', ANY)]
+    for path, value in iter_json_items(fp, patterns):
+        if path[0] == 'packages':
+            json_f['packages'].append({key: value.get(key) for key in cargo_package_fields})
+        elif path[0] == 'workspace_members':
+            json_f['workspace_members'] = value
+        elif path[1] == 'root':
+            json_f.setdefault('resolve', {'nodes': []})['root'] = value
+        else:
+            json_f.setdefault('resolve', {'nodes': []})['nodes'].append({'id': value['id'],
+                                                                         'dependencies': value['dependencies']})
+    return json_f
+
+
+def parse_package_id(pkg_id):
+    for pattern in _package_id_patterns:
+        match = pattern.match(pkg_id)
+        if match:
+            return f'{match.group(1)}({match.group(2)})'
+    return ''
+
+
+def get_resolve_index(resolve_node):
+    # {package id: ['name(version)' of its dependencies]}, built once per 'cargo metadata' output.
+    # A dependency id is parsed only the first time it appears.
+    parsed_ids = {}
+    resolve_index = {}
     for node in resolve_node:
-        if match_id == node['id']:
-            for dep_pkg in node['dependencies']:
-                try:
-                    match = re.findall(r'^.*#(\S*)@(\S*)', dep_pkg)
-                    dependencies_list.append(f'{match[0][0]}({match[0][1]})')
-                except Exception:
-                    try:
-                        match = re.findall(r'^(\S*)\s(\S*)\s', dep_pkg)
-                        dependencies_list.append(f'{match[0][0]}({match[0][1]})')
-                    except Exception:
-                        logger.info(f'cannot find name and version for dependencies: {match_id}')
-                        pass
+        if node['id'] in resolve_index:
+            continue
+        dependencies_list = []
+        for dep_pkg in node['dependencies']:
+            if dep_pkg not in parsed_ids:
+                parsed_ids[dep_pkg] = parse_package_id(dep_pkg)
+            if parsed_ids[dep_pkg]:
+                dependencies_list.append(parsed_ids[dep_pkg])
+            else:
+                logger.info(f'cannot find name and version for dependencies: {node["id"]}')
+        resolve_index[node['id']] = dependencies_list
+    return resolve_index
+
+
+def get_matched_dependencies(match_id, resolve_index):
+    return list(resolve_index.get(match_id, []))
+
+
+def get_cargo_home():
+    return os.environ.get('CARGO_HOME') or os.path.join(os.path.expanduser('~'), '.cargo')
+
+
+def read_cargo_toml(manifest_dir):
+    try:
+        with open(os.path.join(manifest_dir, 'Cargo.toml'), 'rb') as f:
+            return tomllib.load(f)
+    except (OSError, tomllib.TOMLDecodeError) as e:
+        logger.debug(f"Cannot read Cargo.toml in {manifest_dir}: {e}")
+        return {}
+
+
+def get_package_field(package, field, workspace_package):
+    # Fields can be inherited with '<field>.workspace = true'.
+    value = package.get(field)
+    if isinstance(value, dict) and value.get('workspace'):
+        value = workspace_package.get(field)
+    return value if isinstance(value, str) else None
+
+
+def get_workspace_packages(input_dir):
+    # {(name, version): (manifest dir, [package])} of the root package and the workspace members.
+    root_toml = read_cargo_toml(input_dir)
+    workspace = root_toml.get('workspace', {})
+    workspace_package = workspace.get('package', {})
+    manifest_dirs = [input_dir] if 'package' in root_toml else []
+    excluded = {os.path.normpath(os.path.join(input_dir, path)) for path in workspace.get('exclude', [])}
+    for member in workspace.get('members', []):
+        for member_dir in sorted(glob.glob(os.path.join(input_dir, member))):
+            member_dir = os.path.normpath(member_dir)
+            if member_dir not in excluded and member_dir not in manifest_dirs:
+                manifest_dirs.append(member_dir)
+
+    workspace_packages = {}
+    for manifest_dir in manifest_dirs:
+        package = (root_toml if manifest_dir == input_dir else read_cargo_toml(manifest_dir)).get('package')
+        if not package or not package.get('name'):
+            continue
+        # The version can be omitted since cargo 1.75 and then defaults to 0.0.0.
+        version = get_package_field(package, 'version', workspace_package) or '0.0.0'
+        workspace_packages[(package['name'], version)] = (manifest_dir, {
+            'license': get_package_field(package, 'license', workspace_package),
+            'repository': get_package_field(package, 'repository', workspace_package)})
+    return workspace_packages
+
+
+def get_registry_package(name, version):
+    # license and repository of a crate from the local registry sources or the downloaded .crate file.
+    registry_dir = glob.escape(os.path.join(get_cargo_home(), 'registry'))
+    crate_name = glob.escape(f'{name}-{version}')
+    package = {}
+    for manifest_dir in glob.glob(os.path.join(registry_dir, 'src', '*', crate_name)):
+        package = read_cargo_toml(manifest_dir).get('package', {})
+        if package:
             break
-    return dependencies_list
+    else:
+        for crate_file in glob.glob(os.path.join(registry_dir, 'cache', '*', f'{crate_name}.crate')):
+            try:
+                with tarfile.open(crate_file, 'r:gz') as crate:
+                    manifest = crate.extractfile(f'{name}-{version}/Cargo.toml').read().decode('utf-8')
+                package = tomllib.loads(manifest).get('package', {})
+                break
+            except (OSError, KeyError, AttributeError, UnicodeDecodeError, tarfile.TarError, tomllib.TOMLDecodeError) as e:
+                logger.debug(f"Cannot read Cargo.toml in {crate_file}: {e}")
+    return {'license': get_package_field(package, 'license', {}),
+            'repository': get_package_field(package, 'repository', {})}
+
+
+def get_lock_package_id(package, manifest_dir=''):
+    # Same form as the package ids of 'cargo metadata' since cargo 1.77.
+    source = package.get('source') or f'path+file://{manifest_dir}'
+    return f"{source}#{package['name']}@{package['version']}"
+
+
+def get_lock_metadata(input_dir, lock_toml):
+    # Cargo.lock v1-v4 gives the resolved packages and their dependency edges. A dependency is written as
+    # 'name', 'name version' or 'name version (source)', with only as much as is needed to tell it apart.
+    input_dir = os.path.abspath(input_dir)
+    lock_packages = lock_toml.get('package', [])
+    workspace_packages = get_workspace_packages(input_dir)
+    lock_ids = []
+    packages_by_name = {}
+    for package in lock_packages:
+        manifest_dir = ''
+        if not package.get('source'):
+            manifest_dir = workspace_packages.get((package['name'], package['version']), (input_dir, {}))[0]
+        lock_ids.append(get_lock_package_id(package, manifest_dir))
+        packages_by_name.setdefault(package['name'], []).append((package, lock_ids[-1]))
+
+    def resolve_dependency(dependency):
+        match = re.match(r'^(\S+)(?:\s+(\S+))?(?:\s+\((.+)\))?$', dependency)
+        if not match:
+            return ''
+        name, version, source = match.groups()
+        for package, pkg_id in packages_by_name.get(name, []):
+            if version and package['version'] != version:
+                continue
+            if source and package.get('source') != source:
+                continue
+            return pkg_id
+        return ''
+
+    json_f = {'packages': [], 'workspace_members': [], 'resolve': {'root': None, 'nodes': []}}
+    root_package = read_cargo_toml(input_dir).get('package', {})
+    for package, pkg_id in zip(lock_packages, lock_ids):
+        name, version = package['name'], package['version']
+        if package.get('source'):
+            info = get_registry_package(name, version) if package['source'].startswith(('registry+', 'sparse+')) else {}
+        else:
+            manifest_dir, info = workspace_packages.get((name, version), ('', {}))
+            if manifest_dir:
+                json_f['workspace_members'].append(pkg_id)
+                if manifest_dir == input_dir and name == root_package.get('name'):
+                    json_f['resolve']['root'] = pkg_id
+        json_f['packages'].append({'id': pkg_id, 'name': name, 'version': version,
+                                   'repository': info.get('repository'), 'license': info.get('license')})
+        dependencies = [resolve_dependency(dependency) for dependency in package.get('dependencies', [])]
+        json_f['resolve']['nodes'].append({'id': pkg_id, 'dependencies': [dep_id for dep_id in dependencies if dep_id]})
+    return json_f
@@ -10,7 +10,7 @@ import fosslight_util.constant as constant
 import fosslight_dependency.constant as const
 from fosslight_dependency._package_manager import PackageManager
 from fosslight_dependency._package_manager import connect_github, get_github_license
-from fosslight_dependency._package_manager import get_url_to_purl, check_license_name
+from fosslight_dependency._package_manager import get_url_to_purl, check_license_name, prefetch_license_names
 from fosslight_dependency.dependency_item import DependencyItem
 from fosslight_util.oss_item import OssItem
 
@@ -34,11 +34,28 @@ class Carthage(PackageManager):
         self.github_token = github_token
         self.append_input_package_list_file(self.input_file_name)
 
+    def find_license_file(self, oss_origin_name):
+        oss_path_in_checkout = self.get_input_path(checkout_dir, oss_origin_name)
+        for filename_in_dir in os.listdir(oss_path_in_checkout):
+            filename_with_checkout_path = os.path.join(oss_path_in_checkout, filename_in_dir)
+            if os.path.isfile(filename_with_checkout_path):
+                for license_file_reg in license_file_regs:
+                    if re.match(license_file_reg, filename_in_dir.lower()) is not None:
+                        return filename_with_checkout_path
+        return ''
+
     def parse_oss_information(self, f_name):
         github = "github"
-        checkout_dir_list = get_checkout_dirname()
-
-        with open(f_name, 'r', encoding='utf8') as input_fp:
+        checkout_dir_list = get_checkout_dirname(self.input_dir)
+        license_file_dict = {}
+        for oss_origin_name in checkout_dir_list:
+            try:
+                license_file_dict[oss_origin_name] = self.find_license_file(oss_origin_name)
+            except Exception as e:
+                logger.debug(f"Failed to find license file of {oss_origin_name}: {e}")
+        prefetch_license_names(license_files=[f for f in license_file_dict.values() if f])
+
+        with open(self.get_input_path(f_name), 'r', encoding='utf8') as input_fp:
             g = ''
             if not checkout_dir_list:
                 g = connect_github(self.github_token)
@@ -68,20 +85,9 @@ class Carthage(PackageManager):
                                                     oss_origin_name, oss_item.version)
 
                     license_name = ''
-                    find_license = False
-                    if oss_origin_name in checkout_dir_list:
-                        oss_path_in_checkout = os.path.join(checkout_dir, oss_origin_name)
-                        for filename_in_dir in os.listdir(oss_path_in_checkout):
-                            if find_license:
-                                break
-                            filename_with_checkout_path = os.path.join(oss_path_in_checkout, filename_in_dir)
-                            if os.path.isfile(filename_with_checkout_path):
-                                for license_file_reg in license_file_regs:
-                                    match_result = re.match(license_file_reg, filename_in_dir.lower())
-                                    if match_result is not None:
-                                        license_name = check_license_name(filename_with_checkout_path, True)
-                                        find_license = True
-                                        break
+                    license_file = license_file_dict.get(oss_origin_name, '')
+                    if license_file:
+                        license_name = check_license_name(license_file, True)
                     if license_name == '':
                         if repo == github:
                             try:
@@ -105,7 +111,7 @@ class Carthage(PackageManager):
 
     def parse_direct_dependencies(self):
         self.direct_dep = True
-        cartfile = 'Cartfile'
+        cartfile = self.get_input_path('Cartfile')
         if os.path.exists(cartfile):
             with open(cartfile, 'r', encoding='utf8') as input_fp:
                 for i, line in enumerate(input_fp.readlines()):
@@ -120,11 +126,12 @@ class Carthage(PackageManager):
                         logger.warning(f"Failed to parse Cartfile: {e}")
 
 
-def get_checkout_dirname():
+def get_checkout_dirname(input_dir):
     checkout_dir_list = []
-    if os.path.isdir(checkout_dir):
-        for item in os.listdir(checkout_dir):
-            if os.path.isdir(os.path.join(checkout_dir, item)):
+    checkout_path = os.path.join(input_dir, checkout_dir)
+    if os.path.isdir(checkout_path):
+        for item in os.listdir(checkout_path):
+            if os.path.isdir(os.path.join(checkout_path, item)):
                 checkout_dir_list.append(item)
 
     return checkout_dir_list
@@ -7,6 +7,7 @@ import os
 import logging
 import json
 import shutil
+import subprocess
 import yaml
 import re
 import fosslight_util.constant as constant
@@ -40,7 +41,7 @@ class Cocoapods(PackageManager):
         return True
 
     def parse_oss_information(self, f_name):
-        with open(f_name, 'r', encoding='utf8') as input_fp:
+        with open(self.get_input_path(f_name), 'r', encoding='utf8') as input_fp:
             podfile_yaml = yaml.load(input_fp, Loader=yaml.FullLoader)
 
         spec_repo_list = []
@@ -109,7 +110,7 @@ class Cocoapods(PackageManager):
                 if pod_oss_name in external_source_list:
                     oss_item.name = pod_oss_name_origin
                     podspec_filename = pod_oss_name + '.podspec.json'
-                    spec_file_path = os.path.join("Pods", "Local Podspecs", podspec_filename)
+                    spec_file_path = self.get_input_path("Pods", "Local Podspecs", podspec_filename)
                 else:
                     search_oss_name = ""
                     for alphabet_oss in pod_oss_name:
@@ -119,7 +120,8 @@ class Cocoapods(PackageManager):
                             search_oss_name += alphabet_oss
 
                     command = f"pod spec which --regex ^{search_oss_name}$"
-                    spec_which = os.popen(command).readline()
+                    spec_which = subprocess.run(command, shell=True, capture_output=True, text=True,
+                                                cwd=self.input_dir).stdout.split('\n')[0]
                     if spec_which.startswith('[!]'):
                         logger.warning(f"This command({command}) returns an error")
                         continue
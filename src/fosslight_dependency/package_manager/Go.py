@@ -4,21 +4,34 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import os
+import io
 import logging
 import subprocess
 import json
+import fnmatch
 from bs4 import BeautifulSoup
-import urllib.request
 import re
 import shutil
-import time
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 import fosslight_util.constant as constant
 import fosslight_dependency.constant as const
 from fosslight_dependency._package_manager import PackageManager, get_url_to_purl
+from fosslight_dependency._package_manager import get_registry_url, http_get, set_http_rate_limit, REGISTRY_URL, GO_PROXY
+from fosslight_dependency._package_manager import identify_license_texts, get_license_text_key
+from fosslight_dependency._json_stream import iter_json_values, stream_command_output
+from fosslight_dependency._metadata_cache import get_cached_metadata, set_cached_metadata, GO_PKGSITE, GO_PROXY_INFO
 from fosslight_dependency.dependency_item import DependencyItem, change_dependson_to_purl
 from fosslight_util.oss_item import OssItem
 
 logger = logging.getLogger(constant.LOGGER_NAME)
+# LICENSE, LICENSE.md, LICENSE-MIT, COPYING, ...
+go_license_file_re = re.compile(r'^(licen[cs]e|copying)([-._][^/]*)?$', re.IGNORECASE)
+go_repository_hosts = ('github.com', 'gitlab.com', 'bitbucket.org')
+# Requests per second to the module proxy.
+GO_PROXY_RATE = 20
+GO_PROXY_ENV = ('GOPROXY', 'GOPRIVATE', 'GONOPROXY')
 
 
 class Go(PackageManager):
@@ -27,7 +40,6 @@ class Go(PackageManager):
     input_file_name = ''
     is_run_plugin = False
     dn_url = 'https://pkg.go.dev/'
-    tmp_file_name = 'tmp_go_list.json'
     go_work = 'go.work'
     tmp_go_work = 'go.work.tmp'
 
@@ -35,24 +47,15 @@ class Go(PackageManager):
         super().__init__(self.package_manager_name, self.dn_url, input_dir, output_dir)
         self.input_file_name = ''
         self.is_run_plugin = False
+        self.go_modules = []
 
     def __del__(self):
-        if os.path.isfile(self.tmp_file_name):
-            os.remove(self.tmp_file_name)
-        if os.path.isfile(self.tmp_go_work):
-            shutil.move(self.tmp_go_work, self.go_work)
+        if os.path.isfile(self.get_input_path(self.tmp_go_work)):
+            shutil.move(self.get_input_path(self.tmp_go_work), self.get_input_path(self.go_work))
 
     def parse_dependency_tree(self, go_deptree_txt):
-        for line in go_deptree_txt.split('\n'):
-            re_result = re.findall(r'(\S+)@v(\S+)\s(\S+)@v(\S+)', line)
-            if len(re_result) > 0 and len(re_result[0]) >= 4:
-                oss_name = re_result[0][0]
-                oss_ver = re_result[0][1]
-                pkg_name = re_result[0][2]
-                pkg_ver = re_result[0][3]
-                if f'{oss_name}({oss_ver})' not in self.relation_tree:
-                    self.relation_tree[f'{oss_name}({oss_ver})'] = []
-                self.relation_tree[f'{oss_name}({oss_ver})'].append(f'{pkg_name}({pkg_ver})')
+        for parent, children in parse_mod_graph(go_deptree_txt.splitlines()).items():
+            self.relation_tree.setdefault(parent, []).extend(children)
 
     def run_plugin(self):
         go_cmd = shutil.which("go")
@@ -61,51 +64,47 @@ class Go(PackageManager):
             return False
 
         moved_go_work = False
+        go_work_path = self.get_input_path(self.go_work)
+        tmp_go_work_path = self.get_input_path(self.tmp_go_work)
         try:
-            if os.path.isfile(self.go_work):
-                shutil.move(self.go_work, self.tmp_go_work)
+            if os.path.isfile(go_work_path):
+                shutil.move(go_work_path, tmp_go_work_path)
                 moved_go_work = True
 
             logger.info("Execute 'go list -m -mod=mod -json all' to obtain package info.")
-            cmd = f"go list -m -mod=mod -json all > {self.tmp_file_name}"
-
-            ret_cmd = subprocess.call(cmd, shell=True)
+            cmd = "go list -m -mod=mod -json all"
+            try:
+                ret_cmd, stderr, self.go_modules = stream_command_output(cmd, read_go_modules, cwd=self.input_dir)
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to read the result of {cmd}: {e}")
+                return False
             if ret_cmd != 0:
-                logger.error(f"Failed to make the result: {cmd}")
+                logger.error(f"Failed to make the result: {cmd}, stderr: {stderr}")
                 return False
 
-            self.append_input_package_list_file(self.tmp_file_name)
+            # The modules are read from the output of 'go list', which resolves them from go.mod.
+            self.append_input_package_list_file(const.SUPPORT_PACKAGE[const.GO])
 
             cmd_tree = "go mod graph"
-            ret_cmd_tree = subprocess.check_output(cmd_tree, shell=True, text=True, encoding='utf-8')
+            ret_cmd_tree = subprocess.check_output(cmd_tree, shell=True, text=True, encoding='utf-8', cwd=self.input_dir)
             if ret_cmd_tree:
                 self.parse_dependency_tree(ret_cmd_tree)
 
             return True
 
         finally:
-            if moved_go_work and os.path.isfile(self.tmp_go_work):
-                shutil.move(self.tmp_go_work, self.go_work)
+            if moved_go_work and os.path.isfile(tmp_go_work_path):
+                shutil.move(tmp_go_work_path, go_work_path)
 
     def parse_oss_information(self, f_name):
         indirect = 'Indirect'
         purl_dict = {}
-        json_list = []
-        with open(f_name, 'r', encoding='utf8') as input_fp:
-            json_data_raw = ''
-            for line in input_fp.readlines():
-                json_data_raw += line
-                if line.startswith('}'):
-                    json_list.append(json.loads(json_data_raw))
-                    json_data_raw = ''
-
+        json_list = [dep_i for dep_i in self.go_modules if not dep_i.get('Main')]
+        module_infos = self.get_module_infos(json_list)
         for dep_i in json_list:
             dep_item = DependencyItem()
             oss_item = OssItem()
             try:
-                if 'Main' in dep_i:
-                    if dep_i['Main']:
-                        continue
                 package_path = dep_i['Path']
                 oss_item.name = f"{self.package_manager_name}:{package_path}"
                 oss_origin_version = dep_i['Version']
@@ -136,46 +135,23 @@ class Go(PackageManager):
                     dn_loc_set.append(oss_item.download_location)
                 dn_loc_set.append(tmp_dn_loc)
 
-                for dn_loc_i in dn_loc_set:
-                    urlopen_success = False
-                    while True:
-                        try:
-                            res = urllib.request.urlopen(dn_loc_i)
-                            if res.getcode() == 200:
-                                urlopen_success = True
-                                if dn_loc_i == tmp_dn_loc:
-                                    if oss_item.version:
-                                        oss_item.comment = (f'Not found {oss_item.download_location}, '
-                                                            'get info from latest version.')
-                                        oss_item.download_location = tmp_dn_loc
-                                break
-                        except urllib.error.HTTPError as e:
-                            if e.code == 429:
-                                logger.info(f"{e} ({dn_loc_i}), Retrying to connect after 20 seconds")
-                                time.sleep(20)
-                                continue
-                            else:
-                                logger.info(f"{e} ({dn_loc_i})")
-                                break
-                        except Exception as e:
-                            logger.warning(f"{e} ({dn_loc_i})")
-                            break
-                    if urlopen_success:
-                        break
-
-                if urlopen_success:
-                    content = res.read().decode('utf8')
-                    bs_obj = BeautifulSoup(content, 'html.parser')
-
-                    license_data = bs_obj.find('a', {'data-test-id': 'UnitHeader-license'})
-                    if license_data:
-                        oss_item.license = license_data.text
-
-                    repository_data = bs_obj.find('div', {'class': 'UnitMeta-repo'})
-                    if repository_data:
-                        oss_item.homepage = repository_data.find('a')['href']
-                    else:
-                        oss_item.homepage = oss_item.download_location
+                module_info = module_infos.get((package_path, oss_origin_version))
+                if module_info and module_info.get('license'):
+                    oss_item.license = module_info['license']
+                    oss_item.homepage = (module_info.get('homepage') or get_repository_url(package_path)
+                                         or oss_item.download_location)
+                    module_info = None
+                else:
+                    # pkg.go.dev pages are the last resort, for modules neither the module cache nor the proxy has.
+                    module_info = get_cached_metadata(dep_item.purl, GO_PKGSITE)
+                    if module_info is None:
+                        module_info = self.get_info_from_pkgsite(dn_loc_set, tmp_dn_loc, oss_item)
+                        if module_info is not None:
+                            set_cached_metadata(dep_item.purl, GO_PKGSITE, module_info)
+                if module_info:
+                    for field in ('comment', 'download_location', 'license', 'homepage'):
+                        if field in module_info:
+                            setattr(oss_item, field, module_info[field])
 
             except Exception as e:
                 logging.warning(f"Fail to parse {package_path} in go mod : {e}")
@@ -185,3 +161,268 @@ class Go(PackageManager):
         if self.direct_dep:
             self.dep_items = change_dependson_to_purl(purl_dict, self.dep_items)
         return
+
+    def get_module_infos(self, json_list):
+        # {(path, version): {'license', 'homepage'}} from the module cache first and then from the module proxy.
+        module_infos = {}
+        module_texts = {}
+        remote_modules = []
+        for dep_i in json_list:
+            module_key = (dep_i.get('Path'), dep_i.get('Version'))
+            # A replaced module is read from its replacement, which is a local directory if it has no version.
+            source = dep_i.get('Replace') or dep_i
+            license_texts, homepage = get_local_module_info(source)
+            if license_texts:
+                module_texts[module_key] = license_texts
+                module_infos[module_key] = {'homepage': homepage}
+            elif source.get('Path') and source.get('Version'):
+                remote_modules.append((module_key, (source['Path'], source['Version'])))
+
+        go_env = get_go_env(self.input_dir)
+        proxy_url = get_go_proxy_url(go_env)
+        uncached_modules = []
+        for module_key, source_key in remote_modules:
+            if is_private_module(source_key[0], go_env):
+                continue
+            cached = get_cached_metadata(get_module_purl(*source_key), GO_PROXY_INFO)
+            if cached is None:
+                uncached_modules.append((module_key, source_key))
+            else:
+                module_infos[module_key] = cached
+        fetched = {}
+        if uncached_modules and proxy_url:
+            set_http_rate_limit(proxy_url, GO_PROXY_RATE, GO_PROXY_RATE)
+            logger.info(f"Get license info of {len(uncached_modules)} modules from {proxy_url}")
+            with ThreadPoolExecutor(max_workers=min(self.registry_jobs, len(uncached_modules))) as executor:
+                proxy_infos = executor.map(lambda module: get_proxy_module_info(proxy_url, *module[1]), uncached_modules)
+                for (module_key, source_key), (license_texts, homepage) in zip(uncached_modules, proxy_infos):
+                    if license_texts is None:
+                        continue
+                    module_texts[module_key] = license_texts
+                    module_infos[module_key] = {'homepage': homepage}
+                    fetched[module_key] = source_key
+
+        license_names = identify_license_texts([text for texts in module_texts.values() for text in texts])
+        for module_key, license_texts in module_texts.items():
+            names = [license_names[get_license_text_key(text)] for text in license_texts]
+            module_infos[module_key]['license'] = ','.join(dict.fromkeys(name for name in names if name))
+            if module_key in fetched:
+                set_cached_metadata(get_module_purl(*fetched[module_key]), GO_PROXY_INFO, module_infos[module_key])
+        return module_infos
+
+    def get_info_from_pkgsite(self, dn_loc_set, tmp_dn_loc, oss_item):
+        pkgsite_info = {}
+        for dn_loc_i in dn_loc_set:
+            urlopen_success = False
+            fetch_url = get_registry_url(const.GO) + dn_loc_i[len(self.dn_url):]
+            try:
+                res = http_get(fetch_url)
+                if res.status_code == 200:
+                    urlopen_success = True
+                    if dn_loc_i == tmp_dn_loc:
+                        if oss_item.version:
+                            pkgsite_info['comment'] = (f'Not found {oss_item.download_location}, '
+                                                       'get info from latest version.')
+                            pkgsite_info['download_location'] = tmp_dn_loc
+                else:
+                    logger.info(f"HTTP Error {res.status_code} ({dn_loc_i})")
+            except Exception as e:
+                logger.warning(f"{e} ({dn_loc_i})")
+            if urlopen_success:
+                break
+
+        if not urlopen_success:
+            return None
+
+        bs_obj = BeautifulSoup(res.text, 'html.parser')
+
+        license_data = bs_obj.find('a', {'data-test-id': 'UnitHeader-license'})
+        if license_data:
+            pkgsite_info['license'] = license_data.text
+
+        repository_data = bs_obj.find('div', {'class': 'UnitMeta-repo'})
+        if repository_data:
+            pkgsite_info['homepage'] = repository_data.find('a')['href']
+        else:
+            pkgsite_info['homepage'] = pkgsite_info.get('download_location', oss_item.download_location)
+        return pkgsite_info
+
+
+def read_go_modules(fp):
+    # Module records of 'go list -m -json', decoded one by one as the command prints them.
+    return [module for module in iter_json_values(io.TextIOWrapper(fp, encoding='utf-8'))
+            if isinstance(module, dict)]
+
+
+def get_mod_graph_node_key(node):
+    # 'path@vX.Y.Z' becomes 'path(X.Y.Z)', the key of relation_tree. Main modules are printed without a version
+    # and are keyed by their path; the go and toolchain pseudo-modules ('go@1.21') have no 'v' and are skipped.
+    path, sep, version = node.rpartition('@')
+    if not sep:
+        return node
+    if not version.startswith('v'):
+        return None
+    return f'{path}({version[1:]})'
+
+
+def parse_mod_graph(lines):
+    # {parent key: [child keys]} of the 'parent child' lines of 'go mod graph'. A module is on many lines,
+    # so each distinct node is converted once and its key string is shared by every list it is in.
+    mod_graph = {}
+    node_keys = {}
+    for line in lines:
+        nodes = line.split()
+        if len(nodes) != 2:
+            continue
+        keys = []
+        for node in nodes:
+            key = node_keys.get(node, node_keys)
+            if key is node_keys:
+                key = node_keys[node] = get_mod_graph_node_key(node)
+            keys.append(key)
+        parent, child = keys
+        if parent is None or child is None:
+            continue
+        children = mod_graph.get(parent)
+        if children is None:
+            children = mod_graph[parent] = []
+        children.append(child)
+    return mod_graph
+
+
+def escape_module_path(module_path):
+    # Upper case letters are written as '!' and the lower case letter in module cache and proxy paths.
+    return re.sub(r'[A-Z]', lambda m: f'!{m.group(0).lower()}', module_path)
+
+
+def get_module_purl(module_path, version):
+    return f'pkg:golang/{module_path}@{version}'
+
+
+def get_go_env(cwd=None):
+    # The effective GOPROXY, GOPRIVATE and GONOPROXY, including the 'go env -w' settings that are not in os.environ.
+    cmd = f"go env -json {' '.join(GO_PROXY_ENV)}"
+    try:
+        ret = subprocess.run(cmd, shell=True, capture_output=True, text=True, encoding='utf-8', cwd=cwd)
+        if ret.returncode == 0:
+            return json.loads(ret.stdout)
+        logger.debug(f"Failed to run {cmd}: {ret.stderr}")
+    except (OSError, ValueError) as e:
+        logger.debug(f"Failed to run {cmd}: {e}")
+    return {name: os.environ.get(name, '') for name in GO_PROXY_ENV}
+
+
+def get_go_proxy_url(go_env):
+    # FOSSLIGHT_GO_PROXY_URL, else the first proxy in GOPROXY, else proxy.golang.org if GOPROXY is not set.
+    # A GOPROXY without any proxy ('off', 'direct') means that modules are not fetched from a proxy.
+    goproxy = go_env.get('GOPROXY', '').strip()
+    if os.environ.get(REGISTRY_URL[GO_PROXY][0]) or not goproxy:
+        return get_registry_url(GO_PROXY)
+    for proxy in re.split(r'[,|]', goproxy):
+        proxy = proxy.strip()
+        if proxy == 'off':
+            return ''
+        if proxy.startswith(('https://', 'http://')):
+            return proxy if proxy.endswith('/') else f'{proxy}/'
+    return ''
+
+
+def is_private_module(module_path, go_env):
+    # GONOPROXY, which defaults to GOPRIVATE: comma-separated glob patterns matched against path prefixes,
+    # as 'go help private' describes. These modules are never requested from a proxy.
+    patterns = go_env.get('GONOPROXY') or go_env.get('GOPRIVATE') or ''
+    path_elements = module_path.split('/')
+    for pattern in patterns.split(','):
+        pattern_elements = pattern.strip().strip('/').split('/')
+        if not pattern_elements[0] or len(pattern_elements) > len(path_elements):
+            continue
+        if all(fnmatch.fnmatchcase(element, pattern_element)
+               for element, pattern_element in zip(path_elements, pattern_elements)):
+            return True
+    return False
+
+
+def is_license_file(file_name):
+    return bool(go_license_file_re.match(file_name))
+
+
+def get_repository_url(module_path):
+    segments = module_path.split('/')
+    if segments[0] in go_repository_hosts and len(segments) >= 3:
+        return f'https://{"/".join(segments[:3])}'
+    if segments[0] == 'golang.org' and len(segments) >= 3 and segments[1] == 'x':
+        return f'https://go.googlesource.com/{segments[2]}'
+    return ''
+
+
+def get_origin_url(info_json):
+    # Go 1.19+ records where a module version came from in its .info file.
+    origin = info_json.get('Origin') if isinstance(info_json, dict) else None
+    url = origin.get('URL', '') if isinstance(origin, dict) else ''
+    return url[:-4] if url.endswith('.git') else url
+
+
+def read_zip_license_texts(zip_fp, module_path, version):
+    # Files of a module zip are under 'module@version/'; only the license files at its root are read.
+    license_texts = []
+    prefix = f'{module_path}@{version}/'
+    with zipfile.ZipFile(zip_fp) as module_zip:
+        for name in sorted(module_zip.namelist()):
+            if name.startswith(prefix) and '/' not in name[len(prefix):] and is_license_file(name[len(prefix):]):
+                license_texts.append(module_zip.read(name).decode('utf-8', errors='replace'))
+    return license_texts
+
+
+def get_local_module_info(dep_i):
+    # License texts and repository URL from the module cache, as 'go list -m -json' points into it.
+    license_texts = []
+    homepage = ''
+    module_dir = dep_i.get('Dir', '')
+    if module_dir and os.path.isdir(module_dir):
+        for file_name in sorted(os.listdir(module_dir)):
+            file_path = os.path.join(module_dir, file_name)
+            if is_license_file(file_name) and os.path.isfile(file_path):
+                try:
+                    with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+                        license_texts.append(f.read())
+                except OSError as e:
+                    logger.debug(f"Cannot read {file_path}: {e}")
+
+    go_mod = dep_i.get('GoMod', '')
+    if go_mod.endswith('.mod') and os.path.isfile(go_mod):
+        download_base = go_mod[:-len('.mod')]
+        try:
+            with open(f'{download_base}.info', 'r', encoding='utf-8') as f:
+                homepage = get_origin_url(json.load(f))
+        except (OSError, ValueError):
+            pass
+        if not license_texts and os.path.isfile(f'{download_base}.zip'):
+            try:
+                license_texts = read_zip_license_texts(f'{download_base}.zip', dep_i['Path'], dep_i['Version'])
+            except (OSError, zipfile.BadZipFile) as e:
+                logger.debug(f"Cannot read {download_base}.zip: {e}")
+    return license_texts, homepage
+
+
+def get_proxy_module_info(proxy_url, module_path, version):
+    # Returns (license texts, repository URL), or (None, '') if the proxy does not have the module.
+    base_url = f'{proxy_url}{escape_module_path(module_path)}/@v/{escape_module_path(version)}'
+    homepage = ''
+    try:
+        res = http_get(f'{base_url}.info')
+        if res.status_code != 200:
+            logger.debug(f"HTTP Error {res.status_code} ({base_url}.info)")
+            return None, ''
+        homepage = get_origin_url(res.json())
+        with tempfile.TemporaryFile() as zip_fp:
+            res = http_get(f'{base_url}.zip', stream=True)
+            if res.status_code != 200:
+                logger.debug(f"HTTP Error {res.status_code} ({base_url}.zip)")
+                return None, homepage
+            for chunk in res.iter_content(chunk_size=1024 * 1024):
+                zip_fp.write(chunk)
+            zip_fp.seek(0)
+            return read_zip_license_texts(zip_fp, module_path, version), homepage
+    except Exception as e:
+        logger.debug(f"Fail to get {module_path}@{version} from the module proxy: {e}")
+        return None, homepage
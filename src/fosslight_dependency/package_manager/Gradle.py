@@ -36,7 +36,7 @@ class Gradle(PackageManager):
         self.append_input_package_list_file(self.input_file_name)
 
     def parse_oss_information(self, f_name):
-        with open(f_name, 'r', encoding='utf8') as json_file:
+        with open(self.get_input_path(f_name), 'r', encoding='utf8') as json_file:
             json_data = json.load(json_file)
 
         purl_dict = {}
@@ -29,19 +29,21 @@ class Helm(PackageManager):
         self.append_input_package_list_file(self.input_file_name)
 
     def __del__(self):
-        if os.path.exists(self.tmp_charts_dir):
-            shutil.rmtree(self.tmp_charts_dir, ignore_errors=True)
+        tmp_charts_path = self.get_input_path(self.tmp_charts_dir)
+        if os.path.exists(tmp_charts_path):
+            shutil.rmtree(tmp_charts_path, ignore_errors=True)
 
     def run_plugin(self):
         ret = True
-        charts_dir = 'charts'
+        charts_dir = self.get_input_path('charts')
+        tmp_charts_path = self.get_input_path(self.tmp_charts_dir)
         if os.path.isdir(charts_dir):
-            shutil.copytree(charts_dir, self.tmp_charts_dir)
+            shutil.copytree(charts_dir, tmp_charts_path)
         else:
             logger.info("Execute 'helm dependency build' to obtain package info.")
             cmd = "helm dependency build"
 
-            ret_cmd = subprocess.call(cmd, shell=True)
+            ret_cmd = subprocess.call(cmd, shell=True, cwd=self.input_dir)
             if ret_cmd != 0:
                 logger.error(f"Failed to build helm dependency: {cmd}")
                 ret = False
@@ -51,10 +53,10 @@ class Helm(PackageManager):
                                    f"So you don't need to analyze dependency.")
                     return True
                 else:
-                    shutil.copytree(charts_dir, self.tmp_charts_dir)
+                    shutil.copytree(charts_dir, tmp_charts_path)
                     shutil.rmtree(charts_dir, ignore_errors=True)
         if ret:
-            ret = extract_compressed_dir(self.tmp_charts_dir, self.tmp_charts_dir, False)
+            ret = extract_compressed_dir(tmp_charts_path, tmp_charts_path, False)
             if not ret:
                 logger.error(f'Fail to extract compressed dir: {self.tmp_charts_dir}')
             else:
@@ -66,14 +68,14 @@ class Helm(PackageManager):
         dep_item_list = []
         _dependencies = 'dependencies'
 
-        with open(f_name, 'r', encoding='utf8') as yaml_fp:
+        with open(self.get_input_path(f_name), 'r', encoding='utf8') as yaml_fp:
             yaml_f = yaml.safe_load(yaml_fp)
             if _dependencies in yaml_f:
                 for dep in yaml_f[_dependencies]:
                     dep_item_list.append(dep['name'])
         for dep in dep_item_list:
             try:
-                f_path = os.path.join(self.tmp_charts_dir, dep, f_name)
+                f_path = self.get_input_path(self.tmp_charts_dir, dep, f_name)
                 dep_item = DependencyItem()
                 oss_item = OssItem()
                 with open(f_path, 'r', encoding='utf8') as yaml_fp:
@@ -7,19 +7,29 @@ import os
 import logging
 import subprocess
 import shutil
+import tempfile
 from bs4 import BeautifulSoup as bs
 from defusedxml.ElementTree import parse
 import re
-from pathlib import Path
+import sys
+from collections import deque
 import fosslight_util.constant as constant
 import fosslight_dependency.constant as const
 from fosslight_dependency._package_manager import PackageManager
 from fosslight_dependency._package_manager import version_refine, get_url_to_purl, change_file_mode, get_download_location
 from fosslight_dependency.dependency_item import DependencyItem, change_dependson_to_purl
+from fosslight_dependency._metadata_cache import get_cached_metadata, set_cached_metadata, MAVEN_POM_LICENSE
+from fosslight_dependency._maven_repository import get_local_maven_repository
 from fosslight_util.get_pom_license import get_license_from_pom
 from fosslight_util.oss_item import OssItem
 
 logger = logging.getLogger(constant.LOGGER_NAME)
+MAVEN_CENTRAL_URL = 'https://repo.maven.apache.org/maven2'
+GOOGLE_MAVEN_HOSTS = ('maven.google.com', 'dl.google.com')
+# Batch mode, with the artifact transfer lines that the source download URLs are parsed from.
+MVN_TRANSFER_LOG_FLAGS = "-B -Dorg.slf4j.simpleLogger.log.org.apache.maven.cli.transfer.Slf4jMavenTransferListener=info"
+MVN_TRANSFER_LINE_MARKERS = ('Resolving ', 'Downloading from', 'Downloaded from')
+MVN_ERROR_TAIL_LINES = 30
 
 
 class Maven(PackageManager):
@@ -34,6 +44,8 @@ class Maven(PackageManager):
         super().__init__(self.package_manager_name, self.dn_url, input_dir, output_dir)
         self.is_run_plugin = False
         self.download_url_map = {}
+        self.source_urls_collected = False
+        self.repo_map = None
 
         if output_custom_dir:
             self.output_custom_dir = output_custom_dir
@@ -50,8 +62,8 @@ class Maven(PackageManager):
             return False
 
         ret = True
-        if not os.path.isfile(self.input_file_name):
-            pom_backup = 'pom.xml_backup'
+        if not os.path.isfile(self.get_input_path(self.input_file_name)):
+            pom_backup = self.get_input_path('pom.xml_backup')
 
             ret = self.add_plugin_in_pom(pom_backup)
             if ret:
@@ -60,7 +72,7 @@ class Maven(PackageManager):
                     self.is_run_plugin = True
 
             if os.path.isfile(pom_backup):
-                shutil.move(pom_backup, const.SUPPORT_PACKAGE.get(self.package_manager_name))
+                shutil.move(pom_backup, self.get_input_path(const.SUPPORT_PACKAGE.get(self.package_manager_name)))
         else:
             self.set_direct_dependencies(False)
 
@@ -71,7 +83,7 @@ class Maven(PackageManager):
         xml = 'xml'
         f_content = None
 
-        manifest_file = const.SUPPORT_PACKAGE.get(self.package_manager_name)
+        manifest_file = self.get_input_path(const.SUPPORT_PACKAGE.get(self.package_manager_name))
         if os.path.isfile(manifest_file) != 1:
             logger.error(f"{manifest_file} is not existed in this directory.")
             return ret
@@ -132,64 +144,82 @@ class Maven(PackageManager):
         return ret
 
     def clean_run_maven_plugin_output(self):
-        directory_name = os.path.dirname(self.input_file_name)
+        input_file_path = self.get_input_path(self.input_file_name)
+        directory_name = os.path.dirname(input_file_path)
         licenses_path = os.path.join(directory_name, 'licenses')
         if os.path.isdir(directory_name):
             if os.path.isdir(licenses_path):
                 shutil.rmtree(licenses_path)
-                os.remove(self.input_file_name)
+                os.remove(input_file_path)
 
             if len(os.listdir(directory_name)) == 0:
                 shutil.rmtree(directory_name)
 
-        top_path = self.input_file_name.split(os.sep)[0]
+        top_path = self.get_input_path(self.input_file_name.split(os.sep)[0])
         if len(os.listdir(top_path)) == 0:
             shutil.rmtree(top_path)
 
     def run_maven_plugin(self):
+        # The license report, the dependency tree and the source jars are produced by one Maven run,
+        # so that the JVM starts and the reactor is resolved once. Each goal writes its own output file.
         ret_plugin = True
         logger.info('Run maven license scanning plugin with temporary pom.xml')
         cmd_mvn, current_mode = self._get_mvn_cmd()
-        cmd = f"{cmd_mvn} license:aggregate-download-licenses"
-
-        ret = subprocess.call(cmd, shell=True)
-        if ret != 0:
-            logger.error(f"Failed to run maven plugin: {cmd}")
-            ret_plugin = False
-
-        if ret_plugin:
-            cmd = f"{cmd_mvn} dependency:tree"
-            try:
-                ret_txt = subprocess.check_output(cmd, text=True, shell=True)
-                if ret_txt is not None:
-                    self.parse_dependency_tree(ret_txt)
+        try:
+            with tempfile.TemporaryDirectory(prefix='fosslight_maven_') as tmp_dir:
+                tree_file = os.path.join(tmp_dir, 'dependency-tree.txt')
+                # Test-scoped dependencies are not reported, so their source jars are not downloaded.
+                cmd = (f'{cmd_mvn} {MVN_TRANSFER_LOG_FLAGS} -fae license:aggregate-download-licenses '
+                       f'dependency:tree -DoutputFile="{tree_file}" -DappendOutput=true '
+                       f'dependency:sources -DexcludeScope=test')
+                ret, transfer_lines, error_lines = run_mvn_passthrough(cmd, self.input_dir)
+
+                if not os.path.isfile(self.get_input_path(self.input_file_name)):
+                    logger.error(f"Failed to run maven plugin: {cmd}")
+                    if error_lines:
+                        logger.error('\n'.join(error_lines))
+                    return False
+                if ret != 0:
+                    logger.warning(f"'{cmd}' returned {ret}; some modules may be missing in the dependency tree.")
+                    if error_lines:
+                        logger.warning('\n'.join(error_lines))
+
+                if os.path.isfile(tree_file) and os.path.getsize(tree_file) > 0:
+                    # dependency:tree writes the same tree as it logs, without the '[INFO] ' prefix.
+                    with open(tree_file, 'r', encoding='utf-8', errors='replace') as tree_fp:
+                        self.parse_dependency_tree(''.join(f'[INFO] {line}' for line in tree_fp))
                     self.set_direct_dependencies(True)
                 else:
-                    logger.error(f"Failed to run: {cmd}")
+                    logger.error(f"Failed to get the dependency tree: {cmd}")
                     self.set_direct_dependencies(False)
-            except Exception as e:
-                logger.error(f"Failed to run '{cmd}': {e}")
-                self.set_direct_dependencies(False)
-        if current_mode:
-            change_file_mode(cmd_mvn, current_mode)
+
+                self._parse_downloaded_from_lines_mvn(''.join(transfer_lines))
+                self.source_urls_collected = True
+        except Exception as e:
+            logger.error(f"Failed to run maven plugin: {e}")
+            ret_plugin = False
+        finally:
+            if current_mode:
+                change_file_mode(self.get_input_path(cmd_mvn), current_mode)
         return ret_plugin
 
     def _get_mvn_cmd(self):
+        # The returned command is relative to input_dir; callers run it with cwd=self.input_dir.
         current_mode = ''
-        if os.path.isfile('mvnw') or os.path.isfile('mvnw.cmd'):
+        if os.path.isfile(self.get_input_path('mvnw')) or os.path.isfile(self.get_input_path('mvnw.cmd')):
             if self.platform == const.WINDOWS:
                 cmd_mvn = "mvnw.cmd"
             else:
                 cmd_mvn = "./mvnw"
-            current_mode = change_file_mode(cmd_mvn)
+            current_mode = change_file_mode(self.get_input_path(cmd_mvn))
         else:
             cmd_mvn = "mvn"
         return cmd_mvn, current_mode
 
-    def collect_source_download_urls(self, include_groups=None, include_artifacts=None):
+    def collect_source_download_urls(self, include_groups=None, include_artifacts=None, artifacts=None):
         cmd_mvn, current_mode = self._get_mvn_cmd()
         try:
-            flags = "-B -Dorg.slf4j.simpleLogger.log.org.apache.maven.cli.transfer.Slf4jMavenTransferListener=info"
+            flags = MVN_TRANSFER_LOG_FLAGS
             includes = []
             if include_groups:
                 includes.append(f"-DincludeGroupIds={','.join(sorted(set(include_groups)))}")
@@ -207,28 +237,25 @@ class Maven(PackageManager):
                     self._parse_downloaded_from_lines_mvn(proc.stdout)
                 else:
                     logger.debug(f"dependency:resolve failed (rc={proc.returncode})")
-            if not self.download_url_map and (include_groups and include_artifacts):
+            if not self.download_url_map and artifacts:
                 logger.debug("No download URLs found, attempting to reconstruct from local repository")
-                self._collect_urls_from_local_repository(include_groups, include_artifacts)
+                self._collect_urls_from_local_repository(artifacts)
         except Exception as e:
             logger.debug(f"Error occurred while collecting source download URLs: {e}")
         finally:
             if current_mode:
-                change_file_mode(cmd_mvn, current_mode)
+                change_file_mode(self.get_input_path(cmd_mvn), current_mode)
 
-    def _collect_urls_from_local_repository(self, include_groups=None, include_artifacts=None):
+    def _collect_urls_from_local_repository(self, artifacts):
         try:
-            m2_repo = Path.home() / ".m2" / "repository"
-            if not m2_repo.exists():
+            local_repository = get_local_maven_repository()
+            if local_repository is None:
                 return
-            repo_map = self._parse_pom_repositories()
-            if include_groups and include_artifacts:
-                for group_id in include_groups:
-                    group_path = group_id.replace('.', '/')
-                    for artifact_id in include_artifacts:
-                        artifact_path = m2_repo / group_path / artifact_id
-                        if artifact_path.exists():
-                            self._scan_artifact_versions(artifact_path, group_id, artifact_id, repo_map)
+            if self.repo_map is None:
+                self.repo_map = self._parse_pom_repositories()
+            for (group_id, artifact_id, version), remote_repositories in \
+                    local_repository.index_remote_repositories(artifacts).items():
+                self._add_source_url_from_remote_repositories(group_id, artifact_id, version, remote_repositories)
         except Exception as e:
             logger.debug(f"Failed to collect URLs from local repository: {e}")
 
@@ -250,40 +277,39 @@ class Maven(PackageManager):
             logger.debug(f"Failed to parse pom repositories: {e}")
         return repo_map
 
-    def _scan_artifact_versions(self, artifact_path, group_id, artifact_id, repo_map):
-        try:
-            for version_dir in artifact_path.iterdir():
-                if not version_dir.is_dir():
-                    continue
-                version = version_dir.name
-                remote_repos_file = version_dir / "_remote.repositories"
-
-                if remote_repos_file.exists():
-                    with open(remote_repos_file, 'r') as f:
-                        for line in f:
-                            if line.startswith('#') or '>' not in line:
-                                continue
-                            parts = line.strip().split('>')
-                            if len(parts) != 2:
-                                continue
-                            filename = parts[0]
-                            repo_id = parts[1].rstrip('=')
-
-                            if '-sources.jar' in filename:
-                                if repo_id in repo_map:
-                                    repo_url = repo_map[repo_id]
-                                elif repo_id == 'central':
-                                    repo_url = 'https://repo.maven.apache.org/maven2'
-                                else:
-                                    continue
-                                group_path = group_id.replace('.', '/')
-                                url = f"{repo_url}/{group_path}/{artifact_id}/{version}/{filename}"
-                                key = f"{group_id}:{artifact_id}:{version}"
-                                self.download_url_map[key] = url
-                                logger.debug(f"Reconstructed URL from local repo: {key} -> {url}")
-                                break
-        except Exception as e:
-            logger.debug(f"Failed to scan artifact versions: {e}")
+    def _add_source_url_from_remote_repositories(self, group_id, artifact_id, version, remote_repositories):
+        for filename, repo_id in remote_repositories.items():
+            if '-sources.jar' not in filename:
+                continue
+            if repo_id in self.repo_map:
+                repo_url = self.repo_map[repo_id]
+            elif repo_id == 'central':
+                repo_url = MAVEN_CENTRAL_URL
+            else:
+                continue
+            group_path = group_id.replace('.', '/')
+            url = f"{repo_url}/{group_path}/{artifact_id}/{version}/{filename}"
+            key = f"{group_id}:{artifact_id}:{version}"
+            self.download_url_map[key] = url
+            logger.debug(f"Reconstructed URL from local repo: {key} -> {url}")
+            break
+
+    def get_local_download_location(self, local_repository, group_id, artifact_id, version):
+        # Where an artifact without a download URL was downloaded from, as recorded in the local repository.
+        # This answers what get_download_location would otherwise ask Google Maven over the network.
+        key = f"{group_id}:{artifact_id}:{version}"
+        if local_repository is None or key in self.download_url_map:
+            return ''
+        repo_ids = set(local_repository.get_remote_repositories(group_id, artifact_id, version).values())
+        if not repo_ids:
+            return ''
+        if self.repo_map is None:
+            self.repo_map = self._parse_pom_repositories()
+        for repo_id in repo_ids:
+            repo_url = self.repo_map.get(repo_id, '')
+            if repo_id == 'google' or any(host in repo_url for host in GOOGLE_MAVEN_HOSTS):
+                return f"https://maven.google.com/web/index.html#{group_id}:{artifact_id}:{version}"
+        return f"{self.dn_url}{group_id}/{artifact_id}/{version}"
 
     def _parse_downloaded_from_lines_mvn(self, stdout_text: str):
         current_gav = None
@@ -387,25 +413,34 @@ class Maven(PackageManager):
             logger.warning(f'Fail to parse maven dependency tree:{e}')
 
     def parse_oss_information(self, f_name):
-        with open(f_name, 'r', encoding='utf8') as input_fp:
+        with open(self.get_input_path(f_name), 'r', encoding='utf8') as input_fp:
             tree = parse(input_fp)
         root = tree.getroot()
         dependencies = root.find("dependencies")
         purl_dict = {}
+        local_repository = get_local_maven_repository()
 
         if not getattr(self, 'download_url_map', None):
             self.download_url_map = {}
         if not self.download_url_map:
-            groups, arts = set(), set()
+            groups, arts, artifacts = set(), set(), set()
             for d in dependencies.iter("dependency"):
                 g = d.findtext("groupId") or ""
                 a = d.findtext("artifactId") or ""
+                v = d.findtext("version") or ""
                 if g:
                     groups.add(g)
                 if a:
                     arts.add(a)
+                if g and a and v:
+                    artifacts.add((g, a, v))
             try:
-                self.collect_source_download_urls(include_groups=groups, include_artifacts=arts)
+                if self.source_urls_collected:
+                    # The plugin run logged no transfer, e.g. every source jar was already downloaded:
+                    # the local repository records where they came from.
+                    self._collect_urls_from_local_repository(artifacts)
+                if not self.download_url_map:
+                    self.collect_source_download_urls(include_groups=groups, include_artifacts=arts, artifacts=artifacts)
             except Exception as e:
                 logger.debug(f"Skip collecting source URLs: {e}")
 
@@ -418,11 +453,14 @@ class Maven(PackageManager):
             oss_item.version = version_refine(version)
 
             oss_item.name = f"{groupid}:{artifactid}"
-            oss_item.download_location = get_download_location(
-                self.download_url_map, groupid, artifactid, version, self.dn_url
-            )
-            oss_item.homepage = f"{self.dn_url}{groupid}/{artifactid}"
-            mvn_dn_url = f"{oss_item.homepage}/{version}"
+            oss_item.download_location = self.get_local_download_location(local_repository, groupid, artifactid, version)
+            if not oss_item.download_location:
+                oss_item.download_location = get_download_location(
+                    self.download_url_map, groupid, artifactid, version, self.dn_url
+                )
+            pom_metadata = local_repository.get_pom_metadata(groupid, artifactid, version) if local_repository else None
+            oss_item.homepage = (pom_metadata and pom_metadata['scm_url']) or f"{self.dn_url}{groupid}/{artifactid}"
+            mvn_dn_url = f"{self.dn_url}{groupid}/{artifactid}/{version}"
             dep_item.purl = get_url_to_purl(mvn_dn_url, self.package_manager_name)
             purl_dict[f'{oss_item.name}({version})'] = dep_item.purl
 
@@ -434,7 +472,16 @@ class Maven(PackageManager):
                         license_names.append(key_license.findtext("name").replace(",", ""))
                 oss_item.license = ', '.join(license_names)
             if not oss_item.license:
-                license_names = get_license_from_pom(groupid, artifactid, version)
+                cached = get_cached_metadata(dep_item.purl, MAVEN_POM_LICENSE)
+                if pom_metadata and (pom_metadata['license'] or pom_metadata['complete']):
+                    # The POM and its parents are in the local repository; the network would not tell more.
+                    license_names = pom_metadata['license']
+                elif cached is not None:
+                    license_names = cached['license']
+                else:
+                    license_names = get_license_from_pom(groupid, artifactid, version)
+                    if license_names:
+                        set_cached_metadata(dep_item.purl, MAVEN_POM_LICENSE, {'license': license_names})
                 if license_names:
                     oss_item.license = license_names
 
@@ -458,3 +505,27 @@ class Maven(PackageManager):
         if self.direct_dep:
             self.dep_items = change_dependson_to_purl(purl_dict, self.dep_items)
         return
+
+
+def run_mvn_passthrough(cmd, cwd):
+    # Runs Maven with its output passed through to the console, as a plain run shows its progress.
+    # Returns (return code, the transfer lines the source download URLs are parsed from, the error lines);
+    # the error lines are the [ERROR] lines, else the tail of the output.
+    transfer_lines = []
+    error_lines = []
+    tail_lines = deque(maxlen=MVN_ERROR_TAIL_LINES)
+    proc = subprocess.Popen(cmd, shell=True, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            text=True, encoding='utf-8', errors='replace')
+    try:
+        for line in proc.stdout:
+            sys.stdout.write(line)
+            sys.stdout.flush()
+            if any(marker in line for marker in MVN_TRANSFER_LINE_MARKERS):
+                transfer_lines.append(line)
+            elif line.startswith('[ERROR]'):
+                error_lines.append(line.rstrip())
+            tail_lines.append(line.rstrip())
+    finally:
+        proc.stdout.close()
+        proc.wait()
+    return proc.returncode, transfer_lines, error_lines or list(tail_lines)
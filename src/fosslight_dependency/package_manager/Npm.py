@@ -9,15 +9,24 @@ import subprocess
 import json
 import shutil
 import re
-import requests
+import ijson
+from concurrent.futures import ThreadPoolExecutor
 import fosslight_util.constant as constant
 import fosslight_dependency.constant as const
 from fosslight_dependency._package_manager import PackageManager, get_url_to_purl
+from fosslight_dependency._package_manager import get_registry_url, http_get, http_head
+from fosslight_dependency._json_stream import iter_dependency_tree, stream_command_output
+from fosslight_dependency._metadata_cache import get_cached_metadata, set_cached_metadata, NPM_REGISTRY, NPM_MANIFEST
 from fosslight_dependency.dependency_item import DependencyItem, change_dependson_to_purl
 from fosslight_util.oss_item import OssItem
 
 logger = logging.getLogger(constant.LOGGER_NAME)
 node_modules = 'node_modules'
+# Looked up in this order, as npm does; the hidden lockfile is written by npm 7+ into node_modules.
+package_lock_files = ['npm-shrinkwrap.json', 'package-lock.json', os.path.join(node_modules, '.package-lock.json')]
+_lock_dependency_fields = ('dependencies', 'optionalDependencies', 'peerDependencies')
+# Existence probes are cheap requests; a short timeout keeps an unreachable package from holding a registry slot.
+NPM_PROBE_TIMEOUT = 3
 
 
 class Npm(PackageManager):
@@ -34,6 +43,15 @@ class Npm(PackageManager):
         self._check_network_available()
         self.IS_WINDOWS = self.platform == const.WINDOWS
         self._owns_local_node_dir = False
+        # Environment for node commands; set when license-checker is installed locally
+        # so that PATH is extended per instance instead of in os.environ.
+        self._node_env = None
+        self._npm_url_exists_result = {}
+        # Set by the lockfile engine: {location: entry} in the package-lock 'packages' layout
+        # and the production dependency graph walked from the root package.
+        self.lock_packages = None
+        self.lock_graph = {}
+        self.lock_names = {}
 
     def __del__(self):
         if os.path.isfile(os.path.join(self.input_dir, self.input_file_name)):
@@ -47,13 +65,15 @@ class Npm(PackageManager):
             shutil.rmtree(local_node_dir, ignore_errors=True)
 
     def run_plugin(self):
+        if self.engine == const.ENGINE_LOCKFILE:
+            return self.read_lockfile()
         node_cmd = shutil.which("node") or shutil.which("nodejs")
         npm_cmd = shutil.which("npm")
-        if not node_cmd:
-            logger.warning("Node.js is not available on this system")
-            return False
-        if not npm_cmd:
-            logger.warning("npm is not available on this system")
+        if not node_cmd or not npm_cmd:
+            logger.warning(f"{'Node.js' if not node_cmd else 'npm'} is not available on this system")
+            if self.engine == const.ENGINE_AUTO and self.find_lockfile():
+                logger.info("It reads the lockfile instead.")
+                return self.read_lockfile()
             return False
         license_checker_cmd = shutil.which("license-checker")
         if not license_checker_cmd:
@@ -68,13 +88,16 @@ class Npm(PackageManager):
         PATH_SEP = ";" if self.IS_WINDOWS else ":"
         os.makedirs(NODE_DIR, exist_ok=True)
         self._owns_local_node_dir = True
-        os.environ["PATH"] = NODE_BIN + PATH_SEP + os.environ.get("PATH", "")
+        self._node_env = os.environ.copy()
+        self._node_env["PATH"] = NODE_BIN + PATH_SEP + os.environ.get("PATH", "")
 
-        npm_cmd = shutil.which("npm.cmd" if self.IS_WINDOWS else "npm")
+        npm_cmd = shutil.which("npm.cmd" if self.IS_WINDOWS else "npm", path=self._node_env["PATH"])
         result = subprocess.run(
             [npm_cmd, "install", "-g", "license-checker", "--prefix", NODE_DIR],
             text=True,
             capture_output=True,
+            cwd=self.input_dir,
+            env=self._node_env,
         )
         if result.returncode != 0:
             logger.warning(f"license-checker install fail:\n{result.stderr}")
@@ -87,97 +110,229 @@ class Npm(PackageManager):
         custom_path_option = ' --customPath '
         npm_install_cmd = 'npm install --production --ignore-scripts'
 
-        if not os.path.isdir(node_modules):
+        if not os.path.isdir(self.get_input_path(node_modules)):
             logger.info(f"node_modules directory is not existed. So it executes '{npm_install_cmd}'.")
             self.flag_tmp_node_modules = True
 
-            result = subprocess.run(npm_install_cmd, shell=True, capture_output=True, text=True)
+            result = subprocess.run(npm_install_cmd, shell=True, capture_output=True, text=True,
+                                    cwd=self.input_dir, env=self._node_env)
             if result.returncode != 0:
                 logger.error(f"{npm_install_cmd} failed")
                 return False
 
         # customized json file for obtaining specific items with license-checker
-        self.make_custom_json(self.tmp_custom_json)
+        self.make_custom_json(self.get_input_path(self.tmp_custom_json))
 
         cmd = license_checker_cmd + custom_path_option + self.tmp_custom_json
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+        result = subprocess.run(cmd, shell=True, capture_output=True, text=True, cwd=self.input_dir, env=self._node_env)
         if result.returncode != 0:
             logger.error(f"It returns the error: {cmd}")
             ret = False
         else:
             self.append_input_package_list_file(self.input_file_name)
-        if os.path.exists(self.tmp_custom_json):
-            os.remove(self.tmp_custom_json)
+        if os.path.exists(self.get_input_path(self.tmp_custom_json)):
+            os.remove(self.get_input_path(self.tmp_custom_json))
 
         return ret
 
+    def find_lockfile(self):
+        for lock_file in package_lock_files:
+            if os.path.isfile(self.get_input_path(lock_file)):
+                return lock_file
+        return ''
+
+    def read_lockfile(self):
+        lock_file = self.find_lockfile()
+        if not lock_file:
+            logger.error("package-lock.json is not found, so it cannot analyze without running npm.")
+            return False
+        try:
+            with open(self.get_input_path(lock_file), 'r', encoding='utf8') as f:
+                lock_json = json.load(f)
+            self.lock_packages = get_lock_packages(lock_json)
+            self.walk_lock_packages()
+        except Exception as e:
+            logger.error(f"Failed to read {lock_file}: {e}")
+            self.lock_packages = None
+            return False
+        logger.info(f"Analyze {lock_file} (lockfileVersion {lock_json.get('lockfileVersion', 1)}) without running npm.")
+        self.append_input_package_list_file(lock_file)
+        return True
+
+    def read_package_json(self, package_dir=''):
+        package_json_path = self.get_input_path(package_dir, const.SUPPORT_PACKAGE.get(const.NPM))
+        if os.path.isfile(package_json_path):
+            try:
+                with open(package_json_path, 'r', encoding='utf8') as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.debug(f"Failed to read {package_json_path}: {e}")
+        return {}
+
+    def walk_lock_packages(self):
+        # Walk the production dependencies from the root, as 'npm ls --omit=dev' does;
+        # devDependencies of the root are not followed.
+        root = self.lock_packages.get('')
+        if not root or not any(field in root for field in _lock_dependency_fields):
+            # lockfileVersion 1 and the hidden lockfile do not record the root package.
+            root = dict(self.read_package_json(), **(root or {}))
+            self.lock_packages[''] = root
+        self.lock_graph = {}
+        self.lock_names = {'': root.get('name', '')}
+        stack = ['']
+        queued = {''}
+        while stack:
+            location = stack.pop()
+            children = []
+            for dep_name in dict.fromkeys(dep for field in _lock_dependency_fields
+                                          for dep in (self.lock_packages[location].get(field) or {})):
+                child = self.resolve_lock_dependency(location, dep_name)
+                if not child:
+                    # Optional or peer dependencies that are not installed
+                    continue
+                entry = self.lock_packages[child]
+                if entry.get('link'):
+                    # Workspace packages are linked into node_modules.
+                    link_name = child.rsplit(f'{node_modules}/', 1)[-1]
+                    child = entry.get('resolved', '')
+                    if child not in self.lock_packages:
+                        continue
+                    self.lock_names.setdefault(child, self.lock_packages[child].get('name') or link_name)
+                else:
+                    self.lock_names.setdefault(child, entry.get('name') or child.rsplit(f'{node_modules}/', 1)[-1])
+                children.append(child)
+                if child not in queued:
+                    queued.add(child)
+                    stack.append(child)
+            self.lock_graph[location] = children
+
+    def resolve_lock_dependency(self, location, dep_name):
+        return resolve_lock_location(self.lock_packages, location, dep_name)
+
+    def get_lock_package_dir(self, location):
+        return location
+
+    def get_lock_name_version(self, location):
+        name = self.lock_names[location]
+        version = self.lock_packages[location].get('version', '')
+        if version.startswith('npm:'):
+            # Aliased package in lockfileVersion 1: "npm:<real name>@<version>"
+            name, version = version[4:].rsplit('@', 1)
+        return name, version
+
+    def get_lock_package_id(self, location):
+        return '{0}({1})'.format(*self.get_lock_name_version(location))
+
+    def parse_lock_relationship(self):
+        self.package_name = self.get_lock_package_id('')
+        self.relation_tree = {self.package_name: []}
+        for location, children in self.lock_graph.items():
+            deps = self.relation_tree.setdefault(self.get_lock_package_id(location), [])
+            for child in children:
+                child_id = self.get_lock_package_id(child)
+                if child_id not in deps:
+                    deps.append(child_id)
+
+    def get_license_data_from_lock(self):
+        # Build the same shape as the license-checker output so that parse_oss_information can share it.
+        json_data = {}
+        for location in self.lock_graph:
+            entry = self.lock_packages[location]
+            name, version = self.get_lock_name_version(location)
+            # package.json is only there when node_modules is installed or for the root and workspace packages.
+            package_dir = self.get_lock_package_dir(location)
+            package_json = self.read_package_json(package_dir)
+            if package_json.get('version', version) != version:
+                package_json = {}
+            license_name = entry.get('license') or get_package_json_license(package_json)
+            json_data[f'{name}@{version}'] = {
+                'name': name,
+                'version': version,
+                'licenses': license_name,
+                'repository': get_repository_url(package_json.get('repository')),
+                'path': self.get_input_path(package_dir),
+                'private': bool(package_json.get('private', False)),
+            }
+        self._prefetch_npm_manifests(json_data)
+        return json_data
+
+    def _prefetch_npm_manifests(self, json_data):
+        # A lockfile has no repository and, before lockfileVersion 2, no license either.
+        # They are read from the registry, which also tells whether the package is published.
+        if self._network_available is not True:
+            return
+        packages = [d for d in json_data.values() if not d['private'] and (not d['licenses'] or not d['repository'])]
+        if not packages:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.registry_jobs, len(packages))) as executor:
+            for d, manifest in zip(packages, executor.map(lambda d: get_npm_manifest(d['name'], d['version']), packages)):
+                if manifest is None:
+                    continue
+                self._npm_url_exists_result[(d['name'], d['version'])] = True
+                d['licenses'] = d['licenses'] or manifest['license']
+                d['repository'] = d['repository'] or manifest['repository']
+
     def make_custom_json(self, tmp_custom_json):
         with open(tmp_custom_json, 'w', encoding='utf8') as custom:
             custom.write(
                 "{\n\t\"name\": \"\",\n\t\"version\": \"\",\n\t\"licenses\": \"\",\n\t\"repository\": \
                 \"\",\n\t\"url\": \"\",\n\t\"copyright\": \"\",\n\t\"licenseText\": \"\"\n}\n".encode().decode("utf-8"))
 
-    def parse_rel_dependencies(self, rel_name, rel_ver, rel_dependencies):
-        _dependencies = 'dependencies'
-        _version = 'version'
-        _peer = 'peerMissing'
-
-        for rel_dep_name in rel_dependencies.keys():
-            # Optional, non-installed dependencies are listed as empty objects
-            if rel_dependencies[rel_dep_name] == {}:
-                continue
-            if _peer in rel_dependencies[rel_dep_name]:
-                if rel_dependencies[rel_dep_name][_peer]:
-                    continue
-            if f'{rel_name}({rel_ver})' not in self.relation_tree:
-                self.relation_tree[f'{rel_name}({rel_ver})'] = []
-            elif f'{rel_dep_name}({rel_dependencies[rel_dep_name][_version]})' in self.relation_tree[f'{rel_name}({rel_ver})']:
-                continue
-            self.relation_tree[f'{rel_name}({rel_ver})'].append(f'{rel_dep_name}({rel_dependencies[rel_dep_name][_version]})')
-            if _dependencies in rel_dependencies[rel_dep_name]:
-                self.parse_rel_dependencies(rel_dep_name, rel_dependencies[rel_dep_name][_version],
-                                            rel_dependencies[rel_dep_name][_dependencies])
+    def add_rel_dependencies(self, rel_tree_fp):
+        # The tree is streamed, and a subtree that 'npm ls -a' repeats under the same parent
+        # is skipped while it is read instead of being loaded.
+        root_found = False
+        rel_nodes = []
+        try:
+            for index, depth, rel_name, rel_node in iter_dependency_tree(rel_tree_fp, per_parent=True):
+                rel_id = f'{rel_name}({rel_node.get("version", "")})'
+                if depth == 0:
+                    root_found = True
+                    self.package_name = rel_id
+                if rel_node['dependencies']:
+                    rel_nodes.append((index, rel_id, rel_node['dependencies']))
+        except ijson.JSONError as e:
+            logger.debug(f"Fail to parse the dependency tree: {e}")
+            return False
+        # Packages are merged in pre-order, as a recursive walk of the tree would list them.
+        rel_nodes.sort(key=lambda rel: rel[0])
+        for _, rel_id, rel_dependencies in rel_nodes:
+            rel_deps = self.relation_tree.setdefault(rel_id, [])
+            for dep_name, dep_ver in rel_dependencies.items():
+                if f'{dep_name}({dep_ver})' not in rel_deps:
+                    rel_deps.append(f'{dep_name}({dep_ver})')
+        return root_found
 
     def parse_transitive_relationship(self):
-        _dependencies = 'dependencies'
-        _version = 'version'
-        _name = 'name'
         ret = True
         err_msg = ''
 
         cmd = 'npm ls -a --omit=dev --json -s'
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True, encoding='utf-8')
-        rel_tree = result.stdout
-        if not rel_tree or rel_tree.strip() == '':
-            logger.error(f"No output for {cmd}, stderr: {result.stderr}")
+        try:
+            returncode, stderr, root_found = stream_command_output(cmd, self.add_rel_dependencies,
+                                                                   cwd=self.input_dir, env=self._node_env)
+        except Exception as e:
+            return False, e
+        if returncode > 1:
+            logger.error(f"'{cmd}' failed with exit code({returncode}), stderr: {stderr}")
             ret = False
-            err_msg = result.stderr or "No output from command"
-        elif result.returncode > 1:
-            logger.error(f"'{cmd}' failed with exit code({result.returncode}), stderr: {result.stderr}")
+            err_msg = stderr or f"exit code({returncode})"
+        elif not root_found:
+            logger.error(f"No output for {cmd}, stderr: {stderr}")
             ret = False
-            err_msg = result.stderr or f"exit code({result.returncode})"
-        if ret:
-            if result.returncode == 1:
-                logger.debug(f"'{cmd}' has warnings: {result.stderr}")
-
-            try:
-                rel_json = json.loads(rel_tree)
-                if len(rel_json) < 1:
-                    ret = False
-                else:
-                    self.package_name = f'{rel_json[_name]}({rel_json.get(_version, "")})'
-                    if _dependencies in rel_json:
-                        self.parse_rel_dependencies(rel_json[_name], rel_json.get(_version, ""), rel_json[_dependencies])
-            except Exception as e:
-                ret = False
-                err_msg = e
+            err_msg = stderr or "No output from command"
+        elif returncode == 1:
+            logger.debug(f"'{cmd}' has warnings: {stderr}")
         return ret, err_msg
 
     def parse_direct_dependencies(self):
         if not self.direct_dep:
             return
+        if self.lock_packages is not None:
+            self.parse_lock_relationship()
+            return
         try:
-            if os.path.isfile(const.SUPPORT_PACKAGE.get(self.package_manager_name)):
+            if os.path.isfile(self.get_input_path(const.SUPPORT_PACKAGE.get(self.package_manager_name))):
                 ret, err_msg = self.parse_transitive_relationship()
                 if not ret:
                     self.direct_dep = False
@@ -190,8 +345,12 @@ class Npm(PackageManager):
             self.direct_dep = False
 
     def parse_oss_information(self, f_name):
-        with open(f_name, 'r', encoding='utf8') as json_file:
-            json_data = json.load(json_file)
+        if self.lock_packages is not None:
+            json_data = self.get_license_data_from_lock()
+        else:
+            with open(self.get_input_path(f_name), 'r', encoding='utf8') as json_file:
+                json_data = json.load(json_file)
+        self._prefetch_npm_url_exists(json_data)
 
         _licenses = 'licenses'
         _repository = 'repository'
@@ -233,7 +392,9 @@ class Npm(PackageManager):
             else:
                 npm_url_exists = False
                 if self._network_available is True:
-                    npm_url_exists = self._npm_url_exists(oss_init_name, oss_item.version)
+                    npm_url_exists = self._npm_url_exists_result.get((oss_init_name, oss_item.version))
+                    if npm_url_exists is None:
+                        npm_url_exists = self._npm_url_exists(oss_init_name, oss_item.version)
                 if self._network_available and not npm_url_exists:
                     oss_item.homepage = repo_url or ""
                     oss_item.download_location = oss_item.homepage
@@ -271,26 +432,130 @@ class Npm(PackageManager):
         return
 
     def _check_network_available(self) -> bool:
-        test_url = 'https://registry.npmjs.org/'
-        try:
-            resp = requests.head(test_url, timeout=3, allow_redirects=True)
-            self._network_available = resp.status_code < 400
-        except Exception:
-            self._network_available = False
+        self._network_available = is_npm_registry_available()
         return self._network_available
 
+    def _prefetch_npm_url_exists(self, json_data):
+        # Check all packages up front with a bounded fan-out instead of one round trip per loop iteration.
+        if self._network_available is not True:
+            return
+        packages = list(dict.fromkeys((d['name'], d['version']) for d in json_data.values()
+                                      if not d.get('private') and (d['name'], d['version']) not in self._npm_url_exists_result))
+        if not packages:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.registry_jobs, len(packages))) as executor:
+            for package, exists in zip(packages, executor.map(lambda p: self._npm_url_exists(*p), packages)):
+                self._npm_url_exists_result[package] = exists
+
     def _npm_url_exists(self, package_name: str, oss_version="") -> bool:
+        purl = get_url_to_purl(f"{self.dn_url}{package_name}/v/{oss_version}", const.NPM) if oss_version else ''
+        cached = get_cached_metadata(purl, NPM_REGISTRY)
+        if cached is not None:
+            return cached['exists']
+
+        url = f"{get_registry_url(const.NPM)}{package_name}"
         if oss_version:
-            url = f"https://registry.npmjs.org/{package_name}/{oss_version}"
-        else:
-            url = f"https://registry.npmjs.org/{package_name}"
+            url = f"{url}/{oss_version}"
         try:
-            resp = requests.head(url, timeout=3, allow_redirects=True)
+            resp = http_head(url, timeout=NPM_PROBE_TIMEOUT)
             if resp.status_code == 405:
-                resp = requests.get(url, timeout=3, allow_redirects=True)
-            return resp.status_code < 400
+                resp = http_get(url, timeout=NPM_PROBE_TIMEOUT)
         except Exception:
             return False
+        exists = resp.status_code < 400
+        # Rate limiting and server errors say nothing about the package, so they are not cached.
+        if exists or resp.status_code in (404, 410):
+            set_cached_metadata(purl, NPM_REGISTRY, {'exists': exists})
+        return exists
+
+
+def is_npm_registry_available():
+    try:
+        resp = http_head(get_registry_url(const.NPM), timeout=NPM_PROBE_TIMEOUT)
+        return resp.status_code < 400
+    except Exception:
+        return False
+
+
+def get_npm_manifest(package_name, oss_version):
+    # license and repository of a published version, or None when the registry does not have it
+    purl = get_url_to_purl(f"{Npm.dn_url}{package_name}/v/{oss_version}", const.NPM)
+    cached = get_cached_metadata(purl, NPM_MANIFEST)
+    if cached is not None:
+        return cached
+    try:
+        resp = http_get(f"{get_registry_url(const.NPM)}{package_name}/{oss_version}")
+        if resp.status_code != 200:
+            return None
+        package_json = resp.json()
+    except Exception as e:
+        logger.debug(f"Failed to get npm registry manifest of {package_name}@{oss_version}: {e}")
+        return None
+    manifest = {'license': get_package_json_license(package_json),
+                'repository': get_repository_url(package_json.get('repository'))}
+    set_cached_metadata(purl, NPM_MANIFEST, manifest)
+    return manifest
+
+
+def get_lock_packages(lock_json):
+    # Return {location: entry} in the 'packages' layout of lockfileVersion 2 and 3.
+    packages = lock_json.get('packages')
+    if packages is not None:
+        return dict(packages)
+
+    # lockfileVersion 1 nests 'dependencies' and lists the dependency names of a package in 'requires'.
+    packages = {}
+    if 'name' in lock_json or 'version' in lock_json:
+        packages[''] = {'name': lock_json.get('name', ''), 'version': lock_json.get('version', '')}
+    stack = [('', lock_json.get('dependencies', {}))]
+    while stack:
+        parent, dependencies = stack.pop()
+        for name, dep in dependencies.items():
+            location = f'{parent}/{node_modules}/{name}' if parent else f'{node_modules}/{name}'
+            packages[location] = {'version': dep.get('version', ''), 'dependencies': dep.get('requires', {})}
+            if dep.get('dependencies'):
+                stack.append((location, dep['dependencies']))
+    return packages
+
+
+def resolve_lock_location(lock_packages, location, dep_name):
+    # Node module resolution: the nearest node_modules directory from location upwards.
+    parent = location
+    while True:
+        candidate = f'{parent}/{node_modules}/{dep_name}' if parent else f'{node_modules}/{dep_name}'
+        if candidate in lock_packages:
+            return candidate
+        if not parent:
+            return ''
+        idx = parent.rfind(f'/{node_modules}/')
+        parent = parent[:idx] if idx >= 0 else ''
+
+
+def get_package_json_license(package_json):
+    license_name = package_json.get('license') or package_json.get('licenses') or ''
+    if isinstance(license_name, dict):
+        license_name = license_name.get('type', '')
+    elif isinstance(license_name, list):
+        license_name = [lic.get('type', '') if isinstance(lic, dict) else lic for lic in license_name]
+        if len(license_name) == 1:
+            license_name = license_name[0]
+    return license_name
+
+
+def get_repository_url(repository):
+    repo_url = repository.get('url', '') if isinstance(repository, dict) else repository
+    if not repo_url or not isinstance(repo_url, str):
+        return ''
+    if re.match(r'^[\w.-]+/[\w.-]+$', repo_url):
+        repo_url = f'https://github.com/{repo_url}'
+    repo_url = re.sub(r'^(github|gitlab|bitbucket):', lambda m: f'https://{m[1]}.{"org" if m[1] == "bitbucket" else "com"}/',
+                      repo_url)
+    repo_url = re.sub(r'^(git\+)?(ssh://)?git@([^:/]+)[:/]', r'https://\3/', repo_url)
+    repo_url = re.sub(r'^git\+', '', repo_url)
+    repo_url = re.sub(r'^git://', 'https://', repo_url)
+    if repo_url.endswith('.git'):
+        repo_url = repo_url[:-4]
+    return repo_url
 
 
 def check_multi_license(license_name, manifest_file_path):
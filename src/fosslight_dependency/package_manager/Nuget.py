@@ -7,17 +7,27 @@ import logging
 import re
 import os
 import subprocess
-from defusedxml.ElementTree import parse, fromstring
-import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, unquote
 import requests
+from defusedxml.ElementTree import parse, fromstring, ParseError
 import fosslight_util.constant as constant
 import fosslight_dependency.constant as const
 from fosslight_dependency._package_manager import PackageManager
 from fosslight_dependency._package_manager import check_license_name, get_url_to_purl
+from fosslight_dependency._package_manager import get_registry_url, http_get
+from fosslight_dependency._json_stream import iter_json_items, ANY
+from fosslight_dependency._metadata_cache import get_cached_metadata, set_cached_metadata, NUGET_NUSPEC
 from fosslight_dependency.dependency_item import DependencyItem, change_dependson_to_purl
 from fosslight_util.oss_item import OssItem
 
 logger = logging.getLogger(constant.LOGGER_NAME)
+# Concurrent 'dotnet restore' processes, at most.
+DOTNET_RESTORE_JOBS = 4
+sln_project_re = re.compile(r'^Project\("[^"]*"\)\s*=\s*"[^"]*"\s*,\s*"([^"]+\.csproj)"', re.MULTILINE)
+# licenseUrl of packages packed with a license expression, e.g. https://licenses.nuget.org/MIT
+NUGET_LICENSE_URL_HOST = 'licenses.nuget.org'
 
 
 class Nuget(PackageManager):
@@ -26,15 +36,21 @@ class Nuget(PackageManager):
     dn_url = "https://nuget.org/packages/"
     packageReference = False
     directory_packages_props = 'Directory.Packages.props'
-    nuget_api_url = 'https://api.nuget.org/v3-flatcontainer/'
     dotnet_ver = []
     _exclude_dirs = {"test", "tests", "sample", "samples", "example", "examples"}
 
     def __init__(self, input_dir, output_dir):
         super().__init__(self.package_manager_name, self.dn_url, input_dir, output_dir)
+        self.nuget_api_url = get_registry_url(const.NUGET)
+        # 'dotnet restore' extracts every package, nuspec included, into these folders.
+        self.package_folders = [get_global_packages_folder()]
+        self.package_paths = {}
+        self.parsed_package_files = None
+        self.nuspec_infos = {}
+        self.package_reference_index = None
 
         for manifest_i in const.SUPPORT_PACKAGE.get(self.package_manager_name):
-            if os.path.exists(os.path.basename(manifest_i)):
+            if os.path.exists(self.get_input_path(os.path.basename(manifest_i))):
                 self.append_input_package_list_file(os.path.basename(manifest_i))
                 if manifest_i != 'packages.config':
                     self.packageReference = True
@@ -51,28 +67,7 @@ class Nuget(PackageManager):
         restore_targets = self._find_restore_targets()
         if restore_targets:
             logger.info("Found .sln or .csproj files. Running 'dotnet restore'...")
-            for target_path, target_file in restore_targets:
-                logger.info(f"Restoring: {os.path.relpath(target_file, self.input_dir)}")
-                try:
-                    result = subprocess.run(
-                        ['dotnet', 'restore', target_file, '/p:EnableWindowsTargeting=true'],
-                        cwd=target_path,
-                        capture_output=True,
-                        text=True,
-                        timeout=300
-                    )
-                    if result.returncode == 0:
-                        logger.info(f"Successfully restored {os.path.relpath(target_file, self.input_dir)}")
-                    else:
-                        logger.warning(f"'dotnet restore' failed for {target_file} with return code {result.returncode}")
-                        if result.stderr:
-                            logger.warning(result.stderr)
-                except FileNotFoundError:
-                    logger.error("'dotnet' command not found. Please install .NET SDK.")
-                except subprocess.TimeoutExpired:
-                    logger.warning(f"'dotnet restore' timed out for {target_file}.")
-                except Exception as e:
-                    logger.warning(f"Failed to run 'dotnet restore' for {target_file}: {e}")
+            self.restore_targets(restore_targets)
         else:
             logger.warning("No .sln or .csproj files found to restore.")
 
@@ -109,25 +104,77 @@ class Nuget(PackageManager):
 
         return ret
 
+    def restore_targets(self, restore_targets):
+        # Targets that restore a common project are restored one after another, since 'dotnet restore'
+        # writes the obj/ of every project it covers; independent groups are restored concurrently.
+        started = time.monotonic()
+        groups = group_restore_targets([target_file for _, target_file in restore_targets])
+        workers = min(DOTNET_RESTORE_JOBS, len(groups))
+        if workers > 1:
+            logger.info(f"Restoring {len(groups)} independent groups of projects with {workers} workers")
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(self.restore_target_group, groups))
+        else:
+            for group in groups:
+                self.restore_target_group(group)
+        logger.info(f"'dotnet restore' finished in {time.monotonic() - started:.1f}s")
+
+    def restore_target_group(self, group):
+        restored_projects = set()
+        for target_file, projects in group:
+            if target_file.endswith('.csproj') and os.path.normpath(target_file) in restored_projects:
+                logger.info(f"Skip restoring {os.path.relpath(target_file, self.input_dir)}: "
+                            "already restored with a solution")
+                continue
+            if self.restore_target(target_file):
+                restored_projects.update(projects)
+
+    def restore_target(self, target_file):
+        rel_target = os.path.relpath(target_file, self.input_dir)
+        logger.info(f"Restoring: {rel_target}")
+        started = time.monotonic()
+        try:
+            result = subprocess.run(
+                ['dotnet', 'restore', target_file, '/p:EnableWindowsTargeting=true'],
+                cwd=os.path.dirname(target_file),
+                capture_output=True,
+                text=True,
+                timeout=300
+            )
+            elapsed = time.monotonic() - started
+            if result.returncode == 0:
+                logger.info(f"Successfully restored {rel_target} in {elapsed:.1f}s")
+                return True
+            logger.warning(f"'dotnet restore' failed for {target_file} with return code {result.returncode} "
+                           f"after {elapsed:.1f}s")
+            if result.stderr:
+                logger.warning(result.stderr)
+        except FileNotFoundError:
+            logger.error("'dotnet' command not found. Please install .NET SDK.")
+        except subprocess.TimeoutExpired:
+            logger.warning(f"'dotnet restore' timed out for {target_file}.")
+        except Exception as e:
+            logger.warning(f"Failed to run 'dotnet restore' for {target_file}: {e}")
+        return False
+
     def parse_oss_information(self, f_name):
-        tmp_license_txt_file_name = 'tmp_license.txt'
+        tmp_license_txt_file_name = self.get_input_path('tmp_license.txt')
         if f_name == self.directory_packages_props:
             return
 
-        relation_tree = {}
-        direct_dep_list = []
         if not hasattr(self, 'global_purl_dict'):
             self.global_purl_dict = {}
         if not hasattr(self, 'processed_packages'):
             self.processed_packages = {}
 
-        file_path = os.path.join(self.input_dir, f_name) if not os.path.isabs(f_name) else f_name
-        with open(file_path, 'r', encoding='utf8') as input_fp:
-            package_list = []
-            if self.packageReference:
-                package_list = self.get_package_info_in_packagereference(input_fp, relation_tree, direct_dep_list)
-            else:
-                package_list = self.get_package_list_in_packages_config(input_fp)
+        if self.parsed_package_files is None:
+            self.prefetch_nuspec_infos()
+        if f_name in self.parsed_package_files:
+            package_list, relation_tree, direct_deps = self.parsed_package_files.pop(f_name)
+        else:
+            package_list, relation_tree, direct_deps = self.read_package_file(f_name)
+        self.nuspec_infos.update(self.get_nuspec_infos([package for package in dict.fromkeys(map(tuple, package_list))
+                                                        if package not in self.nuspec_infos]))
 
         for oss_origin_name, oss_version in package_list:
             try:
@@ -146,7 +193,7 @@ class Nuget(PackageManager):
                         else:
                             existing_dep_item.depends_on_raw = new_deps
                     if self.direct_dep and self.packageReference:
-                        if oss_origin_name in direct_dep_list:
+                        if oss_origin_name in direct_deps:
                             if 'direct' not in existing_dep_item.oss_items[0].comment:
                                 existing_dep_item.oss_items[0].comment = 'direct'
                     continue
@@ -156,54 +203,24 @@ class Nuget(PackageManager):
                 oss_item.name = f'{self.package_manager_name}:{oss_origin_name}'
                 oss_item.version = oss_version
 
-                license_name = ''
-                response = requests.get(f'{self.nuget_api_url.lower()}{oss_origin_name.lower()}/'
-                                        f'{oss_item.version.lower()}/{oss_origin_name.lower()}.nuspec')
-                if response.status_code == 200:
-                    root = fromstring(response.text)
-                    xmlns = ''
-                    m = re.search('{.*}', root.tag)
-                    if m:
-                        xmlns = m.group(0)
-                    nupkg_metadata = root.find(f'{xmlns}metadata')
-
-                    license_name_id = nupkg_metadata.find(f'{xmlns}license')
-                    if license_name_id is not None:
-                        license_name, license_comment = self.check_multi_license(license_name_id.text)
-                        if license_comment != '':
-                            oss_item.comment = license_comment
-                    else:
-                        license_url = nupkg_metadata.find(f'{xmlns}licenseUrl')
-                        if license_url is not None:
-                            url_res = requests.get(license_url.text)
-                            if url_res.status_code == 200:
-                                license_name_with_scanner = check_license_name(url_res.text)
-                                if license_name_with_scanner != "":
-                                    license_name = license_name_with_scanner
-                                else:
-                                    license_name = license_url.text
-                    oss_item.license = license_name
-                    repo_id = nupkg_metadata.find(f'{xmlns}repository')
-                    if repo_id is not None:
-                        oss_item.download_location = repo_id.get("url")
-                    else:
-                        proj_url_id = nupkg_metadata.find(f'{xmlns}projectUrl')
-                        if proj_url_id is not None:
-                            oss_item.download_location = proj_url_id.text
-                    oss_item.homepage = f'{self.dn_url}{oss_origin_name}'
-                    if not oss_item.download_location:
-                        oss_item.download_location = f'{oss_item.homepage}/{oss_item.version}'
-                    else:
-                        if oss_item.download_location.endswith('.git'):
-                            oss_item.download_location = oss_item.download_location[:-4]
-                    dep_item.purl = get_url_to_purl(f'{oss_item.homepage}/{oss_item.version}', self.package_manager_name)
+                homepage = f'{self.dn_url}{oss_origin_name}'
+                purl = get_nuget_purl(oss_origin_name, oss_item.version)
+                nuspec_info = self.nuspec_infos.get((oss_origin_name, oss_version))
+
+                if nuspec_info is not None:
+                    oss_item.license = nuspec_info['license']
+                    if nuspec_info['comment']:
+                        oss_item.comment = nuspec_info['comment']
+                    oss_item.homepage = homepage
+                    oss_item.download_location = nuspec_info['download_location'] or f'{homepage}/{oss_item.version}'
+                    dep_item.purl = purl
                 else:
                     oss_item.comment = 'Fail to response for nuget api'
                     dep_item.purl = f'pkg:nuget/{oss_origin_name}@{oss_item.version}'
                 self.global_purl_dict[f'{oss_origin_name}({oss_item.version})'] = dep_item.purl
 
                 if self.direct_dep and self.packageReference:
-                    if oss_origin_name in direct_dep_list:
+                    if oss_origin_name in direct_deps:
                         oss_item.comment = 'direct'
                     else:
                         oss_item.comment = 'transitive'
@@ -226,6 +243,140 @@ class Nuget(PackageManager):
 
         return
 
+    def read_package_file(self, f_name):
+        relation_tree = {}
+        direct_deps = set()
+        file_path = os.path.join(self.input_dir, f_name) if not os.path.isabs(f_name) else f_name
+        with open(file_path, 'rb') as input_fp:
+            if self.packageReference:
+                package_list = self.get_package_info_in_packagereference(input_fp, relation_tree, direct_deps)
+            else:
+                package_list = self.get_package_list_in_packages_config(input_fp)
+        return package_list, relation_tree, direct_deps
+
+    def prefetch_nuspec_infos(self):
+        # Every package file is read up front, so that the nuspec of each (id, version) found in any
+        # of them is resolved once, and the ones that need api.nuget.org are fetched concurrently.
+        self.parsed_package_files = {}
+        packages = {}
+        for f_name in self.input_package_list_file:
+            if f_name == self.directory_packages_props:
+                continue
+            try:
+                parsed = self.read_package_file(f_name)
+            except Exception as e:
+                logger.debug(f"Fail to read {f_name} in advance: {e}")
+                continue
+            self.parsed_package_files[f_name] = parsed
+            packages.update(dict.fromkeys((name, version) for name, version in parsed[0]))
+        self.nuspec_infos.update(self.get_nuspec_infos(list(packages)))
+
+    def get_nuspec_infos(self, packages):
+        # {(id, version): nuspec info or None}: the local packages folders, then the cache, then api.nuget.org.
+        nuspec_infos = {}
+        missing = []
+        for oss_origin_name, oss_version in packages:
+            nuspec_info = self.get_info_from_local_nuspec(oss_origin_name, oss_version)
+            if nuspec_info is None:
+                nuspec_info = get_cached_metadata(get_nuget_purl(oss_origin_name, oss_version), NUGET_NUSPEC)
+            if nuspec_info is None:
+                missing.append((oss_origin_name, oss_version))
+            nuspec_infos[(oss_origin_name, oss_version)] = nuspec_info
+
+        if missing:
+            logger.info(f"Fetching {len(missing)} nuspecs from {self.nuget_api_url}")
+            with ThreadPoolExecutor(max_workers=min(self.registry_jobs, len(missing))) as executor:
+                for package, nuspec_info in zip(missing, executor.map(self.fetch_nuspec_info, missing)):
+                    nuspec_infos[package] = nuspec_info
+        return nuspec_infos
+
+    def fetch_nuspec_info(self, package):
+        oss_origin_name, oss_version = package
+        try:
+            nuspec_info, definitive = self.get_info_from_nuspec(oss_origin_name, oss_version)
+        except Exception as e:
+            logger.warning(f"Fail to get the nuspec of {oss_origin_name}({oss_version}): {e}")
+            return None
+        # A license that could not be fetched is reported for this scan only, so a later scan fetches it again.
+        if nuspec_info is not None and definitive:
+            set_cached_metadata(get_nuget_purl(oss_origin_name, oss_version), NUGET_NUSPEC, nuspec_info)
+        return nuspec_info
+
+    def get_info_from_local_nuspec(self, oss_origin_name, oss_version):
+        package_path = self.package_paths.get((oss_origin_name, oss_version),
+                                              f'{oss_origin_name.lower()}/{oss_version.lower()}')
+        nuspec_name = f'{oss_origin_name.lower()}.nuspec'
+        for package_folder in self.package_folders:
+            package_dir = os.path.join(package_folder, *package_path.split('/'))
+            nuspec_path = os.path.join(package_dir, nuspec_name)
+            if not os.path.isfile(nuspec_path):
+                continue
+            try:
+                with open(nuspec_path, 'rb') as nuspec_fp:
+                    return self.parse_nuspec(nuspec_fp.read(), package_dir)[0]
+            except (OSError, ParseError, AttributeError) as e:
+                logger.debug(f"Fail to read {nuspec_path}: {e}")
+        return None
+
+    def get_info_from_nuspec(self, oss_origin_name, oss_version):
+        response = http_get(f'{self.nuget_api_url}{oss_origin_name.lower()}/'
+                            f'{oss_version.lower()}/{oss_origin_name.lower()}.nuspec')
+        if response.status_code != 200:
+            return None, False
+        return self.parse_nuspec(response.content)
+
+    def parse_nuspec(self, nuspec_content, package_dir=''):
+        # Returns (nuspec info, whether it is definitive): not when the licenseUrl could not be fetched.
+        definitive = True
+        license_name = ''
+        comment = ''
+        download_location = ''
+        root = fromstring(nuspec_content)
+        xmlns = ''
+        m = re.search('{.*}', root.tag)
+        if m:
+            xmlns = m.group(0)
+        nupkg_metadata = root.find(f'{xmlns}metadata')
+
+        license_name_id = nupkg_metadata.find(f'{xmlns}license')
+        license_file = ''
+        if license_name_id is not None and license_name_id.get('type') == 'file' and package_dir:
+            license_file = os.path.join(package_dir, *license_name_id.text.replace('\\', '/').split('/'))
+        if license_file and os.path.isfile(license_file):
+            license_name = check_license_name(license_file, is_filepath=True) or license_name_id.text
+        elif license_name_id is not None:
+            license_name, comment = self.check_multi_license(license_name_id.text)
+        else:
+            license_url = nupkg_metadata.find(f'{xmlns}licenseUrl')
+            if license_url is not None:
+                url_parts = urlsplit(license_url.text)
+                if url_parts.netloc == NUGET_LICENSE_URL_HOST and url_parts.path.strip('/'):
+                    license_name, comment = self.check_multi_license(unquote(url_parts.path.strip('/')))
+                else:
+                    license_name, definitive = self.get_license_from_url(license_url.text)
+        repo_id = nupkg_metadata.find(f'{xmlns}repository')
+        if repo_id is not None:
+            download_location = repo_id.get("url")
+        else:
+            proj_url_id = nupkg_metadata.find(f'{xmlns}projectUrl')
+            if proj_url_id is not None:
+                download_location = proj_url_id.text
+        if download_location and download_location.endswith('.git'):
+            download_location = download_location[:-4]
+        return {'license': license_name, 'comment': comment, 'download_location': download_location or ''}, definitive
+
+    def get_license_from_url(self, license_url):
+        # Returns (license, whether it is definitive). The URL itself is the license when it cannot be fetched.
+        try:
+            url_res = http_get(license_url)
+        except requests.exceptions.RequestException as e:
+            logger.debug(f"Fail to get the license of {license_url}: {e}")
+            return license_url, False
+        if url_res.status_code != 200:
+            logger.debug(f"Fail to get the license of {license_url}: {url_res.status_code}")
+            return license_url, False
+        return check_license_name(url_res.text) or license_url, True
+
     def get_package_list_in_packages_config(self, input_fp):
         package_list = []
         root = parse(input_fp).getroot()
@@ -233,14 +384,20 @@ class Nuget(PackageManager):
             package_list.append([p.get("id"), p.get("version")])
         return package_list
 
-    def get_package_info_in_packagereference(self, input_fp, relation_tree, direct_dep_list):
-        json_f = json.load(input_fp)
+    def get_package_info_in_packagereference(self, input_fp, relation_tree, direct_deps):
+        json_f = load_packages_assets(input_fp)
+        for package_folder in json_f['packageFolders']:
+            if package_folder not in self.package_folders and os.path.isdir(package_folder):
+                self.package_folders.append(package_folder)
+        for item, library in json_f['libraries'].items():
+            if library.get('path') and '/' in item:
+                self.package_paths[tuple(item.split('/', 1))] = library['path']
 
         dotnet_ver = self.get_dotnet_ver_list(json_f)
         package_list = self.get_package_list_in_packages_assets(json_f)
         self.get_dependency_tree(json_f, relation_tree, dotnet_ver)
-        self.get_direct_dependencies_from_assets_json(json_f, direct_dep_list)
-        self.get_direct_package_in_packagereference(direct_dep_list)
+        self.get_direct_dependencies_from_assets_json(json_f, direct_deps)
+        self.get_direct_package_in_packagereference(direct_deps)
 
         return package_list
 
@@ -259,7 +416,7 @@ class Nuget(PackageManager):
             dotnet_ver.append(ver)
         return dotnet_ver
 
-    def get_direct_dependencies_from_assets_json(self, json_f, direct_dep_list):
+    def get_direct_dependencies_from_assets_json(self, json_f, direct_deps):
         try:
             json_project_group = json_f.get('projectFileDependencyGroups', {})
             for _, dependencies in json_project_group.items():
@@ -267,8 +424,8 @@ class Nuget(PackageManager):
                     continue
                 for dep_string in dependencies:
                     package_name = dep_string.split()[0] if dep_string else ''
-                    if package_name and package_name not in direct_dep_list:
-                        direct_dep_list.append(package_name)
+                    if package_name:
+                        direct_deps.add(package_name)
         except Exception as e:
             logger.warning(f"Failed to extract direct dependencies from project.assets.json: {e}")
 
@@ -300,32 +457,26 @@ class Nuget(PackageManager):
                     actual_ver = actual_versions.get(oss_name.lower(), dep_ver_in_spec)
                     relation_tree[f'{oss_info[0]}({oss_info[1]})'].append(f'{oss_name}({actual_ver})')
 
-    def get_direct_package_in_packagereference(self, direct_dep_list):
-        if hasattr(self, 'project_dirs') and self.project_dirs:
-            for project_dir in self.project_dirs:
+    def get_direct_package_in_packagereference(self, direct_deps):
+        for package_references in self.get_package_reference_index().values():
+            direct_deps.update(package_references)
+
+    def get_package_reference_index(self):
+        # {project file: PackageReference names}, read once per scan and shared by every project.assets.json.
+        if self.package_reference_index is None:
+            package_reference_index = {}
+            project_dirs = getattr(self, 'project_dirs', None) or [self.input_dir]
+            for project_dir in project_dirs:
                 for f in os.listdir(project_dir):
                     f_path = os.path.join(project_dir, f)
-                    if os.path.isfile(f_path) and ((f.split('.')[-1] == 'csproj') or (f.split('.')[-1] == 'xproj')):
-                        with open(f_path, 'r', encoding='utf8') as input_fp:
-                            root = parse(input_fp).getroot()
-                        itemgroups = root.findall('ItemGroup')
-                        for itemgroup in itemgroups:
-                            for item in itemgroup.findall('PackageReference'):
-                                pkg_name = item.get('Include')
-                                if pkg_name and pkg_name not in direct_dep_list:
-                                    direct_dep_list.append(pkg_name)
-        else:
-            for f in os.listdir(self.input_dir):
-                f_path = os.path.join(self.input_dir, f)
-                if os.path.isfile(f_path) and ((f.split('.')[-1] == 'csproj') or (f.split('.')[-1] == 'xproj')):
-                    with open(f_path, 'r', encoding='utf8') as input_fp:
-                        root = parse(input_fp).getroot()
-                    itemgroups = root.findall('ItemGroup')
-                    for itemgroup in itemgroups:
-                        for item in itemgroup.findall('PackageReference'):
-                            pkg_name = item.get('Include')
-                            if pkg_name and pkg_name not in direct_dep_list:
-                                direct_dep_list.append(pkg_name)
+                    if os.path.isfile(f_path) and f.split('.')[-1] in ('csproj', 'xproj'):
+                        try:
+                            package_reference_index[f_path] = read_package_references(f_path)
+                        except (OSError, ParseError) as e:
+                            logger.warning(f"Fail to read PackageReference of {f_path}: {e}")
+                            package_reference_index[f_path] = set()
+            self.package_reference_index = package_reference_index
+        return self.package_reference_index
 
     def check_multi_license(self, license_name):
         multi_license = license_name
@@ -366,3 +517,106 @@ class Nuget(PackageManager):
             result.extend([(d, f) for _, d, f in csproj_files])
 
         return result
+
+
+def load_packages_assets(fp):
+    # Only the package types and dependencies are kept. The file, compile and runtime asset lists
+    # that make up most of project.assets.json are skipped while it is read.
+    json_f = {'targets': {}, 'libraries': {}, 'projectFileDependencyGroups': {}, 'packageFolders': {}}
+    patterns = [('targets', ANY, ANY), ('libraries', ANY), ('projectFileDependencyGroups',), ('packageFolders',)]
+    for path, value in iter_json_items(fp, patterns):
+        if path[0] == 'targets':
+            target = json_f['targets'].setdefault(path[1], {})
+            target[path[2]] = {key: value[key] for key in ('type', 'dependencies') if key in value}
+        elif path[0] == 'libraries':
+            json_f['libraries'][path[1]] = {key: value.get(key) for key in ('type', 'path')}
+        else:
+            json_f[path[0]] = value
+    return json_f
+
+
+def get_relative_project_path(base_dir, project_path):
+    # Project paths in .sln and .csproj files use backslashes on every platform.
+    return os.path.normpath(os.path.join(base_dir, *project_path.strip().replace('\\', '/').split('/')))
+
+
+def read_sln_projects(sln_file):
+    try:
+        with open(sln_file, 'r', encoding='utf-8-sig', errors='replace') as sln_fp:
+            content = sln_fp.read()
+    except OSError as e:
+        logger.debug(f"Fail to read {sln_file}: {e}")
+        return []
+    return [get_relative_project_path(os.path.dirname(sln_file), project) for project in sln_project_re.findall(content)]
+
+
+def read_project_references(csproj_file):
+    try:
+        root = parse(csproj_file).getroot()
+    except (OSError, ParseError) as e:
+        logger.debug(f"Fail to read {csproj_file}: {e}")
+        return []
+    xmlns = ''
+    m = re.search('{.*}', root.tag)
+    if m:
+        xmlns = m.group(0)
+    return [get_relative_project_path(os.path.dirname(csproj_file), item.get('Include'))
+            for item in root.iter(f'{xmlns}ProjectReference') if item.get('Include')]
+
+
+def read_package_references(project_file):
+    with open(project_file, 'r', encoding='utf8') as input_fp:
+        root = parse(input_fp).getroot()
+    package_references = set()
+    for itemgroup in root.findall('ItemGroup'):
+        for item in itemgroup.findall('PackageReference'):
+            pkg_name = item.get('Include')
+            if pkg_name:
+                package_references.add(pkg_name)
+    return package_references
+
+
+def get_restored_projects(target_file, project_references):
+    # The projects 'dotnet restore target_file' restores: those of a solution or the project itself,
+    # and every project they reference.
+    if target_file.endswith('.sln'):
+        stack = read_sln_projects(target_file)
+    else:
+        stack = [os.path.normpath(target_file)]
+    projects = set()
+    while stack:
+        project = stack.pop()
+        if project in projects:
+            continue
+        projects.add(project)
+        if project not in project_references:
+            project_references[project] = read_project_references(project) if os.path.isfile(project) else []
+        stack.extend(project_references[project])
+    return projects
+
+
+def group_restore_targets(target_files):
+    # [[(target file, projects it restores), ...], ...]: targets sharing a project end up in the same group,
+    # in their original order, so that solutions come before the projects they already cover.
+    project_references = {}
+    targets = [(target_file, get_restored_projects(target_file, project_references)) for target_file in target_files]
+    groups = []
+    for index, (_, projects) in enumerate(targets):
+        merged = [index]
+        remaining = []
+        for group in groups:
+            if any(projects & targets[member][1] for member in group):
+                merged.extend(group)
+            else:
+                remaining.append(group)
+        groups = remaining + [sorted(merged)]
+    return [[targets[member] for member in group] for group in sorted(groups)]
+
+
+def get_nuget_purl(oss_origin_name, oss_version):
+    return get_url_to_purl(f'{Nuget.dn_url}{oss_origin_name}/{oss_version}', const.NUGET)
+
+
+def get_global_packages_folder():
+    # NUGET_PACKAGES overrides the default global packages folder, as it does for dotnet and nuget.
+    return os.environ.get('NUGET_PACKAGES') or os.path.join(os.path.expanduser('~'), '.nuget', 'packages')
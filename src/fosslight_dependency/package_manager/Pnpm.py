@@ -8,15 +8,21 @@ import logging
 import subprocess
 import json
 import shutil
+import yaml
+from concurrent.futures import ThreadPoolExecutor
 import fosslight_util.constant as constant
 import fosslight_dependency.constant as const
 from fosslight_dependency._package_manager import PackageManager, get_url_to_purl
+from fosslight_dependency._json_stream import iter_dependency_tree, stream_command_output
 from fosslight_dependency.dependency_item import DependencyItem, change_dependson_to_purl
-from fosslight_dependency.package_manager.Npm import check_multi_license
+from fosslight_dependency.package_manager.Npm import check_multi_license, get_npm_manifest, is_npm_registry_available
 from fosslight_util.oss_item import OssItem
 
 logger = logging.getLogger(constant.LOGGER_NAME)
 node_modules = 'node_modules'
+pnpm_lock = const.SUPPORT_PACKAGE.get(const.PNPM)
+# devDependencies are not followed, as with 'pnpm ls -P'.
+_pnpm_dependency_fields = ('dependencies', 'optionalDependencies')
 
 
 class Pnpm(PackageManager):
@@ -25,161 +31,252 @@ class Pnpm(PackageManager):
     dn_url = 'https://www.npmjs.com/package/'
     input_file_name = 'tmp_pnpm_license_output.json'
     flag_tmp_node_modules = False
-    project_name_list = []
-    pkg_list = {}
 
     def __init__(self, input_dir, output_dir):
         super().__init__(self.package_manager_name, self.dn_url, input_dir, output_dir)
+        self.project_name_list = []
+        # (name, version) of every package already expanded
+        self.visited_pkgs = set()
+        # Set by the lockfile engine: {package key: {'name', 'version', 'dependencies': {name: package key}}}
+        # in the order it is reached from the projects.
+        self.lock_graph = None
+        self.lock_direct_deps = []
 
     def __del__(self):
-        if os.path.isfile(self.input_file_name):
-            os.remove(self.input_file_name)
+        if os.path.isfile(self.get_input_path(self.input_file_name)):
+            os.remove(self.get_input_path(self.input_file_name))
         if self.flag_tmp_node_modules:
-            shutil.rmtree(node_modules, ignore_errors=True)
+            shutil.rmtree(self.get_input_path(node_modules), ignore_errors=True)
 
-    def _parse_json_output(self, json_text):
-        json_text = json_text.strip()
-        if not json_text:
-            return []
-        try:
-            result = json.loads(json_text)
-            if not isinstance(result, list):
-                return [result]
-            return result
-        except json.JSONDecodeError:
-            results = []
-            decoder = json.JSONDecoder()
-            idx = 0
-            while idx < len(json_text):
-                json_text_trimmed = json_text[idx:].lstrip()
-                if not json_text_trimmed:
-                    break
-                try:
-                    obj, end_idx = decoder.raw_decode(json_text_trimmed)
-                    if isinstance(obj, list):
-                        results.extend(obj)
-                    else:
-                        results.append(obj)
-                    idx += len(json_text[idx:]) - len(json_text_trimmed) + end_idx
-                except json.JSONDecodeError as e:
-                    logger.warning(f'Failed to parse JSON at position {idx}: {e}')
-                    break
-            return results
+    def stream_pnpm_ls(self, cmd, consume):
+        # 'pnpm ls --json' output is read while pnpm writes it instead of being loaded as a whole.
+        returncode, stderr, consumed = stream_command_output(cmd, consume, cwd=self.input_dir)
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, cmd, stderr=stderr)
+        return consumed
+
+    def get_project_names(self, fp):
+        return [name for _, depth, name, _ in iter_dependency_tree(fp) if depth == 0 and name]
+
+    def get_direct_dependencies(self, fp):
+        return [dep_name for _, depth, _, node in iter_dependency_tree(fp) if depth == 0
+                for dep_name in node['dependencies']]
 
     def run_plugin(self):
         ret = True
 
+        if self.engine == const.ENGINE_LOCKFILE:
+            return self.read_lockfile()
+        if not shutil.which('pnpm'):
+            logger.warning("pnpm is not available on this system")
+            if self.engine == const.ENGINE_AUTO and os.path.isfile(self.get_input_path(pnpm_lock)):
+                logger.info("It reads the lockfile instead.")
+                return self.read_lockfile()
+            return False
+
         pnpm_install_cmd = 'pnpm install -r --prod --ignore-scripts --ignore-pnpmfile'
-        if os.path.isdir(node_modules) != 1:
+        if os.path.isdir(self.get_input_path(node_modules)) != 1:
             logger.info(f"node_modules directory is not existed. So it executes '{pnpm_install_cmd}'.")
             self.flag_tmp_node_modules = True
-            cmd_ret = subprocess.call(pnpm_install_cmd, shell=True)
+            cmd_ret = subprocess.call(pnpm_install_cmd, shell=True, cwd=self.input_dir)
             if cmd_ret != 0:
                 logger.error(f"{pnpm_install_cmd} returns an error")
                 ret = False
         if ret:
             project_cmd = 'pnpm ls -r --depth -1 -P --json'
-            ret_txt = subprocess.check_output(project_cmd, text=True, shell=True)
-            if ret_txt is not None:
-                deps_l = self._parse_json_output(ret_txt)
-                for items in deps_l:
-                    if "name" in items:
-                        self.project_name_list.append(items["name"])
+            self.project_name_list.extend(self.stream_pnpm_ls(project_cmd, self.get_project_names))
         return ret
 
+    def read_lockfile(self):
+        lock_path = self.get_input_path(pnpm_lock)
+        if not os.path.isfile(lock_path):
+            logger.error(f"{pnpm_lock} is not found, so it cannot analyze without running pnpm.")
+            return False
+        try:
+            with open(lock_path, 'r', encoding='utf8') as f:
+                lock_yaml = yaml.load(f, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader)) or {}
+            self.walk_lockfile(lock_yaml)
+        except Exception as e:
+            logger.error(f"Failed to read {pnpm_lock}: {e}")
+            self.lock_graph = None
+            return False
+        logger.info(f"Analyze {pnpm_lock} (lockfileVersion {lock_yaml.get('lockfileVersion', '')}) without running pnpm.")
+        return True
+
+    def read_package_json(self, package_dir):
+        try:
+            with open(self.get_input_path(package_dir, 'package.json'), 'r', encoding='utf8') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def walk_lockfile(self, lock_yaml):
+        lock_version = str(lock_yaml.get('lockfileVersion', ''))
+        importers = lock_yaml.get('importers')
+        if importers is None:
+            # A project without workspaces before lockfileVersion 9 keeps its dependencies at the top level.
+            importers = {'.': {f: lock_yaml[f] for f in _pnpm_dependency_fields if f in lock_yaml}}
+        # Before lockfileVersion 9, the dependencies of a package are kept in 'packages'.
+        snapshots = lock_yaml.get('snapshots') or lock_yaml.get('packages') or {}
+        packages = lock_yaml.get('packages') or {}
+
+        self.project_name_list = []
+        self.lock_direct_deps = []
+        self.lock_graph = {}
+        stack = []
+        for importer_dir, importer in importers.items():
+            self.project_name_list.append(self.read_package_json(importer_dir).get('name', importer_dir))
+            for field in _pnpm_dependency_fields:
+                for dep_name, dep_ref in (importer.get(field) or {}).items():
+                    if isinstance(dep_ref, dict):
+                        dep_ref = dep_ref.get('version', '')
+                    key = get_pnpm_package_key(lock_version, dep_name, str(dep_ref))
+                    if key in snapshots:
+                        self.lock_direct_deps.append(split_pnpm_package_key(lock_version, key)[0])
+                        stack.append(key)
+
+        stack.reverse()
+        while stack:
+            key = stack.pop()
+            if key in self.lock_graph:
+                continue
+            snapshot = snapshots.get(key) or {}
+            name, version = split_pnpm_package_key(lock_version, key)
+            package = packages.get(key) or packages.get(key.split('(')[0]) or {}
+            dependencies = {}
+            for field in _pnpm_dependency_fields:
+                for dep_name, dep_ref in (snapshot.get(field) or {}).items():
+                    dep_key = get_pnpm_package_key(lock_version, dep_name, str(dep_ref))
+                    if dep_key in snapshots:
+                        dependencies[dep_name] = dep_key
+            self.lock_graph[key] = {'name': package.get('name', name), 'version': str(package.get('version', version)),
+                                    'dependencies': dependencies}
+            stack.extend(reversed([dep_key for dep_key in dependencies.values() if dep_key not in self.lock_graph]))
+
+    def parse_oss_information_from_lock(self):
+        # pnpm-lock.yaml records neither license nor repository; they are read from the registry when it is reachable.
+        nodes = list(self.lock_graph.values())
+        manifests = [None] * len(nodes)
+        if nodes and is_npm_registry_available():
+            with ThreadPoolExecutor(max_workers=min(self.registry_jobs, len(nodes))) as executor:
+                manifests = list(executor.map(lambda node: get_npm_manifest(node['name'], node['version']), nodes))
+
+        purl_dict = {}
+        for node, manifest in zip(nodes, manifests):
+            if (node['name'], node['version']) in self.visited_pkgs:
+                continue
+            self.visited_pkgs.add((node['name'], node['version']))
+            dep_info = {'version': node['version'],
+                        'license': manifest['license'] if manifest else '',
+                        'repository': manifest['repository'] if manifest else '',
+                        'dependencies': {dep_name: self.lock_graph[dep_key]['version']
+                                         for dep_name, dep_key in node['dependencies'].items()}}
+            self.dep_items.append(self.make_dep_item(node['name'], dep_info, purl_dict))
+        if self.direct_dep:
+            self.dep_items = change_dependson_to_purl(purl_dict, self.dep_items)
+
     def parse_direct_dependencies(self):
         if not self.direct_dep:
             return
+        if self.lock_graph is not None:
+            self.direct_dep_list = [dep for dep in self.lock_direct_deps if dep not in self.project_name_list]
+            return
         try:
             direct_cmd = 'pnpm ls -r --depth 0 -P --json'
-            ret_txt = subprocess.check_output(direct_cmd, text=True, shell=True)
-            if ret_txt is not None:
-                deps_l = self._parse_json_output(ret_txt)
-                for item in deps_l:
-                    if isinstance(item, dict) and isinstance(item.get('dependencies'), dict):
-                        self.direct_dep_list.extend(item['dependencies'].keys())
-            else:
-                self.direct_dep = False
-                logger.warning('Cannot print direct/transitive dependency')
+            self.direct_dep_list.extend(self.stream_pnpm_ls(direct_cmd, self.get_direct_dependencies))
         except Exception as e:
             logger.warning(f'Fail to print direct/transitive dependency: {e}')
             self.direct_dep = False
         if self.direct_dep:
             self.direct_dep_list = list(filter(lambda dep: dep not in self.project_name_list, self.direct_dep_list))
 
-    def extract_dependencies(self, dependencies, purl_dict):
-        dep_item_list = []
-        for dep_name, dep_info in dependencies.items():
-            if dep_name not in self.project_name_list:
-                if dep_name in self.pkg_list.keys():
-                    if dep_info.get('version') in self.pkg_list[dep_name]:
-                        continue
-                self.pkg_list.setdefault(dep_name, []).append(dep_info.get('version'))
-                dep_item = DependencyItem()
-                oss_item = OssItem()
-                oss_item.name = f'npm:{dep_name}'
-                oss_item.version = dep_info.get('version')
-
-                license_name = dep_info.get('license')
-                if license_name:
-                    multi_license, license_comment, multi_flag = check_multi_license(license_name, '')
-                    if multi_flag:
-                        oss_item.comment = license_comment
-                        license_name = multi_license
-                    else:
-                        license_name = license_name.replace(",", "")
-                    oss_item.license = license_name
-
-                oss_item.homepage = f'{self.dn_url}{dep_name}'
-                oss_item.download_location = dep_info.get('repository')
-                if oss_item.download_location:
-                    if oss_item.download_location.endswith('.git'):
-                        oss_item.download_location = oss_item.download_location[:-4]
-                    if oss_item.download_location.startswith('git://'):
-                        oss_item.download_location = 'https://' + oss_item.download_location[6:]
-                    elif oss_item.download_location.startswith('git+https://'):
-                        oss_item.download_location = 'https://' + oss_item.download_location[12:]
-                    elif oss_item.download_location.startswith('git+ssh://git@'):
-                        oss_item.download_location = 'https://' + oss_item.download_location[14:]
-                else:
-                    oss_item.download_location = f'{self.dn_url}{dep_name}/v/{oss_item.version}'
-
-                dn_loc = f'{oss_item.homepage}/v/{oss_item.version}'
-                dep_item.purl = get_url_to_purl(dn_loc, 'npm')
-                purl_dict[f'{dep_name}({oss_item.version})'] = dep_item.purl
-
-                if dep_name in self.direct_dep_list:
-                    oss_item.comment = 'direct'
-                else:
-                    oss_item.comment = 'transitive'
-
-                if 'dependencies' in dep_info:
-                    for dn, di in dep_info.get('dependencies').items():
-                        if dn not in self.project_name_list:
-                            dep_item.depends_on_raw.append(f"{dn}({di['version']})")
-
-                dep_item.oss_items.append(oss_item)
-                dep_item_list.append(dep_item)
-
-            if 'dependencies' in dep_info:
-                dep_item_list_inner, purl_dict_inner = self.extract_dependencies(dep_info['dependencies'], purl_dict)
-                dep_item_list.extend(dep_item_list_inner)
-                purl_dict.update(purl_dict_inner)
-
-        return dep_item_list, purl_dict
+    def make_dep_item(self, dep_name, dep_info, purl_dict):
+        dep_item = DependencyItem()
+        oss_item = OssItem()
+        oss_item.name = f'npm:{dep_name}'
+        oss_item.version = dep_info.get('version')
+
+        license_name = dep_info.get('license')
+        if license_name:
+            multi_license, license_comment, multi_flag = check_multi_license(license_name, '')
+            if multi_flag:
+                oss_item.comment = license_comment
+                license_name = multi_license
+            else:
+                license_name = license_name.replace(",", "")
+            oss_item.license = license_name
+
+        oss_item.homepage = f'{self.dn_url}{dep_name}'
+        oss_item.download_location = dep_info.get('repository')
+        if oss_item.download_location:
+            if oss_item.download_location.endswith('.git'):
+                oss_item.download_location = oss_item.download_location[:-4]
+            if oss_item.download_location.startswith('git://'):
+                oss_item.download_location = 'https://' + oss_item.download_location[6:]
+            elif oss_item.download_location.startswith('git+https://'):
+                oss_item.download_location = 'https://' + oss_item.download_location[12:]
+            elif oss_item.download_location.startswith('git+ssh://git@'):
+                oss_item.download_location = 'https://' + oss_item.download_location[14:]
+        else:
+            oss_item.download_location = f'{self.dn_url}{dep_name}/v/{oss_item.version}'
+
+        dn_loc = f'{oss_item.homepage}/v/{oss_item.version}'
+        dep_item.purl = get_url_to_purl(dn_loc, 'npm')
+        purl_dict[f'{dep_name}({oss_item.version})'] = dep_item.purl
+
+        if dep_name in self.direct_dep_list:
+            oss_item.comment = 'direct'
+        else:
+            oss_item.comment = 'transitive'
+
+        for dn, dv in dep_info.get('dependencies', {}).items():
+            if dn not in self.project_name_list:
+                dep_item.depends_on_raw.append(f"{dn}({dv})")
+
+        dep_item.oss_items.append(oss_item)
+        return dep_item
+
+    def make_dep_items(self, fp):
+        # Packages come out of the stream once each, after their children; sorting on the pre-order index
+        # keeps the order of a depth-first walk. A (name, version) is expanded only once, which also stops
+        # cycles between workspace projects.
+        dep_items = []
+        purl_dict = {}
+        for index, depth, dep_name, dep_info in iter_dependency_tree(fp, self.visited_pkgs):
+            if depth > 0 and dep_name not in self.project_name_list:
+                dep_items.append((index, self.make_dep_item(dep_name, dep_info, purl_dict)))
+        dep_items.sort(key=lambda item: item[0])
+        return [dep_item for _, dep_item in dep_items], purl_dict
 
     def parse_oss_information_for_pnpm(self):
+        if self.lock_graph is not None:
+            self.parse_oss_information_from_lock()
+            return
         project_cmd = 'pnpm ls --json -r --depth Infinity -P --long'
-        ret_txt = subprocess.check_output(project_cmd, text=True, shell=True)
-        if ret_txt is not None:
-            deps_l = self._parse_json_output(ret_txt)
-            purl_dict = {}
-            for items in deps_l:
-                if isinstance(items, dict) and isinstance(items.get('dependencies'), dict):
-                    dep_item_list_inner, purl_dict_inner = self.extract_dependencies(items['dependencies'], purl_dict)
-                    self.dep_items.extend(dep_item_list_inner)
-                    purl_dict.update(purl_dict_inner)
-            if self.direct_dep:
-                self.dep_items = change_dependson_to_purl(purl_dict, self.dep_items)
-        else:
-            logger.warning(f'No output for {project_cmd}')
+        dep_items, purl_dict = self.stream_pnpm_ls(project_cmd, self.make_dep_items)
+        self.dep_items.extend(dep_items)
+        if self.direct_dep:
+            self.dep_items = change_dependson_to_purl(purl_dict, self.dep_items)
+
+
+def get_pnpm_package_key(lock_version, dep_name, dep_ref):
+    # Key of a dependency in 'snapshots' (or 'packages' before lockfileVersion 9):
+    #   v9: 'name@1.0.0(peer@2.0.0)'   v6: '/name@1.0.0(peer@2.0.0)'   v5: '/name/1.0.0_peer@2.0.0'
+    if dep_ref.startswith('link:'):
+        return ''
+    if dep_ref.startswith('/') or not dep_ref[:1].isdigit():
+        # Aliased or non-registry dependency, already written as a key
+        return dep_ref
+    if lock_version.startswith('5'):
+        return f'/{dep_name}/{dep_ref}'
+    if lock_version.startswith('6'):
+        return f'/{dep_name}@{dep_ref}'
+    return f'{dep_name}@{dep_ref}'
+
+
+def split_pnpm_package_key(lock_version, key):
+    if lock_version.startswith('5'):
+        name, _, version = key.lstrip('/').rpartition('/')
+        return name, version.split('_')[0]
+    name, _, version = key.lstrip('/').split('(')[0].rpartition('@')
+    return name, version
@@ -13,7 +13,7 @@ from pathlib import Path
 import fosslight_util.constant as constant
 import fosslight_dependency.constant as const
 from fosslight_dependency._package_manager import PackageManager
-from fosslight_dependency._package_manager import get_url_to_purl, check_license_name
+from fosslight_dependency._package_manager import get_url_to_purl, identify_license_texts, get_license_text_key
 from fosslight_dependency.dependency_item import DependencyItem, change_dependson_to_purl
 from fosslight_util.oss_item import OssItem
 
@@ -24,7 +24,6 @@ class Pub(PackageManager):
     package_manager_name = const.PUB
 
     dn_url = 'https://pub.dev/packages/'
-    cur_path = ''
 
     def __init__(self, input_dir, output_dir):
         super().__init__(self.package_manager_name, self.dn_url, input_dir, output_dir)
@@ -33,12 +32,8 @@ class Pub(PackageManager):
         self.pkg_details = {}
         self.append_input_package_list_file(const.SUPPORT_PACKAGE.get(self.package_manager_name))
 
-    def __del__(self):
-        if self.cur_path != '':
-            os.chdir(self.cur_path)
-
     def run_plugin(self):
-        if not os.path.exists(const.SUPPORT_PACKAGE.get(self.package_manager_name)):
+        if not os.path.exists(self.get_input_path(const.SUPPORT_PACKAGE.get(self.package_manager_name))):
             logger.error(f"Cannot find the file({const.SUPPORT_PACKAGE.get(self.package_manager_name)})")
             return False
 
@@ -235,6 +230,19 @@ class Pub(PackageManager):
                 if root_key in self.relation_tree:
                     direct_deps = [dep.split('(')[0] for dep in self.relation_tree[root_key]]
 
+        cache_info_dict = {}
+        for pkg_name in self.total_dep_list:
+            version = self.name_version_dict.get(pkg_name)
+            if not version:
+                continue
+            pkg_with_version = f"{pkg_name}({version})"
+            pkg_source = self.pkg_source_list.get(pkg_with_version, 'hosted')
+            if pkg_source != 'sdk':
+                cache_info_dict[pkg_with_version] = self.get_package_info_from_cache(
+                    pkg_name, version, pkg_source, pkg_with_version)
+        license_names = identify_license_texts([cache_info['license_text'] for cache_info in cache_info_dict.values()
+                                                if cache_info and cache_info.get('license_text')])
+
         for pkg_name in self.total_dep_list:
             try:
                 version = self.name_version_dict.get(pkg_name)
@@ -253,11 +261,11 @@ class Pub(PackageManager):
                 oss_item.name = f"{self.package_manager_name}:{pkg_name}"
                 oss_item.version = version
 
-                cache_info = self.get_package_info_from_cache(pkg_name, version, pkg_source, pkg_with_version)
+                cache_info = cache_info_dict.get(pkg_with_version)
                 if cache_info:
                     oss_item.homepage = cache_info.get('homepage') or cache_info.get('repository') or ''
                     if cache_info.get('license_text'):
-                        oss_item.license = check_license_name(cache_info['license_text'])
+                        oss_item.license = license_names[get_license_text_key(cache_info['license_text'])]
                 else:
                     oss_item.homepage = ''
                 local_path_comment = ''
@@ -323,8 +331,8 @@ class Pub(PackageManager):
 
     def parse_direct_dependencies(self):
         self.direct_dep = True
-        tmp_pub_deps_file = 'tmp_deps.json'
-        tmp_no_dev_deps_file = 'tmp_no_dev_deps.txt'
+        tmp_pub_deps_file = self.get_input_path('tmp_deps.json')
+        tmp_no_dev_deps_file = self.get_input_path('tmp_no_dev_deps.txt')
         encoding_list = ['utf8', 'utf16']
         if os.path.exists(tmp_pub_deps_file) and os.path.exists(tmp_no_dev_deps_file):
             for encode in encoding_list:
@@ -356,14 +364,13 @@ class Pub(PackageManager):
         else:
             try:
                 cmd = "flutter pub get"
-                ret = subprocess.call(cmd, shell=True)
+                ret = subprocess.call(cmd, shell=True, cwd=self.input_dir)
                 if ret != 0:
                     logger.error(f"Failed to run: {cmd}")
-                    os.chdir(self.cur_path)
                     return False
 
                 cmd = "flutter pub deps --json"
-                ret_txt = subprocess.check_output(cmd, text=True, shell=True)
+                ret_txt = subprocess.check_output(cmd, text=True, shell=True, cwd=self.input_dir)
                 if ret_txt is not None:
                     deps_l = json.loads(ret_txt)
                     self.parse_pub_deps_file(deps_l)
@@ -371,7 +378,7 @@ class Pub(PackageManager):
                     return False
 
                 cmd = "flutter pub deps --no-dev -s compact"
-                ret_no_dev = subprocess.check_output(cmd, text=True, shell=True, encoding='utf8')
+                ret_no_dev = subprocess.check_output(cmd, text=True, shell=True, encoding='utf8', cwd=self.input_dir)
                 if ret_no_dev:
                     self.parse_no_dev_command_file(ret_no_dev)
 
@@ -16,7 +16,7 @@ import tempfile
 import fosslight_util.constant as constant
 import fosslight_dependency.constant as const
 from fosslight_dependency._package_manager import PackageManager
-from fosslight_dependency._package_manager import get_url_to_purl, check_license_name
+from fosslight_dependency._package_manager import get_url_to_purl, check_license_name, prefetch_license_names
 from fosslight_dependency.dependency_item import DependencyItem, change_dependson_to_purl
 from fosslight_util.oss_item import OssItem
 
@@ -122,13 +122,13 @@ class Pypi(PackageManager):
         self.venv_tmp_dir = tempfile.mkdtemp(prefix='fosslight_venv_')
 
     def __del__(self):
-        if os.path.isfile(self.tmp_file_name):
-            os.remove(self.tmp_file_name)
+        if os.path.isfile(self.get_input_path(self.tmp_file_name)):
+            os.remove(self.get_input_path(self.tmp_file_name))
 
         shutil.rmtree(self.venv_tmp_dir, ignore_errors=True)
 
-        if os.path.isfile(self.tmp_deptree_file):
-            os.remove(self.tmp_deptree_file)
+        if os.path.isfile(self.get_input_path(self.tmp_deptree_file)):
+            os.remove(self.get_input_path(self.tmp_deptree_file))
 
     def set_pip_activate_cmd(self, pip_activate_cmd):
         self.pip_activate_cmd = pip_activate_cmd
@@ -189,45 +189,84 @@ class Pypi(PackageManager):
             site_packages = ''
         return site_packages
 
-    def get_license_from_file(self, package_name, version, license_files_metadata=None):
-        license_names = []
-        try:
-            if not license_files_metadata:
-                return []
-            normalized_name = re.sub(r"[-_.]+", "_", package_name)
-            dist_info_name = f"{normalized_name}-{version}.dist-info"
+    def get_license_file_paths(self, package_name, version, license_files_metadata=None, site_packages=None):
+        license_file_paths = []
+        if not license_files_metadata:
+            return []
+        normalized_name = re.sub(r"[-_.]+", "_", package_name)
 
+        if site_packages is None:
             site_packages = self.get_virtualenv_site_packages()
-            if not site_packages:
-                logger.debug("Could not find site-packages directory")
-                return []
-
-            dist_info_path = os.path.join(site_packages, dist_info_name)
-            if not os.path.exists(dist_info_path):
-                return []
-
-            for license_file in license_files_metadata:
-                license_file_path = os.path.join(dist_info_path, license_file)
-                if os.path.isfile(license_file_path):
-                    license_name = check_license_name(license_file_path, is_filepath=True)
-                    if license_name and license_name not in license_names:
-                        license_names.append(license_name)
-                else:
-                    if '/' not in license_file:
-                        for root, _, files in os.walk(dist_info_path):
-                            if license_file in files:
-                                found_path = os.path.join(root, license_file)
-                                license_name = check_license_name(found_path, is_filepath=True)
-                                if license_name and license_name not in license_names:
-                                    license_names.append(license_name)
+        if not site_packages:
+            logger.debug("Could not find site-packages directory")
+            return []
+
+        # Older wheels keep the case of the distribution name in the dist-info directory, newer ones lowercase it.
+        for dist_info_name in dict.fromkeys([normalized_name, normalized_name.lower()]):
+            dist_info_path = os.path.join(site_packages, f"{dist_info_name}-{version}.dist-info")
+            if os.path.exists(dist_info_path):
+                break
+        else:
+            return []
+
+        for license_file in license_files_metadata:
+            license_file_path = os.path.join(dist_info_path, license_file)
+            if os.path.isfile(license_file_path):
+                license_file_paths.append(license_file_path)
+            else:
+                if '/' not in license_file:
+                    for root, _, files in os.walk(dist_info_path):
+                        if license_file in files:
+                            license_file_paths.append(os.path.join(root, license_file))
+        return license_file_paths
+
+    def get_license_from_file(self, package_name, license_file_paths):
+        license_names = []
+        try:
+            for license_file_path in license_file_paths:
+                license_name = check_license_name(license_file_path, is_filepath=True)
+                if license_name and license_name not in license_names:
+                    license_names.append(license_name)
         except Exception as e:
             logger.debug(f"Failed to read license file for {package_name}: {e}")
         return license_names
 
+    def collect_license_candidates(self, inspect_data):
+        # {(name, version): (license, license text, license file paths)} of the packages to report.
+        # The texts and files left to identification are identified in one batch.
+        license_candidates = {}
+        license_txts = []
+        license_files = []
+        site_packages = None
+        for package in inspect_data.get('installed', []):
+            metadata = package.get('metadata', {})
+            if not metadata:
+                continue
+            oss_init_name = re.sub(r"[-_.]+", "-", metadata.get('name', '')).lower()
+            if oss_init_name not in self.total_dep_list:
+                continue
+            version = metadata.get('version', '')
+            license_info, license_txt, license_files_meta = get_license_candidates(metadata)
+            license_file_paths = []
+            if license_files_meta:
+                try:
+                    if site_packages is None:
+                        site_packages = self.get_virtualenv_site_packages()
+                    license_file_paths = self.get_license_file_paths(metadata.get('name', ''), version,
+                                                                     license_files_meta, site_packages)
+                except Exception as e:
+                    logger.debug(f"Failed to find license file for {oss_init_name}: {e}")
+            if license_txt:
+                license_txts.append(license_txt)
+            license_files.extend(license_file_paths)
+            license_candidates[(oss_init_name, version)] = (license_info, license_txt, license_file_paths)
+        prefetch_license_names(license_files, license_txts)
+        return license_candidates
+
     def run_plugin(self):
         ret = True
 
-        req_f = 'requirements.txt'
+        req_f = self.get_input_path('requirements.txt')
         if os.path.exists(req_f):
             with open(req_f, encoding='utf8') as rf:
                 for rf_line in rf.readlines():
@@ -260,7 +299,7 @@ class Pypi(PackageManager):
 
         install_cmd_list = []
         for manifest_file in manifest_files:
-            if os.path.exists(manifest_file):
+            if os.path.exists(self.get_input_path(manifest_file)):
                 if manifest_file == 'requirements.txt':
                     install_cmd_list.append("pip install -r requirements.txt")
                 else:
@@ -300,7 +339,7 @@ class Pypi(PackageManager):
         cmd = cmd_separator.join(cmd_list)
 
         try:
-            cmd_ret = subprocess.run(cmd, shell=True, stderr=subprocess.PIPE)
+            cmd_ret = subprocess.run(cmd, shell=True, stderr=subprocess.PIPE, cwd=self.input_dir)
             ret, err_msg = describe_venv_failure(cmd_ret)
         except Exception as e:
             ret = False
@@ -314,7 +353,7 @@ class Pypi(PackageManager):
                     cmd_list = [create_venv_cmd, quote_activate_cmd(activate_cmd), install_cmd,
                                 pip_upgrade_cmd, deactivate_cmd]
                     cmd = cmd_separator.join(cmd_list)
-                    cmd_ret = subprocess.run(cmd, shell=True, stderr=subprocess.PIPE)
+                    cmd_ret = subprocess.run(cmd, shell=True, stderr=subprocess.PIPE, cwd=self.input_dir)
                     ret, err_msg = describe_venv_failure(cmd_ret)
             except Exception as e:
                 ret = False
@@ -358,19 +397,20 @@ class Pypi(PackageManager):
 
         exists_pipdeptree = False
         try:
-            cmd_ret = subprocess.call(command, shell=True)
+            cmd_ret = subprocess.call(command, shell=True, cwd=self.input_dir)
             if cmd_ret != 0:
                 ret = False
                 err_msg = f"cmd ret code({cmd_ret})"
             else:
-                if os.path.isfile(tmp_pip_list):
-                    with open(tmp_pip_list, 'r', encoding='utf-8') as pip_list_file:
+                tmp_pip_list_path = self.get_input_path(tmp_pip_list)
+                if os.path.isfile(tmp_pip_list_path):
+                    with open(tmp_pip_list_path, 'r', encoding='utf-8') as pip_list_file:
                         for pip_list in pip_list_file.readlines():
                             pip_list_name = pip_list.split('==')[0]
                             if pip_list_name == pipdeptree:
                                 exists_pipdeptree = True
                                 break
-                    os.remove(tmp_pip_list)
+                    os.remove(tmp_pip_list_path)
         except Exception as e:
             ret = False
             err_msg = str(e)
@@ -399,12 +439,12 @@ class Pypi(PackageManager):
         command = command_separator.join(command_list)
 
         try:
-            cmd_ret = subprocess.call(command, shell=True)
+            cmd_ret = subprocess.call(command, shell=True, cwd=self.input_dir)
             if cmd_ret == 0:
-                if os.path.exists(self.tmp_file_name):
+                if os.path.exists(self.get_input_path(self.tmp_file_name)):
                     self.append_input_package_list_file(self.tmp_file_name)
 
-                    with open(self.tmp_file_name, 'r', encoding='utf-8') as json_f:
+                    with open(self.get_input_path(self.tmp_file_name), 'r', encoding='utf-8') as json_f:
                         inspect_data = json.load(json_f)
                         for package in inspect_data.get('installed', []):
                             metadata = package.get('metadata', {})
@@ -429,9 +469,10 @@ class Pypi(PackageManager):
         purl_dict = {}
         try:
             oss_init_name = ''
-            with open(f_name, 'r', encoding='utf-8') as json_file:
+            with open(self.get_input_path(f_name), 'r', encoding='utf-8') as json_file:
                 inspect_data = json.load(json_file)
 
+            license_candidates = self.collect_license_candidates(inspect_data)
             for package in inspect_data.get('installed', []):
                 dep_item = DependencyItem()
                 oss_item = OssItem()
@@ -446,34 +487,11 @@ class Pypi(PackageManager):
                 oss_item.name = f"{self.package_manager_name}:{oss_init_name}"
                 oss_item.version = metadata.get('version', '')
 
-                # license_expression > classifier > license > license_file
-                license_info = check_UNKNOWN(metadata.get('license_expression', ''))
-                if not license_info:
-                    classifiers = metadata.get('classifier', [])
-                    license_classifiers = [c for c in classifiers if c.startswith('License ::')]
-                    if license_classifiers:
-                        license_info_l = []
-                        for license_classifier in license_classifiers:
-                            parts = license_classifier.split(' :: ')
-                            if len(parts) >= 2:
-                                license_name = parts[-1].strip()
-                                if license_name and license_name != 'OSI Approved':
-                                    license_info_l.append(license_name)
-                                    break
-                        license_info = ','.join(license_info_l)
-                if not license_info:
-                    license_info = metadata.get('license', '')
-                    if '\n' in license_info:
-                        license_info = check_UNKNOWN(check_license_name(license_info))
-                if not license_info:
-                    license_files_meta = metadata.get('license_file')
-                    license_info_list = self.get_license_from_file(
-                        oss_init_name,
-                        oss_item.version,
-                        license_files_meta
-                    )
-                    if license_info_list:
-                        license_info = ','.join(license_info_list)
+                license_info, license_txt, license_file_paths = license_candidates[(oss_init_name, oss_item.version)]
+                if license_txt:
+                    license_info = check_UNKNOWN(check_license_name(license_txt))
+                if not license_info and license_file_paths:
+                    license_info = ','.join(self.get_license_from_file(oss_init_name, license_file_paths))
                 license_name = check_UNKNOWN(license_info)
                 if license_name:
                     license_name = license_name.replace(';', ',')
@@ -560,11 +578,11 @@ class Pypi(PackageManager):
 
     def parse_direct_dependencies(self):
         self.direct_dep = True
-        if not os.path.exists(self.tmp_deptree_file):
+        if not os.path.exists(self.get_input_path(self.tmp_deptree_file)):
             self.direct_dep = False
             return
         try:
-            with open(self.tmp_deptree_file, 'r', encoding='utf8') as f:
+            with open(self.get_input_path(self.tmp_deptree_file), 'r', encoding='utf8') as f:
                 json_f = json.load(f)
                 root_package = json_f
                 if ('pyproject.toml' in self.manifest_file_name) or ('setup.py' in self.manifest_file_name):
@@ -587,6 +605,29 @@ class Pypi(PackageManager):
             logger.warning(f'Fail to parse direct dependency: {e}')
 
 
+def get_license_candidates(metadata):
+    # license_expression > classifier > license > license_file
+    # Returns (license, license text, license file names): the license when the metadata names it, else
+    # the multi-line license text and the license files to identify, the files being the fallback of the text.
+    license_info = check_UNKNOWN(metadata.get('license_expression', ''))
+    if not license_info:
+        license_classifiers = [c for c in metadata.get('classifier', []) if c.startswith('License ::')]
+        for license_classifier in license_classifiers:
+            parts = license_classifier.split(' :: ')
+            if len(parts) >= 2:
+                license_name = parts[-1].strip()
+                if license_name and license_name != 'OSI Approved':
+                    license_info = license_name
+                    break
+    if not license_info:
+        license_info = metadata.get('license', '')
+        if '\n' in license_info:
+            return '', license_info, metadata.get('license_file')
+    if license_info:
+        return license_info, '', None
+    return '', '', metadata.get('license_file')
+
+
 def check_UNKNOWN(text):
     if text == ['UNKNOWN'] or text == 'UNKNOWN':
         text = ""
@@ -36,26 +36,26 @@ class Swift(PackageManager):
         self.append_input_package_list_file(self.input_file_name)
 
     def check_input_file_path(self):
-        if not os.path.isfile(self.input_file_name):
-            for file_in_swift in os.listdir('.'):
+        if not os.path.isfile(self.get_input_path(self.input_file_name)):
+            for file_in_swift in os.listdir(self.input_dir):
                 if file_in_swift.endswith('.xcodeproj'):
                     input_file_name_in_xcodeproj = os.path.join(file_in_swift,
                                                                 'project.xcworkspace/xcshareddata/swiftpm',
                                                                 self.input_file_name)
                     if input_file_name_in_xcodeproj != self.input_file_name:
-                        if os.path.isfile(input_file_name_in_xcodeproj):
+                        if os.path.isfile(self.get_input_path(input_file_name_in_xcodeproj)):
                             self.input_file_name = input_file_name_in_xcodeproj
                             logger.info(f'It uses the manifest file: {self.input_file_name}')
 
     def _load_dependency_tree(self):
-        if os.path.isfile(self.tmp_dep_tree_fname):
-            with open(self.tmp_dep_tree_fname, encoding='utf8') as dependency_file:
+        if os.path.isfile(self.get_input_path(self.tmp_dep_tree_fname)):
+            with open(self.get_input_path(self.tmp_dep_tree_fname), encoding='utf8') as dependency_file:
                 return json.load(dependency_file)
 
-        if os.path.isfile('Package.swift'):
+        if os.path.isfile(self.get_input_path('Package.swift')):
             cmd = 'swift package show-dependencies --format json'
             try:
-                ret_txt = subprocess.check_output(cmd, text=True, shell=True)
+                ret_txt = subprocess.check_output(cmd, text=True, shell=True, cwd=self.input_dir)
                 if ret_txt is not None:
                     return json.loads(ret_txt)
             except Exception as e:
@@ -64,7 +64,8 @@ class Swift(PackageManager):
         return None
 
     def parse_direct_dependencies(self):
-        if not (os.path.isfile('Package.swift') or os.path.isfile(self.tmp_dep_tree_fname)):
+        if not (os.path.isfile(self.get_input_path('Package.swift'))
+                or os.path.isfile(self.get_input_path(self.tmp_dep_tree_fname))):
             logger.info(f'No Package.swift or {self.tmp_dep_tree_fname}, skip to print direct/transitive.')
             self.direct_dep = False
             return
@@ -132,7 +133,7 @@ class Swift(PackageManager):
         json_ver = 2
         purl_dict = {}
 
-        with open(f_name, 'r', encoding='utf8') as json_file:
+        with open(self.get_input_path(f_name), 'r', encoding='utf8') as json_file:
             json_raw = json.load(json_file)
             json_ver = json_raw.get('version', 2)
 
@@ -11,7 +11,7 @@ import requests
 import fosslight_util.constant as constant
 import fosslight_dependency.constant as const
 from fosslight_dependency._package_manager import PackageManager
-from fosslight_dependency._package_manager import check_license_name, get_url_to_purl
+from fosslight_dependency._package_manager import check_license_name, get_url_to_purl, http_get, prefetch_license_names
 from fosslight_dependency.dependency_item import DependencyItem
 from fosslight_util.oss_item import OssItem
 
@@ -35,18 +35,21 @@ class Unity(PackageManager):
         self.append_input_package_list_file(self.input_file_name)
 
     def parse_oss_information(self, f_name):
-        with open(f_name, 'r', encoding='utf8') as f:
+        with open(self.get_input_path(f_name), 'r', encoding='utf8') as f:
             f_yml = yaml.safe_load(f)
             resolvedPkg = f_yml['m_ResolvedPackages']
 
         try:
+            prefetch_license_names(license_files=[
+                self.get_input_path(self.packageCache_dir, f"{pkg_data['name']}@{pkg_data['version']}", license_md)
+                for pkg_data in resolvedPkg])
             for pkg_data in resolvedPkg:
                 dep_item = DependencyItem()
                 oss_item = OssItem()
                 oss_item.name = pkg_data['name']
                 oss_item.version = pkg_data['version']
 
-                oss_packagecache_dir = os.path.join(self.packageCache_dir, f'{oss_item.name}@{oss_item.version}')
+                oss_packagecache_dir = self.get_input_path(self.packageCache_dir, f'{oss_item.name}@{oss_item.version}')
                 license_f = os.path.join(oss_packagecache_dir, license_md)
                 if os.path.isfile(license_f):
                     license_name = check_license_name(license_f, True)
@@ -65,7 +68,7 @@ class Unity(PackageManager):
                 if os.path.isfile(third_f):
                     with open(third_f, 'r', encoding='utf-8') as f:
                         third_notice = f.readlines()
-                    with open(self.third_notice_txt, 'a+', encoding='utf-8') as tf:
+                    with open(self.get_input_path(self.third_notice_txt), 'a+', encoding='utf-8') as tf:
                         for line in third_notice:
                             tf.write(line)
                             tf.flush()
@@ -108,7 +111,7 @@ class Unity(PackageManager):
 def check_url_alive(url):
     alive = False
     try:
-        response = requests.get(url)
+        response = http_get(url)
         if response.status_code == 200:
             alive = True
         else:
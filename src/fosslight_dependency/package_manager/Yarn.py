@@ -5,10 +5,12 @@
 
 import os
 import re
+import glob
 import logging
 import subprocess
 import json
 import shutil
+import yaml
 import fosslight_util.constant as constant
 import fosslight_dependency.constant as const
 from fosslight_dependency.package_manager.Npm import Npm
@@ -18,6 +20,9 @@ from fosslight_dependency._package_manager import get_url_to_purl
 from fosslight_dependency.package_manager.Npm import check_multi_license, check_unknown_license
 
 logger = logging.getLogger(constant.LOGGER_NAME)
+yarn_lock = 'yarn.lock'
+# devDependencies are not followed, as with 'yarn install --production'.
+_yarn_dependency_fields = ('dependencies', 'optionalDependencies', 'peerDependencies')
 
 
 class Yarn(Npm):
@@ -26,6 +31,10 @@ class Yarn(Npm):
         super().__init__(input_dir, output_dir)
         self.package_manager_name = const.YARN
         self.yarn_version = None
+        # Set by the lockfile engine: {descriptor: location}, e.g. 'lodash@^4.17.21' or 'lodash@npm:^4.17.21',
+        # and {workspace name: location}.
+        self.yarn_descriptors = {}
+        self.yarn_workspaces = {}
 
     def detect_yarn_version(self):
         """Detect Yarn version (1.x = Classic, 2+ = Berry)"""
@@ -33,7 +42,8 @@ class Yarn(Npm):
             return self.yarn_version
 
         try:
-            result = subprocess.run('yarn -v', shell=True, capture_output=True, text=True, encoding='utf-8')
+            result = subprocess.run('yarn -v', shell=True, capture_output=True, text=True, encoding='utf-8',
+                                    cwd=self.input_dir)
             if result.returncode == 0:
                 version_str = result.stdout.strip()
                 major_version = int(version_str.split('.')[0])
@@ -53,6 +63,9 @@ class Yarn(Npm):
 
         if not shutil.which("yarn"):
             logger.warning("Yarn is not available on this system")
+            if self.engine == const.ENGINE_AUTO and self.find_lockfile():
+                logger.info("It reads the lockfile instead.")
+                return self.read_lockfile()
             return False
 
         self.detect_yarn_version()
@@ -62,7 +75,7 @@ class Yarn(Npm):
         is_pnp_mode = False
         if self.yarn_version and self.yarn_version >= 2:
             is_pnp_mode = True
-            yarnrc_path = '.yarnrc.yml'
+            yarnrc_path = self.get_input_path('.yarnrc.yml')
             if os.path.exists(yarnrc_path):
                 with open(yarnrc_path, 'r', encoding='utf-8') as f:
                     yarnrc_content = f.read()
@@ -74,24 +87,28 @@ class Yarn(Npm):
                         logger.info(f"Detected Yarn Berry with nodeLinker: {node_linker} (non-PnP mode)")
             if is_pnp_mode:
                 logger.info("Detected Yarn Berry with PnP mode")
+                if self.engine == const.ENGINE_AUTO and not os.path.isdir(self.get_input_path(node_modules)):
+                    logger.info(f"It reads {yarn_lock} instead of installing node_modules for the PnP project.")
+                    return self.read_lockfile()
 
-        if not os.path.isdir(node_modules):
+        if not os.path.isdir(self.get_input_path(node_modules)):
             logger.info("node_modules directory does not exist.")
             self.flag_tmp_node_modules = True
 
-            yarn_install_env = None
+            yarn_install_env = self._node_env
             if self.yarn_version and self.yarn_version >= 2:
                 if is_pnp_mode:
                     # Force node-modules linker via env (cross-platform; avoids POSIX shell VAR=val syntax)
                     logger.info("Attempting to create node_modules for PnP project using YARN_NODE_LINKER=node-modules...")
-                    yarn_install_env = os.environ.copy()
+                    yarn_install_env = (self._node_env or os.environ).copy()
                     yarn_install_env['YARN_NODE_LINKER'] = 'node-modules'
                 yarn_install_cmd = 'yarn install --mode=skip-build'
             else:
                 yarn_install_cmd = 'yarn install --production --ignore-scripts'
             logger.info(f"Executing: {yarn_install_cmd}")
 
-            result = subprocess.run(yarn_install_cmd, shell=True, capture_output=True, text=True, env=yarn_install_env)
+            result = subprocess.run(yarn_install_cmd, shell=True, capture_output=True, text=True,
+                                    cwd=self.input_dir, env=yarn_install_env)
             if result.returncode != 0:
                 logger.error(f"{yarn_install_cmd} failed")
                 if is_pnp_mode:
@@ -100,23 +117,119 @@ class Yarn(Npm):
             else:
                 logger.info(f"Successfully executed {yarn_install_cmd}")
 
-        self.make_custom_json(self.tmp_custom_json)
+        self.make_custom_json(self.get_input_path(self.tmp_custom_json))
 
         cmd = license_checker_cmd + custom_path_option + self.tmp_custom_json
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+        result = subprocess.run(cmd, shell=True, capture_output=True, text=True, cwd=self.input_dir, env=self._node_env)
         if result.returncode != 0:
             logger.error(f"It returns the error: {cmd}")
             ret = False
         else:
             self.append_input_package_list_file(self.input_file_name)
-        if os.path.exists(self.tmp_custom_json):
-            os.remove(self.tmp_custom_json)
+        if os.path.exists(self.get_input_path(self.tmp_custom_json)):
+            os.remove(self.get_input_path(self.tmp_custom_json))
 
         return ret
 
+    def find_lockfile(self):
+        return yarn_lock if os.path.isfile(self.get_input_path(yarn_lock)) else ''
+
+    def read_lockfile(self):
+        if not self.find_lockfile():
+            logger.error(f"{yarn_lock} is not found, so it cannot analyze without running yarn.")
+            return False
+        try:
+            with open(self.get_input_path(yarn_lock), 'r', encoding='utf8') as f:
+                lock_text = f.read()
+            root_json = self.read_package_json()
+            self.lock_packages = {'': {'name': root_json.get('name', ''), 'version': root_json.get('version', ''),
+                                       **get_production_dependencies(root_json)}}
+            self.yarn_descriptors = {}
+            self.yarn_workspaces = {}
+            if re.search(r'^__metadata:', lock_text, re.MULTILINE):
+                lock_format = 'Berry'
+                self.read_berry_lock(lock_text)
+            else:
+                lock_format = 'v1'
+                self.read_classic_lock(lock_text, root_json)
+            self.walk_lock_packages()
+        except Exception as e:
+            logger.error(f"Failed to read {yarn_lock}: {e}")
+            self.lock_packages = None
+            return False
+        logger.info(f"Analyze {yarn_lock} ({lock_format}) without running yarn.")
+        self.append_input_package_list_file(yarn_lock)
+        return True
+
+    def read_classic_lock(self, lock_text, root_json):
+        for descriptors, entry in parse_classic_lock(lock_text):
+            name, dep_range = split_descriptor(descriptors[0])
+            if dep_range.startswith('npm:') and '@' in dep_range[5:]:
+                # Aliased package: "<alias>@npm:<real name>@<range>"
+                name = dep_range[4:].rsplit('@', 1)[0]
+            location = f"{name}@{entry.get('version', '')}"
+            self.lock_packages.setdefault(location, {'name': name, 'version': entry.get('version', ''),
+                                                     **{f: entry[f] for f in _yarn_dependency_fields if f in entry}})
+            for descriptor in descriptors:
+                self.yarn_descriptors[descriptor] = location
+
+        # Workspace packages of yarn v1 are linked and not recorded in yarn.lock.
+        for workspace_dir in get_workspace_dirs(self.input_dir, root_json):
+            self.add_workspace(workspace_dir)
+
+    def read_berry_lock(self, lock_text):
+        lock_yaml = yaml.load(lock_text, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+        for key, entry in lock_yaml.items():
+            if key == '__metadata' or not isinstance(entry, dict):
+                continue
+            descriptors = [descriptor.strip() for descriptor in key.split(',')]
+            resolution = entry.get('resolution', '')
+            name = split_descriptor(resolution or descriptors[0])[0]
+            if '@workspace:' in resolution:
+                workspace_dir = resolution.split('@workspace:', 1)[1]
+                location = '' if workspace_dir == '.' else self.add_workspace(workspace_dir)
+            else:
+                location = resolution or key
+                self.lock_packages.setdefault(location, {
+                    'name': name, 'version': str(entry.get('version', '')),
+                    **{f: {dep: str(dep_range) for dep, dep_range in entry[f].items()}
+                       for f in _yarn_dependency_fields if entry.get(f)}})
+            for descriptor in descriptors:
+                self.yarn_descriptors[descriptor] = location
+
+    def add_workspace(self, workspace_dir):
+        # The lockfile does not tell the production dependencies of a workspace, so they come from its package.json.
+        workspace_dir = os.path.normpath(workspace_dir)
+        package_json = self.read_package_json(workspace_dir)
+        location = f"{package_json.get('name', workspace_dir)}@workspace:{workspace_dir}"
+        self.lock_packages[location] = {'name': package_json.get('name', workspace_dir),
+                                        'version': package_json.get('version', ''),
+                                        'path': workspace_dir,
+                                        **get_production_dependencies(package_json)}
+        self.yarn_workspaces[self.lock_packages[location]['name']] = location
+        return location
+
+    def resolve_lock_dependency(self, location, dep_name):
+        entry = self.lock_packages[location]
+        dep_range = next((entry[f][dep_name] for f in _yarn_dependency_fields if dep_name in (entry.get(f) or {})), '')
+        for descriptor in (f'{dep_name}@{dep_range}', f'{dep_name}@npm:{dep_range}'):
+            if descriptor in self.yarn_descriptors:
+                return self.yarn_descriptors[descriptor]
+        return self.yarn_workspaces.get(dep_name, '')
+
+    def get_lock_package_dir(self, location):
+        if not location:
+            return ''
+        entry = self.lock_packages[location]
+        return entry.get('path') or os.path.join('node_modules', entry['name'])
+
     def parse_oss_information(self, f_name):
-        with open(f_name, 'r', encoding='utf8') as json_file:
-            json_data = json.load(json_file)
+        if self.lock_packages is not None:
+            json_data = self.get_license_data_from_lock()
+        else:
+            with open(self.get_input_path(f_name), 'r', encoding='utf8') as json_file:
+                json_data = json.load(json_file)
+        self._prefetch_npm_url_exists(json_data)
 
         _licenses = 'licenses'
         _repository = 'repository'
@@ -158,7 +271,9 @@ class Yarn(Npm):
             else:
                 npm_url_exists = False
                 if self._network_available is True:
-                    npm_url_exists = self._npm_url_exists(oss_init_name, oss_item.version)
+                    npm_url_exists = self._npm_url_exists_result.get((oss_init_name, oss_item.version))
+                    if npm_url_exists is None:
+                        npm_url_exists = self._npm_url_exists(oss_init_name, oss_item.version)
 
                 if self._network_available and not npm_url_exists:
                     oss_item.homepage = repo_url or ""
@@ -197,45 +312,17 @@ class Yarn(Npm):
             self.dep_items = change_dependson_to_purl(purl_dict, self.dep_items)
         return
 
-    def parse_rel_dependencies(self, rel_name, rel_ver, rel_dependencies):
-        """Override to handle missing packages and packages without version"""
-        _dependencies = 'dependencies'
-        _version = 'version'
-        _peer = 'peerMissing'
-        _missing = 'missing'
-
-        for rel_dep_name in rel_dependencies.keys():
-            # Optional, non-installed dependencies are listed as empty objects
-            if rel_dependencies[rel_dep_name] == {}:
-                continue
-            if _peer in rel_dependencies[rel_dep_name]:
-                if rel_dependencies[rel_dep_name][_peer]:
-                    continue
-            # Skip missing packages (not installed)
-            if _missing in rel_dependencies[rel_dep_name]:
-                if rel_dependencies[rel_dep_name][_missing]:
-                    continue
-            # Skip if version key doesn't exist
-            if _version not in rel_dependencies[rel_dep_name]:
-                continue
-
-            if f'{rel_name}({rel_ver})' not in self.relation_tree:
-                self.relation_tree[f'{rel_name}({rel_ver})'] = []
-            elif f'{rel_dep_name}({rel_dependencies[rel_dep_name][_version]})' in self.relation_tree[f'{rel_name}({rel_ver})']:
-                continue
-            self.relation_tree[f'{rel_name}({rel_ver})'].append(f'{rel_dep_name}({rel_dependencies[rel_dep_name][_version]})')
-            if _dependencies in rel_dependencies[rel_dep_name]:
-                self.parse_rel_dependencies(rel_dep_name, rel_dependencies[rel_dep_name][_version],
-                                            rel_dependencies[rel_dep_name][_dependencies])
-
     def parse_direct_dependencies(self):
         if not self.direct_dep:
             return
+        if self.lock_packages is not None:
+            self.parse_lock_relationship()
+            return
         try:
             # For Yarn, check if package.json exists (not yarn.lock)
             # input_package_list_file[0] is the license-checker output file path
             manifest_dir = os.path.dirname(self.input_package_list_file[0])
-            package_json_path = os.path.join(manifest_dir, 'package.json')
+            package_json_path = self.get_input_path(manifest_dir, 'package.json')
 
             if os.path.isfile(package_json_path):
                 ret, err_msg = self.parse_transitive_relationship()
@@ -248,3 +335,60 @@ class Yarn(Npm):
         except Exception as e:
             logger.warning(f'Cannot print direct/transitive dependency: {e}')
             self.direct_dep = False
+
+
+def split_descriptor(descriptor):
+    # '@scope/name@npm:^1.0.0' -> ('@scope/name', 'npm:^1.0.0')
+    idx = descriptor.find('@', 1)
+    if idx < 0:
+        return descriptor, ''
+    return descriptor[:idx], descriptor[idx + 1:]
+
+
+def parse_classic_lock(lock_text):
+    # yarn.lock v1 is not YAML:
+    #   "@babel/code-frame@^7.0.0", "@babel/code-frame@^7.10.4":
+    #     version "7.12.13"
+    #     dependencies:
+    #       "@babel/highlight" "^7.12.13"
+    entries = []
+    entry = None
+    section = None
+    for line in lock_text.splitlines():
+        content = line.strip()
+        if not content or content.startswith('#'):
+            continue
+        indent = len(line) - len(line.lstrip(' '))
+        if indent == 0:
+            entry = {}
+            section = None
+            entries.append(([d.strip().strip('"') for d in content.rstrip(':').split(',')], entry))
+        elif entry is None:
+            continue
+        elif indent <= 2:
+            if content.endswith(':'):
+                section = entry.setdefault(content[:-1], {})
+            else:
+                section = None
+                key, _, value = content.partition(' ')
+                entry[key] = value.strip().strip('"')
+        elif section is not None:
+            key, _, value = content.partition(' ')
+            section[key.strip('"')] = value.strip().strip('"')
+    return entries
+
+
+def get_production_dependencies(package_json):
+    return {f: dict(package_json[f]) for f in _yarn_dependency_fields if isinstance(package_json.get(f), dict)}
+
+
+def get_workspace_dirs(input_dir, package_json):
+    workspaces = package_json.get('workspaces') or []
+    if isinstance(workspaces, dict):
+        workspaces = workspaces.get('packages') or []
+    workspace_dirs = []
+    for pattern in workspaces:
+        for path in sorted(glob.glob(os.path.join(input_dir, pattern))):
+            if os.path.isfile(os.path.join(path, 'package.json')):
+                workspace_dirs.append(os.path.relpath(path, input_dir))
+    return workspace_dirs
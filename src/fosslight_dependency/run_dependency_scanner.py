@@ -9,11 +9,16 @@ import re
 import sys
 import warnings
 import logging
+import multiprocessing
 import fosslight_dependency.constant as const
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from fosslight_util.set_log import init_log
 import fosslight_util.constant as constant
 from fosslight_dependency._analyze_dependency import analyze_dependency
+from fosslight_dependency._metadata_cache import configure_metadata_cache
+from fosslight_dependency._maven_repository import reset_local_maven_repositories
+from fosslight_dependency._package_manager import set_license_jobs
 from fosslight_util.output_format import check_output_formats_v2, write_output_file
 from fosslight_util.cover import dump_result_log
 from fosslight_util.time import current_timestamp_utc, format_running_time, timestamp_for_filename
@@ -249,6 +254,67 @@ def find_package_manager(input_dir, path_to_exclude=[], manifest_file_name=[], r
     return ret, found_package_manager, input_dir, suggested_files
 
 
+def build_analysis_units(found_package_manager, pass_key):
+    # Each unit is analyzed in one worker. Gradle and Android share a directory and only
+    # the first successful one is used, so they stay together in the same unit.
+    units = {}
+    for pm, manifest_file_name_list in found_package_manager.items():
+        for manifest_dir, manifest_file_name in manifest_file_name_list.items():
+            if manifest_file_name == pass_key:
+                continue
+            if pm in (const.GRADLE, const.ANDROID):
+                unit_key = (const.GRADLE, manifest_dir)
+            else:
+                unit_key = (pm, manifest_dir)
+            units.setdefault(unit_key, []).append((pm, manifest_dir, manifest_file_name))
+    return list(units.values())
+
+
+def _init_analysis_worker(log_file, cache_config, license_jobs):
+    # The workers are spawned, so the logging, the metadata cache and the license pool size of the scan
+    # are set up again from initargs.
+    init_log(log_file, True, logging.INFO, logging.DEBUG)
+    configure_metadata_cache(*cache_config)
+    set_license_jobs(license_jobs)
+
+
+def _analyze_unit(tasks, analysis_args):
+    (output_path, pip_activate_cmd, pip_deactivate_cmd, output_custom_dir,
+     app_name, github_token, direct, registry_jobs, engine) = analysis_args
+    results = []
+    for pm, manifest_dir, manifest_file_name in tasks:
+        result = analyze_dependency(pm, manifest_dir, output_path, pip_activate_cmd, pip_deactivate_cmd,
+                                    output_custom_dir, app_name, github_token, manifest_file_name, direct,
+                                    registry_jobs, engine)
+        results.append(((pm, manifest_dir), result))
+        if result[0]:
+            break
+    return results
+
+
+def analyze_units_in_parallel(units, jobs, log_file, cache_config, analysis_args):
+    unit_results = {}
+    logger.info(f"Analyze {len(units)} manifest directories with {jobs} jobs.")
+    # Share the cores between the analysis workers and their license identification pools.
+    license_jobs = max(1, (os.cpu_count() or 1) // jobs)
+    try:
+        # askalono deadlocks in a forked child once this process has identified a license, which happens
+        # on a second scan in the same process or in a library caller, so the workers are spawned.
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_analysis_worker,
+                                 initargs=(log_file, cache_config, license_jobs)) as executor:
+            futures = {executor.submit(_analyze_unit, tasks, analysis_args): tasks for tasks in units}
+            for future in as_completed(futures):
+                try:
+                    unit_results.update(future.result())
+                except Exception as e:
+                    pm, manifest_dir, _ = futures[future][0]
+                    logger.warning(f"Fail to analyze {pm}({manifest_dir}) in a worker, analyze it again in process: {e}")
+    except Exception as e:
+        logger.warning(f"Fail to run parallel analysis, analyze remaining directories in process: {e}")
+    return unit_results
+
+
 def print_package_info(pm, log_lines, status='', base_dir=''):
     if pm:
         if status:
@@ -271,7 +337,10 @@ def print_package_info(pm, log_lines, status='', base_dir=''):
 def run_dependency_scanner(package_manager='', input_dir='', output_dir_file='', pip_activate_cmd='',
                            pip_deactivate_cmd='', output_custom_dir='', app_name=const.default_app_name,
                            github_token='', formats=[], direct=True, path_to_exclude=[], graph_path='',
-                           graph_size=(600, 600), recursive=False, all_exclude_mode=()):
+                           graph_size=(600, 600), recursive=False, all_exclude_mode=(), jobs=1,
+                           registry_jobs=const.default_registry_jobs, cache_dir='', no_cache=False,
+                           refresh_cache=False, cache_ttl=const.default_cache_ttl_days,
+                           cache_max_entries=const.default_cache_max_entries, engine=const.default_engine):
     os.environ['PYTHONUTF8'] = '1'
     os.environ['PYTHONIOENCODING'] = 'utf-8'
 
@@ -326,26 +395,29 @@ def run_dependency_scanner(package_manager='', input_dir='', output_dir_file='',
         logger.error(msg)
         sys.exit(1)
 
-    logger, _result_log = init_log(os.path.join(output_path, "fosslight_log_dep_" + _file_time + ".txt"),
+    log_file = os.path.join(output_path, "fosslight_log_dep_" + _file_time + ".txt")
+    logger, _result_log = init_log(log_file,
                                    True, logging.INFO, logging.DEBUG, _PKG_NAME, "", path_to_exclude)
 
     logger.info(f"Tool Info : {_result_log['Tool Info']}")
 
+    cache_config = (cache_dir, not no_cache, refresh_cache, cache_ttl, cache_max_entries)
+    configure_metadata_cache(*cache_config)
+    reset_local_maven_repositories()
+
     if not success:
         logger.error(msg)
         return False, scan_item
 
     if input_dir:
         if os.path.isdir(input_dir):
-            os.chdir(input_dir)
-            input_dir = os.getcwd()
+            input_dir = os.path.abspath(input_dir)
         else:
             logger.error(f"(-p option) You entered the wrong input path({input_dir}) to run the script.")
             logger.error("Please enter the existed input path with '-p' option.")
             return False, scan_item
     else:
         input_dir = os.getcwd()
-        os.chdir(input_dir)
 
     base_path = input_dir
 
@@ -412,12 +484,21 @@ def run_dependency_scanner(package_manager='', input_dir='', output_dir_file='',
     success_pm = defaultdict(lambda: defaultdict(list))
     fail_pm = defaultdict(lambda: defaultdict(list))
     cover_comments = []
+    unit_results = {}
+    if jobs > 1 and autodetect:
+        units = build_analysis_units(found_package_manager, pass_key)
+        if len(units) > 1:
+            analysis_args = (output_path, pip_activate_cmd, pip_deactivate_cmd, output_custom_dir,
+                             app_name, github_token, direct, registry_jobs, engine)
+            unit_results = analyze_units_in_parallel(units, jobs, log_file, cache_config, analysis_args)
+
+    # Results are merged in detection order, so the report does not depend on which worker finished first.
     for pm, manifest_file_name_list in found_package_manager.items():
         if not manifest_file_name_list and not autodetect:
             ret, package_dep_item_list, cover_comment, actual_pm = analyze_dependency(pm, input_dir, output_path,
                                                                                       pip_activate_cmd, pip_deactivate_cmd,
                                                                                       output_custom_dir, app_name, github_token,
-                                                                                      [], direct)
+                                                                                      [], direct, registry_jobs, engine)
             if cover_comment:
                 cover_comments.append(cover_comment)
             if ret:
@@ -430,12 +511,16 @@ def run_dependency_scanner(package_manager='', input_dir='', output_dir_file='',
                 input_dir = manifest_dir
                 if manifest_file_name == pass_key:
                     continue
-                os.chdir(input_dir)
-                ret, package_dep_item_list, cover_comment, actual_pm = analyze_dependency(pm, input_dir, output_path,
-                                                                                          pip_activate_cmd, pip_deactivate_cmd,
-                                                                                          output_custom_dir, app_name,
-                                                                                          github_token,
-                                                                                          manifest_file_name, direct)
+                if (pm, manifest_dir) in unit_results:
+                    ret, package_dep_item_list, cover_comment, actual_pm = unit_results[(pm, manifest_dir)]
+                else:
+                    ret, package_dep_item_list, cover_comment, actual_pm = analyze_dependency(pm, input_dir, output_path,
+                                                                                              pip_activate_cmd,
+                                                                                              pip_deactivate_cmd,
+                                                                                              output_custom_dir, app_name,
+                                                                                              github_token,
+                                                                                              manifest_file_name, direct,
+                                                                                              registry_jobs, engine)
                 if cover_comment:
                     cover_comments.append(cover_comment)
                 if ret:
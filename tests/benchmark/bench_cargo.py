@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026 LG Electronics Inc.
+# SPDX-License-Identifier: Apache-2.0
+# Microbenchmark of the Cargo dependency lookup on a synthetic 'cargo metadata' resolve graph.
+# Usage: python tests/benchmark/bench_cargo.py [crates ...]
+import re
+import sys
+import random
+import timeit
+from fosslight_dependency.package_manager.Cargo import get_resolve_index, get_matched_dependencies
+
+DEPS_PER_CRATE = 8
+
+
+def make_resolve_node(crates):
+    random.seed(crates)
+    ids = [f'registry+https://github.com/rust-lang/crates.io-index#crate{i}@1.{i % 7}.0' for i in range(crates)]
+    return ids, [{'id': pkg_id, 'dependencies': random.sample(ids, min(DEPS_PER_CRATE, crates))} for pkg_id in ids]
+
+
+def linear_matched_dependencies(match_id, resolve_node):
+    # The lookup before the index: a scan of all nodes and two regexes per dependency id.
+    dependencies_list = []
+    for node in resolve_node:
+        if match_id == node['id']:
+            for dep_pkg in node['dependencies']:
+                try:
+                    match = re.findall(r'^.*#(\S*)@(\S*)', dep_pkg)
+                    dependencies_list.append(f'{match[0][0]}({match[0][1]})')
+                except Exception:
+                    match = re.findall(r'^(\S*)\s(\S*)\s', dep_pkg)
+                    dependencies_list.append(f'{match[0][0]}({match[0][1]})')
+            break
+    return dependencies_list
+
+
+def indexed(ids, resolve_node):
+    resolve_index = get_resolve_index(resolve_node)
+    return [get_matched_dependencies(pkg_id, resolve_index) for pkg_id in ids]
+
+
+def linear(ids, resolve_node):
+    return [linear_matched_dependencies(pkg_id, resolve_node) for pkg_id in ids]
+
+
+def main(sizes):
+    print(f"{'crates':>8} {'linear(s)':>10} {'indexed(s)':>11} {'speedup':>8}")
+    for crates in sizes:
+        ids, resolve_node = make_resolve_node(crates)
+        assert indexed(ids, resolve_node) == linear(ids, resolve_node)
+        linear_time = min(timeit.repeat(lambda: linear(ids, resolve_node), number=1, repeat=3))
+        indexed_time = min(timeit.repeat(lambda: indexed(ids, resolve_node), number=1, repeat=3))
+        print(f'{crates:>8} {linear_time:>10.4f} {indexed_time:>11.4f} {linear_time / indexed_time:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or [100, 300, 900])
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026 LG Electronics Inc.
+# SPDX-License-Identifier: Apache-2.0
+# Microbenchmark of the Go dependency tree parsing on a synthetic 'go mod graph' output.
+# Usage: python tests/benchmark/bench_go_graph.py [lines ...]
+import re
+import sys
+import random
+import timeit
+from fosslight_dependency.package_manager.Go import parse_mod_graph
+
+ROOT_MODULE = 'k8s.io/kubernetes'
+VERSIONS_PER_MODULE = 4
+
+
+def make_mod_graph(lines):
+    # A Kubernetes-like graph: each module version lists its requirements, the main module is printed
+    # without a version and the go and toolchain pseudo-modules appear as in real 'go mod graph' output.
+    random.seed(lines)
+    modules = [f'github.com/org{i % 97}/module{i}' for i in range(max(10, lines // 40))]
+    versions = [f'{module}@v{i % 3}.{j}.{i % 11}' for i, module in enumerate(modules)
+                for j in range(VERSIONS_PER_MODULE)]
+    graph = [f'{ROOT_MODULE} go@1.22.0', 'go@1.22.0 toolchain@go1.22.0']
+    graph.extend(f'{ROOT_MODULE} {node}' for node in random.sample(versions, min(100, len(versions))))
+    while len(graph) < lines:
+        graph.append(f'{random.choice(versions)} {random.choice(versions)}')
+    return '\n'.join(graph) + '\n'
+
+
+def regex_mod_graph(go_deptree_txt):
+    # The parsing before the split-based parser: a regex per line, which drops the main module lines.
+    relation_tree = {}
+    for line in go_deptree_txt.split('\n'):
+        re_result = re.findall(r'(\S+)@v(\S+)\s(\S+)@v(\S+)', line)
+        if len(re_result) > 0 and len(re_result[0]) >= 4:
+            oss_name = re_result[0][0]
+            oss_ver = re_result[0][1]
+            pkg_name = re_result[0][2]
+            pkg_ver = re_result[0][3]
+            if f'{oss_name}({oss_ver})' not in relation_tree:
+                relation_tree[f'{oss_name}({oss_ver})'] = []
+            relation_tree[f'{oss_name}({oss_ver})'].append(f'{pkg_name}({pkg_ver})')
+    return relation_tree
+
+
+def split_mod_graph(go_deptree_txt):
+    return parse_mod_graph(go_deptree_txt.splitlines())
+
+
+def main(sizes):
+    print(f"{'lines':>8} {'regex(s)':>9} {'split(s)':>9} {'speedup':>8}")
+    for lines in sizes:
+        go_deptree_txt = make_mod_graph(lines)
+        mod_graph = split_mod_graph(go_deptree_txt)
+        assert mod_graph.pop(ROOT_MODULE)
+        assert mod_graph == regex_mod_graph(go_deptree_txt)
+        regex_time = min(timeit.repeat(lambda: regex_mod_graph(go_deptree_txt), number=1, repeat=3))
+        split_time = min(timeit.repeat(lambda: split_mod_graph(go_deptree_txt), number=1, repeat=3))
+        print(f'{lines:>8} {regex_time:>9.4f} {split_time:>9.4f} {regex_time / split_time:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or [10000, 100000])
@@ -3,8 +3,12 @@
 # Copyright (c) 2021 LG Electronics Inc.
 # SPDX-License-Identifier: Apache-2.0
 import os
+import csv
 import shutil
 import pytest
+import tempfile
+import subprocess
+from pathlib import Path
 
 set_up_directories = [
     "tests/result/android",
@@ -40,3 +44,27 @@ def setup_test_result_dir_and_teardown():
     print("==============tearDown==============")
     for directory in remove_directories:
         shutil.rmtree(directory)
+
+
+@pytest.fixture
+def check_csv_report():
+    """
+    Run fosslight_dependency with a csv report and check the fields of the expected packages,
+    given as {OSS Name: {column: value}}.
+    """
+    def check(input_path, extra_args, expected_packages):
+        with tempfile.TemporaryDirectory() as output_dir:
+            command = f"fosslight_dependency -p {input_path} -o {output_dir} -f csv {extra_args}"
+            result = subprocess.run(command, shell=True, capture_output=True, text=True)
+            assert result.returncode == 0, f"Command failed: {command}\nstdout: {result.stdout}\nstderr: {result.stderr}"
+
+            output_files = list(Path(output_dir).glob("fosslight_report_dep_*.csv"))
+            assert len(output_files) > 0, f"No output file found in {output_dir}"
+            with open(output_files[0], newline='', encoding='utf-8') as f:
+                packages = {row['OSS Name']: row for row in csv.DictReader(f, delimiter='\t')}
+
+        for oss_name, fields in expected_packages.items():
+            assert oss_name in packages, f"{oss_name} not found in the report of {command}"
+            for column, value in fields.items():
+                assert packages[oss_name][column] == value, f"{oss_name} {column}: {packages[oss_name][column]}"
+    return check
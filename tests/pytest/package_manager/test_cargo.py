@@ -20,6 +20,19 @@ def test_ubuntu(input_path, output_path):
     assert any(os.scandir(output_path)), f"Output file does not exist: {output_path}"
 
 
+@pytest.mark.parametrize("input_path, extra_args, expected_packages", [
+    ("tests/test_cargo2", "-m cargo --engine lockfile", {
+        "cargo:memchr": {"OSS Version": "2.7.4"},
+        "cargo:itoa": {"OSS Version": "1.0.13"},
+        "cargo:util": {"OSS Version": "0.1.0", "Depends On": "pkg:cargo/itoa@1.0.13,pkg:cargo/memchr@2.7.4"},
+        "cargo:app": {"Depends On": "pkg:cargo/regex@1.11.2,pkg:cargo/serde_json@1.0.145,pkg:cargo/util@0.1.0"}
+    })
+])
+@pytest.mark.ubuntu
+def test_ubuntu_report(input_path, extra_args, expected_packages, check_csv_report):
+    check_csv_report(input_path, extra_args, expected_packages)
+
+
 @pytest.mark.parametrize("input_path, output_path", [
     (os.path.join("tests", "test_cargo"), os.path.join("tests", "result", "cargo"))
 ])
@@ -17,3 +17,14 @@ def test_ubuntu(input_path, output_path, extra_args):
     result = subprocess.run(command, shell=True, capture_output=True, text=True)
     assert result.returncode == 0, f"Command failed: {command}\nstdout: {result.stdout}\nstderr: {result.stderr}"
     assert any(os.scandir(output_path)), f"Output file does not exist: {output_path}"
+
+
+@pytest.mark.parametrize("input_path, extra_args, expected_packages", [
+    ("tests/test_npm2", "-m npm --engine lockfile", {
+        "npm:axios": {"OSS Version": "0.21.1", "Comment": "direct", "Depends On": "pkg:npm/follow-redirects@1.14.1"},
+        "npm:debug": {"OSS Version": "4.3.1", "Comment": "transitive", "Depends On": "pkg:npm/ms@2.1.2"}
+    })
+])
+@pytest.mark.ubuntu
+def test_ubuntu_report(input_path, extra_args, expected_packages, check_csv_report):
+    check_csv_report(input_path, extra_args, expected_packages)
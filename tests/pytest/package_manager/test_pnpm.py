@@ -0,0 +1,16 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026 LG Electronics Inc.
+# SPDX-License-Identifier: Apache-2.0
+import pytest
+
+
+@pytest.mark.parametrize("input_path, extra_args, expected_packages", [
+    ("tests/test_pnpm", "-m pnpm --engine lockfile", {
+        "npm:debug": {"OSS Version": "4.3.4", "Comment": "direct", "Depends On": "pkg:npm/ms@2.1.2"},
+        "npm:ms": {"OSS Version": "2.1.2", "Comment": "transitive"}
+    })
+])
+@pytest.mark.ubuntu
+def test_ubuntu_report(input_path, extra_args, expected_packages, check_csv_report):
+    check_csv_report(input_path, extra_args, expected_packages)
@@ -12,7 +12,8 @@ DIST_PATH = os.path.join(os.environ.get("TOX_PATH", ""), "dist", "cli.exe")
 @pytest.mark.parametrize("input_path, output_path, extra_args", [
     ("tests/test_pypi", "tests/result/pypi", ""),
     ("tests/test_multi_pypi_npm", "tests/result/multi_pypi_npm", ""),
-    ("tests/test_multi_pypi_npm", "tests/result/multi_pypi_npm", "-f opossum")
+    ("tests/test_multi_pypi_npm", "tests/result/multi_pypi_npm", "-f opossum"),
+    ("tests/test_multi_pypi_npm", "tests/result/multi_pypi_npm_jobs", "--jobs 2")
 ])
 @pytest.mark.ubuntu
 def test_ubuntu(input_path, output_path, extra_args):